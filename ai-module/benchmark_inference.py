@@ -0,0 +1,109 @@
+# ai-module/benchmark_inference.py
+"""
+Compare the Keras and NumPy inference engines for the symptom model.
+
+Checks that both engines produce the same output for the same weights, then
+reports per-call latency at several batch sizes and the startup time and peak
+RSS of a fresh process that loads each engine.
+
+Usage:
+    python ai-module/benchmark_inference.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+os.environ['MODEL_ENGINE'] = 'keras'
+
+import symptom_checker
+from numpy_engine import NumpyDenseModel, export_weights
+
+BATCH_SIZES = (1, 32, 1024)
+REPEATS = 200
+
+# Run in a fresh interpreter so each engine's import cost is measured on its own
+LOAD_SNIPPET = """
+import json, resource, sys, time
+import numpy as np
+sys.path.insert(0, {module_dir!r})
+started = time.perf_counter()
+if {engine!r} == 'numpy':
+    from numpy_engine import NumpyDenseModel
+    model = NumpyDenseModel.load({weights_path!r})
+else:
+    import tensorflow as tf
+    model = tf.keras.models.load_model({keras_path!r})
+model.predict_on_batch(np.zeros((1, 10), dtype=np.float32))
+elapsed = time.perf_counter() - started
+# ru_maxrss survives exec on Linux, so prefer the per-process high-water mark
+try:
+    with open('/proc/self/status') as status:
+        max_rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'load_seconds': elapsed, 'max_rss_mb': max_rss_kb / 1024.0}}))
+"""
+
+
+def time_calls(predict, batch):
+    predict(batch)  # warm up
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        predict(batch)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1000.0
+
+
+def measure_load(engine, weights_path, keras_path):
+    snippet = LOAD_SNIPPET.format(
+        module_dir=os.path.dirname(os.path.abspath(__file__)),
+        engine=engine,
+        weights_path=weights_path,
+        keras_path=keras_path
+    )
+    output = subprocess.check_output([sys.executable, '-c', snippet], stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    keras_model = symptom_checker.get_model()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        weights_path = os.path.join(tmp, 'symptom_checker.npz')
+        keras_path = os.path.join(tmp, 'symptom_checker.keras')
+        export_weights(keras_model, weights_path)
+        keras_model.save(keras_path)
+        numpy_model = NumpyDenseModel.load(weights_path)
+
+        print("Parity")
+        for batch_size in BATCH_SIZES:
+            batch = rng.integers(0, 11, size=(batch_size, 10)).astype(np.float32)
+            expected = np.asarray(keras_model.predict_on_batch(batch))
+            actual = numpy_model.predict_on_batch(batch)
+            np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+            print(f"  batch={batch_size:<5d} max abs diff {np.max(np.abs(actual - expected)):.2e}")
+
+        print("Latency (median ms per call)")
+        print(f"  {'batch':>6} {'keras':>10} {'numpy':>10}")
+        for batch_size in BATCH_SIZES:
+            batch = rng.integers(0, 11, size=(batch_size, 10)).astype(np.float32)
+            keras_ms = time_calls(keras_model.predict_on_batch, batch)
+            numpy_ms = time_calls(numpy_model.predict_on_batch, batch)
+            print(f"  {batch_size:>6} {keras_ms:>10.3f} {numpy_ms:>10.3f}")
+
+        print("Fresh process load")
+        print(f"  {'engine':>6} {'seconds':>10} {'max RSS MB':>12}")
+        for engine in ('keras', 'numpy'):
+            result = measure_load(engine, weights_path, keras_path)
+            print(f"  {engine:>6} {result['load_seconds']:>10.3f} {result['max_rss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# ai-module/compression.py
+import os
+import time
+import zlib
+
+from metrics import COMPRESSION_SECONDS, HTTP_RESPONSE_BYTES, HTTP_UNCOMPRESSED_BYTES, route_label
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies worth compressing; images, gzip downloads and the like are not
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'image/svg+xml',
+}
+
+
+def is_compressible(mimetype):
+    return mimetype is not None and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    Pick a content encoding the client accepts: br when the brotli package
+    is installed and the client prefers it at least as much as gzip, then gzip.
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        str: 'br', 'gzip' or None for an uncompressed response
+    """
+    return accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+
+
+class _Compressor:
+    """
+    Incremental gzip or brotli compressor with a flush after each chunk, so
+    streamed responses reach the client as they are produced.
+    """
+
+    def __init__(self, encoding, level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_body(data, encoding, level, brotli_quality):
+    """
+    Compress a complete response body in one go.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _iter_measured(chunks, route, encoding, compressor=None):
+    """
+    Pass a streamed body through (compressing it if asked) and record its
+    size once it has been sent.
+    """
+    raw_bytes = 0
+    wire_bytes = 0
+    seconds = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            raw_bytes += len(chunk)
+            if compressor is not None:
+                started = time.perf_counter()
+                chunk = compressor.compress(chunk)
+                seconds += time.perf_counter() - started
+            if chunk:
+                wire_bytes += len(chunk)
+                yield chunk
+        if compressor is not None:
+            chunk = compressor.finish()
+            wire_bytes += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        HTTP_UNCOMPRESSED_BYTES.labels(route).inc(raw_bytes)
+        HTTP_RESPONSE_BYTES.labels(route, encoding).observe(wire_bytes)
+        if compressor is not None:
+            COMPRESSION_SECONDS.labels(route, encoding).observe(seconds)
+
+
+def install_compression(app, enabled=None, min_size=None, level=None, brotli_quality=None):
+    """
+    Compress responses with the encoding the client negotiates, and record
+    the bytes each route sends.
+
+    Bodies smaller than `min_size` are sent as they are, since compression
+    gains little there. Streamed bodies are compressed chunk by chunk.
+    Already encoded bodies, 304s, partial content and responses marked
+    Cache-Control: no-transform are left alone.
+
+    Args:
+        app (flask.Flask): The application
+        enabled (bool): Default: COMPRESSION_ENABLED, true unless set to false
+        min_size (int): Default: COMPRESSION_MIN_SIZE or 512 bytes
+        level (int): gzip level, default: COMPRESSION_LEVEL or 6
+        brotli_quality (int): Default: COMPRESSION_BROTLI_QUALITY or 5
+    """
+    from flask import request
+
+    if enabled is None:
+        enabled = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ('true', '1', 't')
+    if min_size is None:
+        min_size = int(os.environ.get('COMPRESSION_MIN_SIZE') or 512)
+    if level is None:
+        level = int(os.environ.get('COMPRESSION_LEVEL') or 6)
+    if brotli_quality is None:
+        brotli_quality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') or 5)
+
+    def _encoding_for(response):
+        if not enabled or request.method == 'HEAD' or response.direct_passthrough:
+            return None
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return None
+        if 'Content-Encoding' in response.headers or 'no-transform' in response.cache_control:
+            return None
+        if not is_compressible(response.mimetype):
+            return None
+        # The body depends on Accept-Encoding whether or not this one is compressed
+        response.vary.add('Accept-Encoding')
+        return negotiate_encoding(request.accept_encodings)
+
+    @app.after_request
+    def _compress(response):
+        route = route_label()
+        encoding = _encoding_for(response)
+        sent_as = response.headers.get('Content-Encoding', 'identity')
+
+        if response.direct_passthrough:
+            # Files are sent as they are; only their size is known up front
+            if response.content_length is not None:
+                HTTP_UNCOMPRESSED_BYTES.labels(route).inc(response.content_length)
+                HTTP_RESPONSE_BYTES.labels(route, sent_as).observe(response.content_length)
+            return response
+
+        if response.is_streamed:
+            compressor = _Compressor(encoding, level, brotli_quality) if encoding else None
+            response.response = _iter_measured(response.response, route, encoding or sent_as, compressor)
+            if compressor is not None:
+                response.headers.pop('Content-Length', None)
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+        data = response.get_data()
+        HTTP_UNCOMPRESSED_BYTES.labels(route).inc(len(data))
+        if encoding is None or len(data) < min_size:
+            HTTP_RESPONSE_BYTES.labels(route, sent_as).observe(len(data))
+            return response
+
+        started = time.perf_counter()
+        compressed = compress_body(data, encoding, level, brotli_quality)
+        COMPRESSION_SECONDS.labels(route, encoding).observe(time.perf_counter() - started)
+        HTTP_RESPONSE_BYTES.labels(route, encoding).observe(len(compressed))
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # A strong ETag names exact bytes, which are now different
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,50 @@
+# ai-module/export_weights.py
+"""
+Export a Keras symptom model to the .npz format read by numpy_engine.
+
+Usage:
+    python ai-module/export_weights.py --out models/symptom_checker.npz
+    python ai-module/export_weights.py --model models/symptom_checker.h5 --out models/symptom_checker.npz
+"""
+import argparse
+import os
+
+import numpy as np
+
+from numpy_engine import NumpyDenseModel, export_weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Saved Keras model to export (default: the demo model from symptom_checker.py)')
+    parser.add_argument('--out', required=True, help='Destination .npz file')
+    args = parser.parse_args()
+
+    if args.model:
+        import tensorflow as tf
+        model = tf.keras.models.load_model(args.model)
+    else:
+        # The exporter always needs the Keras model, whatever engine is configured.
+        os.environ['MODEL_ENGINE'] = 'keras'
+        import symptom_checker
+        model = symptom_checker.get_model()
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    export_weights(model, args.out)
+
+    # Check the exported weights reproduce the Keras output before anyone serves them
+    exported = NumpyDenseModel.load(args.out)
+    sample = np.random.default_rng(0).integers(0, 11, size=(64, exported.input_dim)).astype(np.float32)
+    np.testing.assert_allclose(
+        exported.predict_on_batch(sample),
+        np.asarray(model.predict_on_batch(sample)),
+        rtol=1e-5,
+        atol=1e-6
+    )
+    print(f"Exported {len(exported.activations)} layers to {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# ai-module/fast_json.py
+# Compact JSON for both Flask apps (orjson when installed, the stdlib
+# encoder otherwise) and a columnar payload mode for list endpoints
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through the provider's default() so they are rendered the
+    # way Flask always rendered them; numpy scalars from the model and
+    # integer dict keys are handled natively
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+COMPACT_SEPARATORS = (',', ':')
+# dumps() arguments the orjson path honours; anything else uses the stdlib
+ORJSON_KWARGS = {'default', 'sort_keys', 'ensure_ascii', 'separators'}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson when available.
+
+    Responses are always compact (no indentation, even in debug mode).
+    Calls with options orjson does not support, such as indent, fall back
+    to the stdlib encoder.
+    """
+
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('separators', COMPACT_SEPARATORS)
+        if orjson is None or kwargs.keys() - ORJSON_KWARGS or kwargs['separators'] != COMPACT_SEPARATORS:
+            return super().dumps(obj, **kwargs)
+
+        option = ORJSON_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            # Always UTF-8; ensure_ascii only ever made the output longer
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder accepts
+            return super().dumps(obj, **kwargs)
+
+
+def install_json_provider(app):
+    """
+    Replace the app's JSON provider with FastJSONProvider.
+
+    Call it before instrument_app(), which wraps whichever provider is installed.
+    """
+    app.json = FastJSONProvider(app)
+
+
+def wants_compact():
+    """
+    Check whether the client asked for compact list payloads (?compact=true).
+    """
+    return request.args.get('compact', '').lower() in ('true', '1', 't')
+
+
+def columnar(records):
+    """
+    Turn a list of dicts into column names and rows of values.
+
+    [{'id': 1, 'status': 'active'}, {'id': 2, 'status': 'expired'}] becomes
+    {'columns': ['id', 'status'], 'rows': [[1, 'active'], [2, 'expired']]},
+    so each field name is sent once per response instead of once per record.
+    Nested values are kept as they are; missing fields become null.
+
+    Args:
+        records (list): Dicts, typically from to_dict()
+
+    Returns:
+        dict: columns and rows
+    """
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    columns = list(columns)
+    return {
+        'columns': columns,
+        'rows': [[record.get(column) for column in columns] for record in records],
+    }
+
+
+def list_payload(records):
+    """
+    Get a list for a response body: columnar when the client asked for
+    compact payloads, the records themselves otherwise.
+    """
+    return columnar(records) if wants_compact() else records
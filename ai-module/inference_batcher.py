@@ -0,0 +1,170 @@
+# ai-module/inference_batcher.py
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Upper bounds (in microseconds) of the queue-wait histogram buckets.
+QUEUE_WAIT_BUCKETS_US = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+class _PendingRequest:
+    __slots__ = ('row', 'enqueued_at', 'event', 'result', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Merges concurrent single-row predictions into one batched forward pass.
+
+    Callers block in submit() while a background worker collects requests
+    until either `max_batch_size` rows are queued or the first request has
+    waited `max_wait_us` microseconds, runs `predict_fn` once on the stacked
+    rows and hands each caller its own output row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_us=2000, enabled=True):
+        """
+        Args:
+            predict_fn (callable): Takes an (N, ...) array and returns N outputs
+            max_batch_size (int): Maximum number of rows per forward pass
+            max_wait_us (int): Longest time a request waits for others to join its batch
+            enabled (bool): When False, submit() calls predict_fn inline
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, int(max_wait_us)) / 1_000_000.0
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+
+        self._requests = 0
+        self._batches = 0
+        self._batch_sizes = {}
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._queue_wait_buckets = [0] * (len(QUEUE_WAIT_BUCKETS_US) + 1)
+        self._inference_time_total = 0.0
+
+    def _ensure_worker(self):
+        # A worker thread does not survive fork, so each process starts its own.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+            self._worker.start()
+
+    def submit(self, row):
+        """
+        Predict a single input row, batched with any concurrent requests.
+
+        Args:
+            row (array-like): One input row, without the batch dimension
+
+        Returns:
+            The output row produced by predict_fn for this input
+        """
+        row = np.asarray(row)
+        if not self.enabled or self.max_batch_size == 1:
+            started = time.monotonic()
+            result = self.predict_fn(row[np.newaxis, ...])[0]
+            self._record_batch([0.0], 1, time.monotonic() - started)
+            return result
+
+        self._ensure_worker()
+        pending = _PendingRequest(row)
+        self._queue.put(pending)
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            waits = [started - pending.enqueued_at for pending in batch]
+            try:
+                outputs = self.predict_fn(np.stack([pending.row for pending in batch]))
+                for pending, output in zip(batch, outputs):
+                    pending.result = output
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            self._record_batch(waits, len(batch), time.monotonic() - started)
+            for pending in batch:
+                pending.event.set()
+
+    def _record_batch(self, waits, size, inference_time):
+        with self._lock:
+            self._requests += size
+            self._batches += 1
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._inference_time_total += inference_time
+            for wait in waits:
+                self._queue_wait_total += wait
+                self._queue_wait_max = max(self._queue_wait_max, wait)
+                wait_us = wait * 1_000_000.0
+                for i, bound in enumerate(QUEUE_WAIT_BUCKETS_US):
+                    if wait_us <= bound:
+                        self._queue_wait_buckets[i] += 1
+                        break
+                else:
+                    self._queue_wait_buckets[-1] += 1
+
+    def stats(self):
+        """
+        Get batching statistics.
+
+        Returns:
+            dict: Request and batch counts, a batch-size histogram, queue-wait
+                  histogram and averages, and mean forward-pass time
+        """
+        with self._lock:
+            requests = self._requests
+            batches = self._batches
+            bucket_labels = [f"le_{bound}us" for bound in QUEUE_WAIT_BUCKETS_US] + ['inf']
+            return {
+                'enabled': self.enabled,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_us': int(self.max_wait * 1_000_000),
+                'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+                'requests': requests,
+                'batches': batches,
+                'avg_batch_size': (requests / batches) if batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'queue_wait_us_avg': (self._queue_wait_total / requests * 1_000_000.0) if requests else 0.0,
+                'queue_wait_us_max': self._queue_wait_max * 1_000_000.0,
+                'queue_wait_us_histogram': dict(zip(bucket_labels, self._queue_wait_buckets)),
+                'inference_ms_avg': (self._inference_time_total / batches * 1000.0) if batches else 0.0,
+            }
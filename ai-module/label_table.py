@@ -0,0 +1,145 @@
+# ai-module/label_table.py
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+# Label tables shipped with the models (see labels/*.json)
+LABELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'labels')
+
+
+def top_k(probabilities, k):
+    """
+    Get the k most likely classes of each row, most likely first.
+
+    Ties go to the lower class index, as with argmax.
+
+    Args:
+        probabilities (array-like): An (N, C) array of class probabilities
+        k (int): Classes to keep per row (capped at C)
+
+    Returns:
+        tuple: (N, k) class indices and their (N, k) probabilities
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    probabilities = probabilities.reshape(len(probabilities), -1)
+    classes = probabilities.shape[1]
+    k = max(1, min(int(k), classes))
+
+    if k == 1:
+        indices = probabilities.argmax(axis=1)[:, np.newaxis]
+        return indices, np.take_along_axis(probabilities, indices, axis=1)
+
+    if k < classes:
+        # Only the k candidates are sorted, not every class
+        candidates = np.sort(np.argpartition(-probabilities, k - 1, axis=1)[:, :k], axis=1)
+    else:
+        candidates = np.broadcast_to(np.arange(classes), probabilities.shape)
+    candidate_probabilities = np.take_along_axis(probabilities, candidates, axis=1)
+    order = np.argsort(-candidate_probabilities, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_probabilities, order, axis=1)
+
+
+class LabelTable:
+    """
+    Maps a model's output classes to conditions and recommendations.
+
+    A table is built once per file (see load_label_table()). Conditions and
+    recommendations are precomputed per class into arrays, so labelling N
+    predictions is an array lookup rather than a branch per row. Classes
+    past the end of `classes` get the `default` entry.
+
+    A table with `thresholds` is for a model with one score output: the
+    score is binned into classes (exclusive lower bounds) before the lookup.
+    """
+
+    def __init__(self, version, classes, default=None, thresholds=None,
+                 low_confidence_threshold=None, low_confidence_recommendations=()):
+        """
+        Args:
+            version (str): Identifies the table's contents, reported with predictions
+            classes (list): One {condition, recommendations} entry per class
+            default (dict): Entry for classes past the end of `classes`
+                (default: the last entry)
+            thresholds (list): Ascending score thresholds, one fewer than classes
+            low_confidence_threshold (float): Below this confidence the
+                low-confidence recommendations are added first
+            low_confidence_recommendations (list): Recommendations for unsure predictions
+        """
+        if not classes:
+            raise ValueError("A label table needs at least one class")
+        if thresholds is not None and len(thresholds) != len(classes) - 1:
+            raise ValueError("A label table needs one threshold fewer than it has classes")
+
+        entries = list(classes) + [default or classes[-1]]
+        self.version = str(version)
+        self.thresholds = None if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+        self.low_confidence_threshold = low_confidence_threshold
+
+        self._conditions = np.array([entry['condition'] for entry in entries], dtype=object)
+        # Column 0: confident, column 1: below low_confidence_threshold
+        self._recommendations = np.empty((len(entries), 2), dtype=object)
+        for index, entry in enumerate(entries):
+            recommendations = tuple(entry.get('recommendations', ()))
+            self._recommendations[index, 0] = recommendations
+            self._recommendations[index, 1] = tuple(low_confidence_recommendations) + recommendations
+
+    @classmethod
+    def load(cls, path):
+        """
+        Build a table from a JSON file.
+
+        Args:
+            path (str): A file shaped like labels/symptom_classifier.json
+
+        Returns:
+            LabelTable: The table
+        """
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def _index(self, classes):
+        return np.minimum(np.asarray(classes, dtype=np.intp), len(self._conditions) - 1)
+
+    def classify(self, scores):
+        """
+        Bin scores into classes with the table's thresholds.
+
+        Returns:
+            numpy.ndarray: A class index for each score
+        """
+        return np.searchsorted(self.thresholds, scores, side='left')
+
+    def conditions(self, classes):
+        """
+        Get the condition of each class index (any array shape).
+
+        Returns:
+            numpy.ndarray: Condition names, shaped like `classes`
+        """
+        return self._conditions[self._index(classes)]
+
+    def recommendations(self, classes, confidences):
+        """
+        Get the recommendations for each prediction.
+
+        Args:
+            classes (array-like): Predicted class of each row
+            confidences (array-like): Confidence of each row's prediction
+
+        Returns:
+            numpy.ndarray: A tuple of recommendations per row
+        """
+        unsure = np.zeros(np.shape(classes), dtype=np.intp)
+        if self.low_confidence_threshold is not None:
+            unsure = (np.asarray(confidences) < self.low_confidence_threshold).astype(np.intp)
+        return self._recommendations[self._index(classes), unsure]
+
+
+@lru_cache(maxsize=None)
+def load_label_table(path):
+    """
+    Load a label table once per process.
+    """
+    return LabelTable.load(path)
@@ -0,0 +1,474 @@
+# ai-module/metrics.py
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Size buckets in bytes, from small JSON objects to large exports
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    A named metric with optional labels; each label combination is a child
+    holding its own values. Recording a value only touches the child, so the
+    cost of a metric nobody scrapes is a dict lookup and a few additions.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values, **kwargs):
+        """
+        Get the child for a label combination, creating it on first use.
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            yield from child.samples(self.name, self.labelnames, key)
+
+    def render(self):
+        name = self.name + '_total' if self.kind == 'counter' else self.name
+        lines = [f'# HELP {name} {self.documentation}', f'# TYPE {name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, key):
+        yield f'{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}'
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, key):
+        yield f'{name}{_format_labels(labelnames, key)} {_format_value(self.value)}'
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, [('le', _format_value(bound))])
+            yield f'{name}_bucket{labels} {cumulative}'
+        yield f'{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}'
+        yield f'{name}_count{_format_labels(labelnames, key)} {cumulative}'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them in the Prometheus text format.
+
+    Besides metrics that are updated as things happen, collectors can be
+    registered: functions called only when the metrics are scraped, which turn
+    an existing stats() snapshot (connection pool, batcher, cache) into
+    samples. They cost nothing between scrapes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules loaded twice (e.g. by path and by name) share the metric
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, name, collect):
+        """
+        Register a function that produces samples at scrape time.
+
+        Args:
+            name (str): Identifies the collector; registering a name again replaces it
+            collect (callable): Returns a list of (metric name, type, help,
+                [(labels dict, value), ...]) tuples
+        """
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != name]
+            self._collectors.append((name, collect))
+
+    def render(self):
+        """
+        Render every metric and collector.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for name, collect in collectors:
+            try:
+                families = collect() or []
+            except Exception as e:
+                print(f"Error collecting {name} metrics: {e}")
+                continue
+            for metric_name, kind, documentation, samples in families:
+                lines.append(f'# HELP {metric_name} {documentation}')
+                lines.append(f'# TYPE {metric_name} {kind}')
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f'{metric_name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the legacy app and the blueprint app. Under
+# gunicorn every worker has its own registry and reports its own series.
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds',
+    'Time spent handling HTTP requests, by route template',
+    ('method', 'route', 'status')
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics.gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being handled',
+    ('method', 'route')
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    'db_query_duration_seconds',
+    'Time spent executing database statements',
+    ('driver',)
+)
+INFERENCE_SECONDS = metrics.histogram(
+    'model_inference_duration_seconds',
+    'Time spent in model forward passes',
+    ('model',)
+)
+INFERENCE_ROWS = metrics.counter(
+    'model_inference_rows',
+    'Feature rows run through the model',
+    ('model',)
+)
+JSON_ENCODE_SECONDS = metrics.histogram(
+    'json_encode_duration_seconds',
+    'Time spent serializing JSON responses, by route template',
+    ('route',)
+)
+HTTP_RESPONSE_BYTES = metrics.histogram(
+    'http_response_size_bytes',
+    'Response body bytes sent on the wire, by route template and content encoding',
+    ('route', 'encoding'),
+    buckets=SIZE_BUCKETS
+)
+HTTP_UNCOMPRESSED_BYTES = metrics.counter(
+    'http_response_uncompressed_bytes',
+    'Response body bytes before content encoding, by route template',
+    ('route',)
+)
+COMPRESSION_SECONDS = metrics.histogram(
+    'http_response_compression_duration_seconds',
+    'Time spent compressing response bodies, by route template and content encoding',
+    ('route', 'encoding')
+)
+
+
+# Fields exported from MicroBatcher.stats() and PredictionCache.stats()
+BATCHER_FIELDS = {
+    'queue_depth': ('gauge', 'Inference requests waiting for a batch'),
+    'batches': ('counter', 'Forward passes run by the batcher'),
+    'avg_batch_size': ('gauge', 'Mean rows per batched forward pass'),
+    'queue_wait_us_avg': ('gauge', 'Mean time requests waited for a batch in microseconds'),
+}
+CACHE_FIELDS = {
+    'size': ('gauge', 'Entries in the local prediction cache'),
+    'hits': ('counter', 'Local prediction cache hits'),
+    'shared_hits': ('counter', 'Shared prediction cache hits'),
+    'misses': ('counter', 'Prediction cache misses'),
+    'evictions': ('counter', 'Entries evicted from the prediction cache'),
+}
+
+
+def stats_collector(prefix, stats_fn, fields, labels=None):
+    """
+    Build a collector that exports numeric fields of a stats() snapshot.
+
+    Args:
+        prefix (str): Metric name prefix, e.g. 'db_pool'
+        stats_fn (callable): Returns a stats dict (or None to export nothing)
+        fields (dict): Stats key -> (metric type, help text)
+        labels (dict): Labels added to every sample
+
+    Returns:
+        callable: A collector for MetricsRegistry.register_collector()
+    """
+    labels = labels or {}
+
+    def collect():
+        stats = stats_fn()
+        if not stats:
+            return []
+        return [
+            (f'{prefix}_{key}_total' if kind == 'counter' else f'{prefix}_{key}', kind, documentation,
+             [(labels, stats.get(key))])
+            for key, (kind, documentation) in fields.items()
+        ]
+
+    return collect
+
+
+def merge_collectors(*collectors):
+    """
+    Combine collectors that export the same metric families under different
+    labels, e.g. one stats_collector() per model, so each family is rendered
+    once with every collector's samples.
+
+    Returns:
+        callable: A collector for MetricsRegistry.register_collector()
+    """
+    def collect():
+        families = {}
+        for collector in collectors:
+            for metric_name, kind, documentation, samples in collector() or []:
+                family = families.setdefault(metric_name, (metric_name, kind, documentation, []))
+                family[3].extend(samples)
+        return list(families.values())
+
+    return collect
+
+
+def route_label():
+    """
+    Get the current request's route for metric labels.
+
+    The URL rule template keeps the label set bounded (no ids in it).
+    """
+    from flask import request
+
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def instrument_app(app, path=None, enabled=None):
+    """
+    Record per-route latency and in-flight requests for a Flask app, time its
+    JSON serialization and expose every metric at `path`.
+
+    Args:
+        app (flask.Flask): The application
+        path (str): Scrape endpoint (default: METRICS_PATH or /metrics)
+        enabled (bool): Default: METRICS_ENABLED, true unless set to false
+    """
+    from flask import Response, g, has_request_context, request
+
+    if enabled is None:
+        enabled = os.environ.get('METRICS_ENABLED', 'true').lower() in ('true', '1', 't')
+    if not enabled:
+        return
+    path = path or os.environ.get('METRICS_PATH', '/metrics')
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(request.method, route_label())
+        g._metrics_in_flight.inc()
+
+    @app.teardown_request
+    def _end_in_flight(exc):
+        in_flight = g.pop('_metrics_in_flight', None)
+        if in_flight is not None:
+            in_flight.dec()
+
+    @app.after_request
+    def _observe_latency(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            # Streamed bodies are timed up to the first byte
+            HTTP_REQUEST_SECONDS.labels(request.method, route_label(), response.status_code).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+    provider = app.json
+
+    class TimedJSONProvider(type(provider)):
+        def dumps(self, obj, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().dumps(obj, **kwargs)
+            finally:
+                JSON_ENCODE_SECONDS.labels(route_label() if has_request_context() else 'none').observe(
+                    time.perf_counter() - started
+                )
+
+    timed = TimedJSONProvider(app)
+    timed.__dict__.update(provider.__dict__)
+    app.json = timed
+
+    @app.route(path, methods=['GET'], endpoint='metrics')
+    def scrape_metrics():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def instrument_engine(engine):
+    """
+    Time every statement a SQLAlchemy engine executes.
+    """
+    from sqlalchemy import event
+
+    timer = DB_QUERY_SECONDS.labels('sqlalchemy')
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_metrics_started'].pop()
+        timer.observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def _handle_error(context):
+        stack = context.connection.info.get('_metrics_started') if context.connection is not None else None
+        if stack:
+            timer.observe(time.perf_counter() - stack.pop())
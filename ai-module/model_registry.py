@@ -0,0 +1,188 @@
+# ai-module/model_registry.py
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+
+def process_memory():
+    """
+    Get the memory use of the current process.
+
+    Returns:
+        dict: Resident set size and, where the kernel reports it, proportional
+              set size (shared copy-on-write pages split between processes), in MB
+    """
+    memory = {'pid': os.getpid(), 'rss_mb': None, 'pss_mb': None}
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    memory['rss_mb'] = int(line.split()[1]) / 1024.0
+                    break
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                if line.startswith('Pss:'):
+                    memory['pss_mb'] = int(line.split()[1]) / 1024.0
+                    break
+    except OSError:
+        pass
+    return memory
+
+
+def file_version(path):
+    """
+    Compute a content hash for a model file or directory.
+
+    Workers loading the same file get the same version, which lets them
+    share cached predictions.
+
+    Args:
+        path (str): Model file or SavedModel directory
+
+    Returns:
+        str: A short hex digest
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+    else:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps one instance per process.
+
+    Modules register a zero-argument loader under a name instead of building
+    their model at import time; get() loads it the first time it is needed
+    and warm_up() loads everything up front, e.g. in a gunicorn master before
+    workers are forked so they share the model's pages copy-on-write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders = {}
+        self._models = {}
+        self._load_locks = {}
+        self._load_seconds = {}
+        self._version_fns = {}
+        self._versions = {}
+
+    def register(self, name, loader, version=None):
+        """
+        Register a loader for a model.
+
+        Args:
+            name (str): Name the model is looked up by
+            loader (callable): Zero-argument function that builds the model
+            version (callable): Optional zero-argument function returning a
+                stable identifier for the weights being loaded (see
+                file_version()). Without it each load gets a random version.
+        """
+        with self._lock:
+            if name in self._loaders and self._loaders[name] is not loader:
+                # Re-registration (e.g. a module loaded twice) replaces the loader
+                self._models.pop(name, None)
+                self._versions.pop(name, None)
+            self._loaders[name] = loader
+            self._version_fns[name] = version
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """
+        Get a model, loading it on first use.
+
+        Args:
+            name (str): Registered model name
+
+        Returns:
+            The loaded model
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under {name!r}")
+
+        with self._load_locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                started = time.perf_counter()
+                model = self._loaders[name]()
+                version_fn = self._version_fns.get(name)
+                self._versions[name] = version_fn() if version_fn else uuid.uuid4().hex[:16]
+                self._load_seconds[name] = time.perf_counter() - started
+                self._models[name] = model
+        return model
+
+    def version(self, name):
+        """
+        Get the version of a model, loading it on first use.
+
+        The version changes whenever different weights are loaded, so it can
+        be used to key anything derived from the model's output.
+        """
+        self.get(name)
+        return self._versions.get(name)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def unload(self, name):
+        """
+        Drop a loaded model so the next get() loads it again.
+        """
+        self._models.pop(name, None)
+        self._versions.pop(name, None)
+
+    def warm_up(self, names=None):
+        """
+        Load models ahead of the first request.
+
+        Args:
+            names (list): Models to load (default: every registered model)
+
+        Returns:
+            dict: Load time in seconds for each model
+        """
+        names = list(self._loaders) if names is None else names
+        for name in names:
+            self.get(name)
+        return {name: self._load_seconds.get(name, 0.0) for name in names}
+
+    def stats(self):
+        """
+        Get loading status for every registered model.
+
+        Returns:
+            dict: Whether each model is loaded and how long loading took,
+                  plus this process's memory use
+        """
+        return {
+            'models': {
+                name: {
+                    'loaded': name in self._models,
+                    'version': self._versions.get(name),
+                    'load_seconds': self._load_seconds.get(name),
+                }
+                for name in self._loaders
+            },
+            'process': process_memory(),
+        }
+
+
+# Process-wide registry shared by the legacy app and the blueprint app
+registry = ModelRegistry()
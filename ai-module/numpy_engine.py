@@ -0,0 +1,135 @@
+# ai-module/numpy_engine.py
+import numpy as np
+
+WEIGHTS_FORMAT_VERSION = 1
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    with np.errstate(over='ignore'):
+        return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'sigmoid': _sigmoid,
+    'softmax': _softmax,
+    'linear': _linear,
+}
+
+
+def export_weights(model, path):
+    """
+    Export the Dense layers of a Keras model to a compressed .npz file.
+
+    Args:
+        model: A Keras model made only of Dense (and Dropout) layers
+        path (str): Destination .npz file
+
+    Returns:
+        str: The path that was written
+    """
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        if layer_type in ('InputLayer', 'Dropout'):
+            # Dropout is the identity at inference time
+            continue
+        if layer_type != 'Dense':
+            raise ValueError(f"Cannot export layer {layer.name!r} of type {layer_type}")
+
+        activation = layer.get_config()['activation']
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {activation!r} in layer {layer.name!r}")
+
+        kernel, bias = layer.get_weights()
+        index = len(activations)
+        arrays[f"kernel_{index}"] = kernel.astype(np.float32)
+        arrays[f"bias_{index}"] = bias.astype(np.float32)
+        activations.append(activation)
+
+    np.savez_compressed(
+        path,
+        format_version=np.array(WEIGHTS_FORMAT_VERSION),
+        activations=np.array(activations),
+        **arrays
+    )
+    return path
+
+
+class NumpyDenseModel:
+    """
+    Runs the forward pass of an exported Dense network with NumPy matmuls.
+
+    Exposes predict() and predict_on_batch() so it can stand in for the
+    Keras model without importing TensorFlow.
+    """
+
+    def __init__(self, kernels, biases, activations):
+        if not (len(kernels) == len(biases) == len(activations)):
+            raise ValueError("kernels, biases and activations must have the same length")
+        self.kernels = [np.ascontiguousarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self._activation_fns = [ACTIVATIONS[name] for name in self.activations]
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a model written by export_weights().
+
+        Args:
+            path (str): Path to the .npz weights file
+
+        Returns:
+            NumpyDenseModel: The loaded model
+        """
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != WEIGHTS_FORMAT_VERSION:
+                raise ValueError(f"Unsupported weights format version {version}")
+            activations = [str(name) for name in data['activations']]
+            kernels = [data[f"kernel_{i}"] for i in range(len(activations))]
+            biases = [data[f"bias_{i}"] for i in range(len(activations))]
+        return cls(kernels, biases, activations)
+
+    @property
+    def input_dim(self):
+        return self.kernels[0].shape[0]
+
+    def predict_on_batch(self, x):
+        """
+        Run the forward pass.
+
+        Args:
+            x (array-like): An (N, input_dim) batch of inputs
+
+        Returns:
+            numpy.ndarray: An (N, output_dim) array of outputs
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self._activation_fns):
+            x = x @ kernel
+            x += bias
+            x = activation(x)
+        return x
+
+    def predict(self, x, **kwargs):
+        return self.predict_on_batch(x)
@@ -0,0 +1,205 @@
+# ai-module/prediction_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def feature_key(model_name, model_version, features):
+    """
+    Build a cache key for a feature vector.
+
+    Features are normalized to floats first so that e.g. [3, 0, ...] and
+    [3.0, 0.0, ...] share an entry, and the model name and version are part
+    of the key so a newly loaded model never sees the old model's results.
+
+    Returns:
+        str: The cache key
+    """
+    canonical = ','.join(repr(float(value)) for value in features)
+    digest = hashlib.sha1(canonical.encode()).hexdigest()
+    return f"prediction:{model_name}:{model_version}:{digest}"
+
+
+class RedisBackend:
+    """
+    Shared cache tier so every gunicorn worker benefits from each other's
+    predictions. Requires the `redis` package.
+    """
+
+    def __init__(self, url, ttl_seconds):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PREDICTION_CACHE_URL is set but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys):
+        values = self.client.mget(keys)
+        return [json.loads(value) if value is not None else None for value in values]
+
+    def set_many(self, items):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items:
+            pipe.set(key, json.dumps(value), ex=int(self.ttl_seconds))
+        pipe.execute()
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a TTL for model outputs.
+
+    A local in-process LRU is always consulted first; when a shared backend
+    is configured it is checked on local misses and written on every store.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=3600, shared_url=None, enabled=True):
+        """
+        Args:
+            max_entries (int): Maximum entries kept in the local LRU
+            ttl_seconds (float): How long an entry stays valid
+            shared_url (str): Optional redis:// URL for a cache shared between workers
+            enabled (bool): When False every lookup is a miss and nothing is stored
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and max_entries > 0
+        self.shared = RedisBackend(shared_url, ttl_seconds) if (self.enabled and shared_url) else None
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._model_version = None
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._shared_errors = 0
+
+    def bind_version(self, model_version):
+        """
+        Drop every local entry when the model version changes.
+
+        Old entries could never be hit again because the version is part of
+        the key; clearing them frees the space straight away.
+        """
+        if model_version == self._model_version:
+            return
+        with self._lock:
+            if model_version != self._model_version:
+                if self._model_version is not None:
+                    self._entries.clear()
+                self._model_version = model_version
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once.
+
+        Returns:
+            list: The cached value for each key, or None on a miss
+        """
+        if not self.enabled:
+            return [None] * len(keys)
+
+        now = time.monotonic()
+        results = []
+        missing = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    self._expirations += 1
+                    entry = None
+                if entry is None:
+                    results.append(None)
+                    missing.append(index)
+                else:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    results.append(entry[0])
+
+        if missing and self.shared is not None:
+            try:
+                shared_values = self.shared.get_many([keys[index] for index in missing])
+            except Exception as e:
+                print(f"Error reading shared prediction cache: {e}")
+                self._shared_errors += 1
+                shared_values = [None] * len(missing)
+            still_missing = []
+            local_items = []
+            for index, value in zip(missing, shared_values):
+                if value is None:
+                    still_missing.append(index)
+                else:
+                    results[index] = value
+                    local_items.append((keys[index], value))
+            self._store_local(local_items)
+            with self._lock:
+                self._shared_hits += len(missing) - len(still_missing)
+            missing = still_missing
+
+        with self._lock:
+            self._misses += len(missing)
+        return results
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def set_many(self, items):
+        """
+        Store several (key, value) pairs. Values must be JSON serializable
+        when a shared backend is configured.
+        """
+        if not self.enabled or not items:
+            return
+        self._store_local(items)
+        if self.shared is not None:
+            try:
+                self.shared.set_many(items)
+            except Exception as e:
+                print(f"Error writing shared prediction cache: {e}")
+                self._shared_errors += 1
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def _store_local(self, items):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Size, hits (local and shared), misses, evictions and expirations
+        """
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'shared': self.shared is not None,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'shared_hits': self._shared_hits,
+                'misses': self._misses,
+                'hit_rate': ((self._hits + self._shared_hits) / lookups) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'shared_errors': self._shared_errors,
+            }
@@ -1,8 +1,47 @@
 # ai-module/symptom_checker.py
-import tensorflow as tf
+import os
+import sys
 import numpy as np
 
+# Make sibling modules importable when this file is loaded by path
+_module_dir = os.path.dirname(os.path.abspath(__file__))
+if _module_dir not in sys.path:
+    sys.path.append(_module_dir)
+
+from inference_batcher import MicroBatcher
+from label_table import LABELS_DIR, load_label_table
+from metrics import INFERENCE_ROWS, INFERENCE_SECONDS
+from model_registry import registry, file_version
+from numpy_engine import NumpyDenseModel
+from prediction_cache import PredictionCache, feature_key
+
+# Inference engine: 'keras' runs the TensorFlow model, 'numpy' runs exported
+# weights (see export_weights.py) without importing TensorFlow.
+MODEL_ENGINE = os.environ.get('MODEL_ENGINE', 'keras').lower()
+# SYMPTOM_CHECKER_WEIGHTS_PATH keeps this model's weights apart from the
+# symptom classifier's when both are served by one process (run.py)
+MODEL_WEIGHTS_PATH = (
+    os.environ.get('SYMPTOM_CHECKER_WEIGHTS_PATH')
+    or os.environ.get('MODEL_WEIGHTS_PATH', 'models/symptom_checker.npz')
+)
+
+# Micro-batching parameters
+INFERENCE_BATCHING = os.environ.get('INFERENCE_BATCHING', 'true').lower() in ('true', '1', 't')
+INFERENCE_BATCH_MAX_SIZE = int(os.environ.get('INFERENCE_BATCH_MAX_SIZE', '32'))
+INFERENCE_BATCH_MAX_WAIT_US = int(os.environ.get('INFERENCE_BATCH_MAX_WAIT_US', '2000'))
+
+# Prediction cache parameters
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'true').lower() in ('true', '1', 't')
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', '10000'))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+PREDICTION_CACHE_URL = os.environ.get('PREDICTION_CACHE_URL')  # e.g. redis://localhost:6379/0
+
+# Score thresholds and the risk condition of each bin (see label_table.py)
+LABEL_TABLE_PATH = os.environ.get('SYMPTOM_CHECKER_LABELS_PATH') or os.path.join(LABELS_DIR, 'symptom_checker.json')
+
 def load_model():
+    import tensorflow as tf
+
     # In practice, load a pre-trained TensorFlow model
     # For demonstration purposes, we create a simple dummy model.
     model = tf.keras.Sequential([
@@ -13,8 +52,101 @@ def load_model():
     model.compile(optimizer='adam', loss='binary_crossentropy')
     return model
 
-# Load the model when the module is imported.
-model = load_model()
+def load_engine():
+    """
+    Loads the model for the configured inference engine.
+    
+    Returns:
+        The Keras model, or a NumpyDenseModel when MODEL_ENGINE is 'numpy'.
+    """
+    if MODEL_ENGINE == 'numpy':
+        return NumpyDenseModel.load(MODEL_WEIGHTS_PATH)
+    return load_model()
+
+# The model is loaded on first use (or by registry.warm_up()), not at import time.
+MODEL_NAME = 'symptom_checker'
+
+def model_version():
+    return file_version(MODEL_WEIGHTS_PATH)
+
+# Exported weights are versioned by content; the demo Keras model is rebuilt
+# with random weights on every load, so the registry gives it a random version.
+registry.register(
+    MODEL_NAME,
+    load_engine,
+    version=model_version if MODEL_ENGINE == 'numpy' else None
+)
+
+def get_model():
+    """
+    Returns the symptom checker model, loading it on first use.
+    """
+    return registry.get(MODEL_NAME)
+
+def predict_batch(feature_rows):
+    """
+    Runs one forward pass over a batch of symptom feature rows.
+    
+    Args:
+        feature_rows (array-like): An (N, 10) array of symptom features.
+    
+    Returns:
+        numpy.ndarray: N prediction values.
+    """
+    input_data = np.asarray(feature_rows, dtype=np.float32)
+    model = get_model()
+    with INFERENCE_SECONDS.labels(MODEL_NAME).time():
+        prediction = model.predict_on_batch(input_data)
+    INFERENCE_ROWS.labels(MODEL_NAME).inc(len(input_data))
+    return np.asarray(prediction)[:, 0]
+
+# Concurrent callers of symptom_checker() share forward passes through this batcher.
+batcher = MicroBatcher(
+    predict_batch,
+    max_batch_size=INFERENCE_BATCH_MAX_SIZE,
+    max_wait_us=INFERENCE_BATCH_MAX_WAIT_US,
+    enabled=INFERENCE_BATCHING
+)
+
+# Repeated feature vectors are answered from this cache instead of the model.
+prediction_cache = PredictionCache(
+    max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=PREDICTION_CACHE_TTL,
+    shared_url=PREDICTION_CACHE_URL,
+    enabled=PREDICTION_CACHE_ENABLED
+)
+
+def _cache_keys(feature_rows):
+    version = registry.version(MODEL_NAME)
+    prediction_cache.bind_version(version)
+    return [feature_key(MODEL_NAME, version, row) for row in feature_rows]
+
+def predict_scores(feature_rows):
+    """
+    Predicts many feature rows, running the model only for uncached rows.
+    
+    Args:
+        feature_rows (array-like): An (N, 10) array of symptom features.
+    
+    Returns:
+        numpy.ndarray: N prediction values.
+    """
+    input_data = np.asarray(feature_rows, dtype=np.float32).reshape(len(feature_rows), -1)
+    keys = _cache_keys(input_data)
+    cached = prediction_cache.get_many(keys)
+    
+    scores = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+    missing = np.flatnonzero(np.isnan(scores))
+    if missing.size:
+        # Run each distinct uncached vector through the model once
+        first_index = {}
+        for i in missing:
+            first_index.setdefault(keys[i], i)
+        unique = np.fromiter(first_index.values(), dtype=np.intp)
+        computed = dict(zip(first_index, predict_batch(input_data[unique]).tolist()))
+        scores[missing] = [computed[keys[i]] for i in missing]
+        prediction_cache.set_many(list(computed.items()))
+    return scores
 
 def symptom_checker(symptom_features):
     """
@@ -26,7 +158,44 @@ def symptom_checker(symptom_features):
     Returns:
         float: A prediction value (for example, probability that a condition is present).
     """
-    # Convert the list to a NumPy array and reshape for the model.
-    input_data = np.array(symptom_features).reshape(1, -1)
-    prediction = model.predict(input_data)
-    return float(prediction[0][0])
+    # Convert the list to a flat NumPy row; the batcher adds the batch dimension.
+    input_data = np.array(symptom_features, dtype=np.float32).reshape(-1)
+    key = _cache_keys([input_data])[0]
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    prediction = float(batcher.submit(input_data))
+    prediction_cache.set(key, prediction)
+    return prediction
+
+def get_label_table():
+    """
+    Returns the risk label table, loaded once per process.
+    """
+    return load_label_table(LABEL_TABLE_PATH)
+
+def classify_scores(scores):
+    """
+    Maps prediction values to risk condition labels.
+    
+    Args:
+        scores (array-like): One or more prediction values between 0 and 1.
+    
+    Returns:
+        numpy.ndarray: The risk condition label for each value.
+    """
+    table = get_label_table()
+    return table.conditions(table.classify(scores))
+
+def get_batching_stats():
+    """
+    Returns batch-size and queue-wait statistics for the symptom checker model.
+    """
+    return batcher.stats()
+
+def get_cache_stats():
+    """
+    Returns hit, miss and eviction counters for the prediction cache.
+    """
+    return prediction_cache.stats()
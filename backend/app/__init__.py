@@ -1 +1,188 @@
- 
\ No newline at end of file
+import os
+import sys
+from flask import Flask, jsonify
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
+from flask_sqlalchemy import SQLAlchemy
+
+from .config import Config
+
+db = SQLAlchemy()
+jwt = JWTManager()
+migrate = Migrate()
+
+# Add the ai-module directory to the Python path to share its metrics registry
+AI_MODULE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'ai-module'
+)
+if AI_MODULE_DIR not in sys.path:
+    sys.path.append(AI_MODULE_DIR)
+
+# The backend directory, so the symptom checker's `database` package is
+# importable when the app is started through the `flask` CLI
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from metrics import (
+    metrics, instrument_app, instrument_engine, merge_collectors, stats_collector, BATCHER_FIELDS, CACHE_FIELDS
+)
+from compression import install_compression
+from fast_json import install_json_provider
+
+
+def create_app(config_class=Config):
+    """
+    Create and configure the Flask application.
+
+    Args:
+        config_class: Configuration object (default: Config)
+
+    Returns:
+        Flask: The application
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    db.init_app(app)
+    jwt.init_app(app)
+    migrate.init_app(app, db)
+    CORS(app, origins=app.config['CORS_ORIGINS'])
+
+    from .routes.auth import auth
+    from .routes.symptoms import symptoms
+    from .routes.consultations import consultations
+    from .routes.prescriptions import prescriptions
+    from .routes.admin import admin
+    from .routes.sync import sync
+
+    app.register_blueprint(auth, url_prefix='/api/auth')
+    app.register_blueprint(symptoms, url_prefix='/api/symptoms')
+    app.register_blueprint(consultations, url_prefix='/api/consultations')
+    app.register_blueprint(prescriptions, url_prefix='/api/prescriptions')
+    app.register_blueprint(admin, url_prefix='/api/admin')
+    app.register_blueprint(sync, url_prefix='/api/sync')
+
+    # The symptom checker API in the same process: its database layer checks
+    # connections out of the `symptom_checker` bind engine instead of opening
+    # a pool of its own, and its model shares the registry with ai_service
+    if app.config['LEGACY_API_ENABLED']:
+        from database import db as legacy_db
+        from .routes.legacy import legacy
+
+        app.register_blueprint(legacy, url_prefix='/api')
+        with app.app_context():
+            legacy_db.use_engine(db.engines['symptom_checker'])
+
+    # flask export / import / prune-idempotency-keys / maintain-partitions (see app/cli.py).
+    # Partitions are created by `flask maintain-partitions` from cron, not
+    # here: with gunicorn's preload_app this runs in the master, and pooled
+    # connections opened now would be shared by every forked worker.
+    from .cli import register_commands
+    register_commands(app)
+
+    # Saturated password hashing pools answer 503 instead of queueing forever
+    from .services.password_service import HashingOverloaded, get_hashing_stats
+
+    @app.errorhandler(HashingOverloaded)
+    def hashing_overloaded(error):
+        response = jsonify({'error': 'Too many sign-in requests right now, please try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+    # Role/active flags for authorization checks, shared across requests
+    from .utils.identity import IdentityCache
+    identity_cache = app.extensions['identity_cache'] = IdentityCache(
+        ttl_seconds=app.config['IDENTITY_CACHE_TTL'],
+        max_entries=app.config['IDENTITY_CACHE_MAX_ENTRIES']
+    )
+
+    # Rendered GET responses and their ETags (see app/utils/response_cache.py)
+    from .utils.response_cache import ResponseCache
+    response_cache = app.extensions['response_cache'] = ResponseCache(
+        ttl_seconds=app.config['RESPONSE_CACHE_TTL'],
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES']
+    )
+
+    # Completed and in-flight Idempotency-Key requests (see app/utils/idempotency.py)
+    from .utils.idempotency import IdempotencyStore
+    idempotency_store = app.extensions['idempotency_store'] = IdempotencyStore(
+        max_entries=app.config['IDEMPOTENCY_CACHE_MAX_ENTRIES']
+    )
+
+    # Video tokens are minted on join and cached per (user, room)
+    from .services.video_service import VideoSessionService, create_provider
+    video_service = app.extensions['video_service'] = VideoSessionService(
+        create_provider(app.config),
+        token_ttl=app.config['VIDEO_TOKEN_TTL'],
+        refresh_margin=app.config['VIDEO_TOKEN_REFRESH_MARGIN'],
+        max_entries=app.config['VIDEO_TOKEN_CACHE_MAX_ENTRIES']
+    )
+
+    if app.config['QUERY_BUDGET_ENFORCED']:
+        from .utils.query_budget import count_queries
+        with app.app_context():
+            count_queries(db.engine)
+
+    # Compact JSON (orjson when installed) and negotiated gzip/brotli bodies
+    install_json_provider(app)
+    install_compression(
+        app,
+        enabled=app.config['COMPRESSION_ENABLED'],
+        min_size=app.config['COMPRESSION_MIN_SIZE'],
+        level=app.config['COMPRESSION_LEVEL'],
+        brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY']
+    )
+
+    # Request latency, query timing and a Prometheus scrape endpoint at /metrics
+    instrument_app(app, enabled=app.config['METRICS_ENABLED'], path=app.config['METRICS_PATH'])
+    if app.config['METRICS_ENABLED']:
+        with app.app_context():
+            instrument_engine(db.engine)
+
+        from .services.ai_service import MODEL_NAME, get_batching_stats, get_cache_stats
+        batchers = [stats_collector('inference_batcher', get_batching_stats, BATCHER_FIELDS, labels={'model': MODEL_NAME})]
+        caches = [stats_collector('prediction_cache', get_cache_stats, CACHE_FIELDS, labels={'model': MODEL_NAME})]
+        if app.config['LEGACY_API_ENABLED']:
+            import symptom_checker
+            from .routes.legacy import POOL_FIELDS, WRITE_BEHIND_FIELDS
+            batchers.append(stats_collector(
+                'inference_batcher', symptom_checker.get_batching_stats, BATCHER_FIELDS,
+                labels={'model': symptom_checker.MODEL_NAME}
+            ))
+            caches.append(stats_collector(
+                'prediction_cache', symptom_checker.get_cache_stats, CACHE_FIELDS,
+                labels={'model': symptom_checker.MODEL_NAME}
+            ))
+            metrics.register_collector('db_pool', stats_collector('db_pool', legacy_db.get_pool_stats, POOL_FIELDS))
+            metrics.register_collector('write_behind', stats_collector(
+                'write_behind', legacy_db.get_write_behind_stats, WRITE_BEHIND_FIELDS
+            ))
+        metrics.register_collector('inference_batcher', merge_collectors(*batchers))
+        metrics.register_collector('prediction_cache', merge_collectors(*caches))
+        metrics.register_collector('password_hash_pending', lambda: [(
+            'password_hash_pending', 'gauge', 'Password hashing jobs running or waiting',
+            [({'pool': name}, stats['pending']) for name, stats in get_hashing_stats().items()]
+        )])
+        metrics.register_collector('identity_cache', stats_collector('identity_cache', identity_cache.stats, {
+            'size': ('gauge', 'Users in the identity cache'),
+            'hits': ('counter', 'Authorization checks answered from the identity cache'),
+            'misses': ('counter', 'Authorization checks that queried the users table'),
+        }))
+        metrics.register_collector('response_cache', stats_collector('response_cache', response_cache.stats, {
+            'size': ('gauge', 'Responses in the response cache'),
+        }))
+        metrics.register_collector('idempotency_store', stats_collector('idempotency_store', idempotency_store.stats, {
+            'size': ('gauge', 'Completed Idempotency-Key responses kept in memory'),
+            'in_flight': ('gauge', 'Idempotency-Key requests running in this worker'),
+            'hits': ('counter', 'Idempotency-Key retries answered from memory'),
+        }))
+        metrics.register_collector('video_token_cache', stats_collector('video_token_cache', video_service.stats, {
+            'size': ('gauge', 'Video tokens in the cache'),
+            'hits': ('counter', 'Consultation joins answered with a cached video token'),
+        }))
+
+    return app
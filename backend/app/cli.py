@@ -0,0 +1,110 @@
+import sys
+import click
+from flask import current_app
+from .services.export_service import DATASETS, FORMATS, iter_export
+from .services import archive_service, import_service
+from .services.sync_service import prune_idempotency_keys
+from .utils.helpers import parse_datetime
+
+
+def register_commands(app):
+    """
+    Register the application's `flask` CLI commands.
+    """
+
+    @app.cli.command('export')
+    @click.argument('dataset', type=click.Choice(DATASETS))
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', help='Output format')
+    @click.option('--start', help='Only rows at or after this ISO date')
+    @click.option('--end', help='Only rows before this ISO date')
+    @click.option('--gzip', 'compress', is_flag=True, help='gzip the output')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file (default: stdout)')
+    def export(dataset, fmt, start, end, compress, output):
+        """Stream a dataset to a CSV or NDJSON file."""
+        chunks = iter_export(dataset, fmt, parse_datetime(start), parse_datetime(end), compress)
+        out = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if output:
+                out.close()
+
+    @app.cli.command('import')
+    @click.argument('dataset', type=click.Choice(import_service.DATASETS))
+    @click.argument('path', type=click.File('rb'))
+    @click.option('--format', 'fmt', type=click.Choice(import_service.FORMATS),
+                  help='Input format (default: from the file extension, else csv)')
+    @click.option('--dry-run', is_flag=True, help='Validate without saving')
+    def import_data(dataset, path, fmt, dry_run):
+        """Bulk create or update users or doctors from a CSV or NDJSON file."""
+        if fmt is None:
+            fmt = 'ndjson' if path.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+        try:
+            report = import_service.run_import(dataset, path, fmt, dry_run)
+        except import_service.BulkImportError as e:
+            raise click.ClickException(str(e))
+
+        for row in report['errors']:
+            click.echo(f"row {row['row']}: {'; '.join(row['errors'])}", err=True)
+        action = 'would be ' if dry_run else ''
+        click.echo(
+            f"{report['rows']} rows: {report['created']} {action}created, "
+            f"{report['updated']} {action}updated, {report['rejected']} rejected"
+        )
+        if report['rejected']:
+            sys.exit(1)
+
+    @app.cli.command('prune-idempotency-keys')
+    def prune_keys():
+        """Delete expired write idempotency keys."""
+        click.echo(f"{prune_idempotency_keys()} expired keys deleted")
+
+    @app.cli.command('maintain-partitions')
+    @click.option('--months-ahead', type=int, help='Future months to create partitions for')
+    @click.option('--since', type=click.DateTime(['%Y-%m']),
+                  help='Also create partitions from this month (YYYY-MM), e.g. after loading old rows')
+    @click.option('--archive-after', type=int, help='Months kept in the database besides the current one')
+    @click.option('--no-archive', is_flag=True, help='Only create partitions')
+    @click.option('--dry-run', is_flag=True, help='List the months that would be archived')
+    def maintain_partitions(months_ahead, since, archive_after, no_archive, dry_run):
+        """Create the coming months' partitions and archive cold months.
+
+        Covers symptom_checks and, with LEGACY_API_ENABLED, the symptom
+        checker's symptom_inputs and predictions. Run it daily from cron;
+        the app does no partition work when it starts.
+        """
+        # The symptom checker tables, through the symptom_checker bind
+        legacy_db = None
+        if current_app.config['LEGACY_API_ENABLED']:
+            from database import db as legacy_db
+        if months_ahead is None:
+            months_ahead = current_app.config['PARTITION_MONTHS_AHEAD']
+        if archive_after is None:
+            archive_after = current_app.config['ARCHIVE_AFTER_MONTHS']
+
+        datasets = [(archive_service.ARCHIVE_DATASET, archive_service.get_cold_months,
+                     archive_service.archive_cold_partitions)]
+        if legacy_db:
+            datasets.append((legacy_db.ARCHIVE_DATASET, legacy_db.get_cold_months, legacy_db.archive_cold_partitions))
+
+        if dry_run:
+            for dataset, get_cold_months, _ in datasets:
+                for month in get_cold_months(archive_after):
+                    click.echo(f"would archive {dataset} {month:%Y-%m}")
+            return
+
+        created = archive_service.maintain_partitions(months_ahead, since)
+        if legacy_db:
+            legacy_created = legacy_db.ensure_partitions(months_ahead, since)
+            if legacy_created is None:
+                raise click.ClickException("Could not create symptom checker partitions")
+            created += legacy_created
+        for name in created:
+            click.echo(f"created {name}")
+        if no_archive:
+            return
+        for dataset, _, archive_cold_partitions in datasets:
+            for month, stats in archive_cold_partitions(archive_after):
+                click.echo(f"archived {dataset} {month:%Y-%m}: {stats['rows']} rows, {stats['users']} users, "
+                           f"{stats['bytes'] / 1048576:.1f} MB")
@@ -1,4 +1,7 @@
-from datetime import datetime
+# Aliased: Consultation has a column named `datetime`, which would shadow the
+# datetime class inside its body
+from datetime import datetime as _dt
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from .. import db
 
 class Doctor(db.Model):
@@ -9,11 +12,21 @@ class Doctor(db.Model):
     specialization = db.Column(db.String(100))
     license_number = db.Column(db.String(50))
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # NOT NULL: the admin listing pages through (created_at, id) keysets
+    created_at = db.Column(db.DateTime, nullable=False, default=_dt.utcnow)
+    updated_at = db.Column(db.DateTime, default=_dt.utcnow, onupdate=_dt.utcnow)
+
+    __table_args__ = (
+        # Admin listing: newest-first keyset pages
+        db.Index('ix_doctors_created_at_id', 'created_at', 'id'),
+        # Sync change feed
+        db.Index('ix_doctors_updated_at_id', 'updated_at', 'id'),
+    )
 
     # Relationships
     consultations = db.relationship('Consultation', backref='doctor', lazy=True)
+    availability = db.relationship('DoctorAvailability', backref='doctor', lazy=True,
+                                   cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
@@ -26,6 +39,36 @@ class Doctor(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+class DoctorAvailability(db.Model):
+    """
+    A weekly window in which a doctor takes consultations, split into
+    fixed-length slots. Times use the same clock as consultation datetimes.
+    """
+    __tablename__ = 'doctor_availability'
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
+    weekday = db.Column(db.SmallInteger, nullable=False)  # 0 = Monday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    slot_minutes = db.Column(db.SmallInteger, nullable=False, default=30)
+
+    __table_args__ = (
+        # Slot search: every window of the searched doctors
+        db.Index('ix_doctor_availability_doctor_weekday', 'doctor_id', 'weekday'),
+        db.CheckConstraint('weekday BETWEEN 0 AND 6', name='ck_doctor_availability_weekday'),
+        db.CheckConstraint('start_time < end_time', name='ck_doctor_availability_times'),
+        db.CheckConstraint('slot_minutes > 0', name='ck_doctor_availability_slot_minutes'),
+    )
+
+    def to_dict(self):
+        return {
+            'weekday': self.weekday,
+            'start': self.start_time.strftime('%H:%M'),
+            'end': self.end_time.strftime('%H:%M'),
+            'slot_minutes': self.slot_minutes
+        }
+
 class Consultation(db.Model):
     __tablename__ = 'consultations'
 
@@ -33,12 +76,30 @@ class Consultation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
     datetime = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), default='scheduled')  # scheduled, completed, cancelled
     room_name = db.Column(db.String(100))
     room_token = db.Column(db.String(255))
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=_dt.utcnow)
+    updated_at = db.Column(db.DateTime, default=_dt.utcnow, onupdate=_dt.utcnow)
+
+    __table_args__ = (
+        # Sync change feed: a user's consultations in change order
+        db.Index('ix_consultations_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
+        # A doctor can never hold two overlapping consultations that are not
+        # cancelled. The database enforces it, so concurrent bookings of the
+        # same slot cannot both succeed; the GiST index behind the constraint
+        # also serves slot search's overlap queries. doctor_id is compared as
+        # a one-value range so no extension (btree_gist) is needed.
+        ExcludeConstraint(
+            (db.func.int4range(doctor_id, doctor_id, '[]'), '&&'),
+            (db.func.tsrange(datetime, ends_at), '&&'),
+            name='ex_consultations_doctor_time',
+            using='gist',
+            where=db.text("status <> 'cancelled'")
+        ),
+    )
 
     # Relationships
     prescription = db.relationship('Prescription', backref='consultation', uselist=False)
@@ -49,9 +110,10 @@ class Consultation(db.Model):
             'user_id': self.user_id,
             'doctor_id': self.doctor_id,
             'datetime': self.datetime.isoformat(),
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
             'status': self.status,
             'room_name': self.room_name,
             'notes': self.notes,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        } 
\ No newline at end of file
+        }
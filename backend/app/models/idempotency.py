@@ -0,0 +1,26 @@
+from datetime import datetime
+from .. import db
+
+class IdempotencyKey(db.Model):
+    """
+    The stored outcome of a client write sent with an idempotency key, so a
+    retried or re-uploaded write is answered with the first result instead
+    of being applied twice.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    scope = db.Column(db.String(50), nullable=False)  # e.g. sync:booking
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.SmallInteger, nullable=False)
+    response = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_id_key'),
+        # Pruning expired keys
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
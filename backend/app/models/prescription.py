@@ -12,6 +12,11 @@ class Prescription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Prescriptions of a user's consultations, in sync change order
+        db.Index('ix_prescriptions_consultation_id_updated_at_id', 'consultation_id', 'updated_at', 'id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
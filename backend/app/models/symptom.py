@@ -2,15 +2,27 @@ from datetime import datetime
 from .. import db
 
 class SymptomCheck(db.Model):
+    """
+    A symptom check, partitioned by month of created_at. Cold months are
+    moved to the archive (see app/services/archive_service.py), so the
+    primary key includes created_at; look checks up by id with a filter.
+    """
     __tablename__ = 'symptom_checks'
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     symptoms = db.Column(db.JSON, nullable=False)
     prediction = db.Column(db.String(255))
     confidence_score = db.Column(db.Float)
     recommendations = db.Column(db.JSON)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
+
+    __table_args__ = (
+        # A user's history, newest first, its cache version (count, max id) and
+        # the sync change feed, which orders by (created_at, id)
+        db.Index('ix_symptom_checks_user_id_created_at', 'user_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
     def to_dict(self):
         return {
@@ -21,4 +33,12 @@ class SymptomCheck(db.Model):
             'confidence_score': self.confidence_score,
             'recommendations': self.recommendations,
             'created_at': self.created_at.isoformat()
-        } 
\ No newline at end of file
+        }
+
+
+# Rows for months without a partition yet go to the default partition
+db.event.listen(
+    SymptomCheck.__table__,
+    'after_create',
+    db.DDL('CREATE TABLE symptom_checks_default PARTITION OF symptom_checks DEFAULT').execute_if(dialect='postgresql')
+)
@@ -1,6 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from .. import db
+from ..services.password_service import hash_password, verify_password
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -14,19 +14,33 @@ class User(db.Model):
     date_of_birth = db.Column(db.Date)
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # NOT NULL: the admin listing pages through (created_at, id) keysets
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Admin listing: newest-first keyset pages and email prefix search
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+        db.Index(
+            'ix_users_lower_email_prefix',
+            db.func.lower(email).label('lower_email'),
+            postgresql_ops={'lower_email': 'varchar_pattern_ops'}
+        ),
+    )
+
     # Relationships
     symptom_checks = db.relationship('SymptomCheck', backref='user', lazy=True)
     consultations = db.relationship('Consultation', backref='user', lazy=True)
-    prescriptions = db.relationship('Prescription', backref='user', lazy=True)
+    # Prescriptions have no user_id; they are reached through consultations
+    prescriptions = db.relationship('Prescription', secondary='consultations', viewonly=True, lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # The KDF runs on a bounded pool; raises HashingOverloaded when it is saturated
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Login checks run on their own pool, separate from set_password()
+        return verify_password(self.password_hash, password)
 
     def to_dict(self):
         return {
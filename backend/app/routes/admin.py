@@ -1,31 +1,90 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required
 from ..models.user import User
-from ..models.consultation import Doctor
+from ..models.consultation import Doctor, DoctorAvailability
 from .. import db
+from ..services.ai_service import get_batching_stats, get_cache_stats, get_model_stats
+from ..utils.identity import get_current_identity, invalidate_identity
+from ..utils.response_cache import invalidate_responses
+from ..services.export_service import iter_export, export_filename, ExportError
+from ..services.import_service import run_import, BulkImportError
+from ..services.scheduling_service import parse_windows, SlotUnavailable
+from ..utils.listing import Listing, ListingError, parse_bool, escape_like
+from ..utils.helpers import parse_datetime
 from functools import wraps
+from sqlalchemy import func
 
 admin = Blueprint('admin', __name__)
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        # Cached role flags; no query in the steady state
+        identity = get_current_identity()
         
-        if not user or not user.is_admin:
+        if not identity or not identity.is_active or not identity.is_admin:
             return jsonify({'error': 'Admin access required'}), 403
         
         return f(*args, **kwargs)
     return decorated_function
 
+USER_FIELDS = ['id', 'email', 'first_name', 'last_name', 'phone', 'date_of_birth',
+               'is_active', 'is_admin', 'created_at', 'updated_at']
+user_listing = Listing(
+    User,
+    fields={name: getattr(User, name) for name in USER_FIELDS},
+    default_fields=USER_FIELDS,
+    sortable=['created_at', 'email', 'id'],
+    default_sort='-created_at'
+)
+
+DOCTOR_FIELDS = ['id', 'user_id', 'specialization', 'license_number', 'is_active', 'created_at', 'updated_at']
+doctor_listing = Listing(
+    Doctor,
+    fields={name: getattr(Doctor, name) for name in DOCTOR_FIELDS},
+    default_fields=DOCTOR_FIELDS,
+    sortable=['created_at', 'id'],
+    default_sort='-created_at'
+)
+
+@admin.errorhandler(ListingError)
+def listing_error(error):
+    return jsonify({'error': str(error)}), 400
+
 @admin.route('/users', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_users():
-    users = User.query.all()
+    """
+    List users, newest first.
+    
+    Query parameters:
+    - is_active, is_admin: Filter on the flag (true/false)
+    - email_prefix: Case-insensitive email prefix search
+    - fields: Comma-separated columns to return (default: all)
+    - sort: created_at, email or id; prefix with - for descending
+    - limit: Users per page (default 50, max 500)
+    - page: Page number for offset pagination, or
+    - cursor: The next_cursor value from the previous page
+    - count: Set to false to skip the total
+    """
+    conditions = []
+    is_active = parse_bool(request.args.get('is_active'))
+    if is_active is not None:
+        conditions.append(User.is_active == is_active)
+    is_admin = parse_bool(request.args.get('is_admin'))
+    if is_admin is not None:
+        conditions.append(User.is_admin == is_admin)
+    email_prefix = request.args.get('email_prefix', '').strip().lower()
+    if email_prefix:
+        conditions.append(func.lower(User.email).like(escape_like(email_prefix) + '%', escape='\\'))
+    
+    users, pagination = user_listing.run(
+        request.args, conditions, count_key=(is_active, is_admin, email_prefix)
+    )
     return jsonify({
-        'users': [user.to_dict() for user in users]
+        'users': users,
+        'pagination': pagination
     })
 
 @admin.route('/users/<int:user_id>', methods=['GET'])
@@ -56,6 +115,8 @@ def update_user(user_id):
         user.is_admin = data['is_admin']
     
     db.session.commit()
+    invalidate_identity(user.id)
+    invalidate_responses(f'user:{user.id}')
     
     return jsonify({
         'message': 'User updated successfully',
@@ -66,9 +127,28 @@ def update_user(user_id):
 @jwt_required()
 @admin_required
 def get_doctors():
-    doctors = Doctor.query.all()
+    """
+    List doctors, newest first.
+    
+    Query parameters:
+    - is_active: Filter on the flag (true/false)
+    - specialization: Case-insensitive exact match
+    - fields, sort (created_at or id), limit, page, cursor, count: As for /users
+    """
+    conditions = []
+    is_active = parse_bool(request.args.get('is_active'))
+    if is_active is not None:
+        conditions.append(Doctor.is_active == is_active)
+    specialization = request.args.get('specialization', '').strip().lower()
+    if specialization:
+        conditions.append(func.lower(Doctor.specialization) == specialization)
+    
+    doctors, pagination = doctor_listing.run(
+        request.args, conditions, count_key=(is_active, specialization)
+    )
     return jsonify({
-        'doctors': [doctor.to_dict() for doctor in doctors]
+        'doctors': doctors,
+        'pagination': pagination
     })
 
 @admin.route('/doctors', methods=['POST'])
@@ -89,6 +169,7 @@ def create_doctor():
     
     db.session.add(doctor)
     db.session.commit()
+    invalidate_responses('doctors')
     
     return jsonify({
         'message': 'Doctor created successfully',
@@ -117,6 +198,7 @@ def update_doctor(doctor_id):
         doctor.is_active = data['is_active']
     
     db.session.commit()
+    invalidate_responses('doctors')
     
     return jsonify({
         'message': 'Doctor updated successfully',
@@ -132,7 +214,131 @@ def delete_doctor(doctor_id):
     # Soft delete by setting is_active to False
     doctor.is_active = False
     db.session.commit()
+    invalidate_responses('doctors')
     
     return jsonify({
         'message': 'Doctor deleted successfully'
-    }) 
\ No newline at end of file
+    }) 
+
+@admin.route('/doctors/<int:doctor_id>/availability', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_doctor_availability(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+    windows = sorted(doctor.availability, key=lambda w: (w.weekday, w.start_time))
+    return jsonify({
+        'doctor_id': doctor.id,
+        'windows': [window.to_dict() for window in windows]
+    })
+
+@admin.route('/doctors/<int:doctor_id>/availability', methods=['PUT'])
+@jwt_required()
+@admin_required
+def set_doctor_availability(doctor_id):
+    """
+    Replace a doctor's weekly schedule.
+    
+    Body: {"windows": [{"weekday": 0, "start": "09:00", "end": "12:00",
+    "slot_minutes": 30}, ...]} with weekday 0 = Monday. Windows on the same
+    day may not overlap. Existing bookings are kept.
+    """
+    doctor = Doctor.query.get_or_404(doctor_id)
+    try:
+        windows = parse_windows((request.get_json() or {}).get('windows'))
+    except SlotUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+    
+    DoctorAvailability.query.filter_by(doctor_id=doctor.id).delete()
+    db.session.add_all([
+        DoctorAvailability(doctor_id=doctor.id, weekday=weekday, start_time=start,
+                           end_time=end, slot_minutes=minutes)
+        for weekday, start, end, minutes in windows
+    ])
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Availability updated successfully',
+        'doctor_id': doctor.id,
+        'windows': [
+            {'weekday': weekday, 'start': start.strftime('%H:%M'), 'end': end.strftime('%H:%M'),
+             'slot_minutes': minutes}
+            for weekday, start, end, minutes in windows
+        ]
+    })
+
+@admin.route('/inference-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_inference_stats():
+    return jsonify({
+        'batching': get_batching_stats(),
+        'cache': get_cache_stats(),
+        'models': get_model_stats()
+    })
+
+@admin.route('/export/<dataset>', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_dataset(dataset):
+    """
+    Stream a whole dataset as a file download.
+    
+    Datasets: users, symptom_checks, consultations, prescriptions,
+    symptom_inputs, predictions.
+    
+    Query parameters:
+    - format: csv (default) or ndjson
+    - start, end: ISO dates; rows from start (inclusive) to end (exclusive)
+    - gzip: Set to true to compress the file on the fly
+    """
+    fmt = request.args.get('format', 'csv')
+    compress = parse_bool(request.args.get('gzip')) or False
+    try:
+        start = parse_datetime(request.args.get('start'))
+        end = parse_datetime(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates'}), 400
+    
+    try:
+        chunks = iter_export(dataset, fmt, start, end, compress)
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if compress:
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(dataset, fmt, start, end, compress)}"'
+    )
+    return response
+
+@admin.route('/import/<dataset>', methods=['POST'])
+@jwt_required()
+@admin_required
+def import_dataset(dataset):
+    """
+    Bulk create or update users or doctors from an uploaded file.
+    
+    Send the file as multipart field `file` or as the raw request body.
+    Valid rows are saved in one transaction; the response lists the errors
+    of every rejected row.
+    
+    Query parameters:
+    - format: csv (default; taken from the file name when it ends in .ndjson)
+      or ndjson
+    - dry_run: Set to true to validate without saving
+    """
+    upload = request.files.get('file')
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'ndjson' if upload and (upload.filename or '').endswith(('.ndjson', '.jsonl')) else 'csv'
+    dry_run = parse_bool(request.args.get('dry_run')) or False
+    
+    try:
+        report = run_import(dataset, upload.stream if upload else request.stream, fmt, dry_run)
+    except BulkImportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(report)
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from ..models.user import User
 from .. import db
+from ..utils.identity import invalidate_identity
+from ..utils.response_cache import cached_response, invalidate_responses
 from datetime import timedelta
 
 auth = Blueprint('auth', __name__)
@@ -58,8 +60,14 @@ def login():
     
     return jsonify({'error': 'Invalid email or password'}), 401
 
+def _me_version():
+    row = db.session.query(User.updated_at).filter(User.id == get_jwt_identity()).first()
+    # Unknown users are not cached (the view answers 404)
+    return tuple(row) if row else None
+
 @auth.route('/me', methods=['GET'])
 @jwt_required()
+@cached_response(lambda: f'user:{get_jwt_identity()}', _me_version)
 def get_current_user():
     current_user_id = get_jwt_identity()
     user = User.query.get(current_user_id)
@@ -92,5 +100,7 @@ def update_current_user():
         user.set_password(data['password'])
     
     db.session.commit()
+    invalidate_identity(user.id)
+    invalidate_responses(f'user:{user.id}')
     
     return jsonify(user.to_dict()) 
\ No newline at end of file
@@ -3,27 +3,92 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.consultation import Consultation, Doctor
 from ..models.user import User
 from .. import db
+from ..utils.query_budget import query_budget
+from ..utils.listing import parse_bool
+from ..services.scheduling_service import (
+    find_free_slots, book_slot, SlotUnavailable, SlotConflict
+)
+from ..services.video_service import get_video_service, VideoUnavailable
+from ..utils.idempotency import idempotent, commit_write
+from ..utils.response_cache import cached_response
 from datetime import datetime
-import uuid
-from twilio.jwt.access_token import AccessToken
-from twilio.jwt.access_token.grants import VideoGrant
-from twilio.rest import Client
+from fast_json import list_payload
 
 consultations = Blueprint('consultations', __name__)
 
-# Initialize Twilio client
-twilio_client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+def _doctors_version():
+    if parse_bool(request.args.get('next_slot')):
+        # Free slots change with every booking; not cached
+        return None
+    query = db.session.query(db.func.count(Doctor.id), db.func.max(Doctor.updated_at)).filter(Doctor.is_active.is_(True))
+    specialization = request.args.get('specialization', '').strip().lower()
+    if specialization:
+        query = query.filter(db.func.lower(Doctor.specialization) == specialization)
+    return tuple(query.one())
 
 @consultations.route('/doctors', methods=['GET'])
 @jwt_required()
+@query_budget(7)
+@cached_response(lambda: 'doctors', _doctors_version)
 def get_doctors():
-    doctors = Doctor.query.filter_by(is_active=True).all()
+    """
+    List active doctors.
+    
+    Query parameters:
+    - specialization: Case-insensitive exact match
+    - next_slot: Set to true to add each doctor's next free slot (or null)
+    - compact: Set to true for columnar doctors (columns and rows)
+    """
+    query = Doctor.query.filter_by(is_active=True)
+    specialization = request.args.get('specialization', '').strip().lower()
+    if specialization:
+        query = query.filter(db.func.lower(Doctor.specialization) == specialization)
+    doctors = [doctor.to_dict() for doctor in query.all()]
+    
+    if parse_bool(request.args.get('next_slot')):
+        # One search over all of them instead of one per doctor
+        next_slots = {
+            slot['doctor_id']: slot
+            for slot in find_free_slots(specialization or None, first_per_doctor=True)
+        }
+        for doctor in doctors:
+            doctor['next_slot'] = next_slots.get(doctor['id'])
+    
     return jsonify({
-        'doctors': [doctor.to_dict() for doctor in doctors]
+        'doctors': list_payload(doctors)
+    })
+
+@consultations.route('/slots', methods=['GET'])
+@jwt_required()
+@query_budget(5)
+def get_free_slots():
+    """
+    Find the next free consultation slots, earliest first.
+    
+    Query parameters:
+    - specialization: Only doctors with this specialization (case-insensitive)
+    - doctor_id: Only this doctor
+    - from: ISO datetime to search from (default: now)
+    - limit: Slots to return (default 10, max SLOT_SEARCH_MAX)
+    - days: Days ahead to search (max SLOT_SEARCH_DAYS)
+    """
+    try:
+        doctor_id = int(request.args['doctor_id']) if request.args.get('doctor_id') else None
+        start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+        limit = int(request.args.get('limit', 10))
+        days = int(request.args['days']) if request.args.get('days') else None
+    except ValueError:
+        return jsonify({'error': 'doctor_id, limit and days must be integers and from an ISO datetime'}), 400
+    
+    slots = find_free_slots(request.args.get('specialization'), doctor_id, start, limit, days)
+    return jsonify({
+        'slots': slots
     })
 
 @consultations.route('/book', methods=['POST'])
 @jwt_required()
+@idempotent
+@query_budget(5)
 def book_consultation():
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -31,26 +96,16 @@ def book_consultation():
     # Validate doctor exists and is active
     doctor = Doctor.query.filter_by(id=data['doctor_id'], is_active=True).first_or_404()
     
-    # Create consultation
-    consultation = Consultation(
-        user_id=current_user_id,
-        doctor_id=data['doctor_id'],
-        datetime=datetime.fromisoformat(data['datetime']),
-        notes=data.get('notes')
-    )
-    
-    # Generate room name and token
-    consultation.room_name = f"consultation-{uuid.uuid4()}"
-    token = AccessToken(
-        Config.TWILIO_ACCOUNT_SID,
-        Config.TWILIO_API_KEY,
-        Config.TWILIO_API_SECRET
-    )
-    token.add_grant(VideoGrant(room=consultation.room_name))
-    consultation.room_token = token.to_jwt()
-    
-    db.session.add(consultation)
-    db.session.commit()
+    # The slot must be one of the doctor's and still free
+    try:
+        consultation = book_slot(current_user_id, doctor.id, datetime.fromisoformat(data['datetime']), data.get('notes'),
+                                 commit=False)
+    except SlotUnavailable as e:
+        return jsonify({'error': str(e)}), 400
+    except SlotConflict as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    commit_write()
     
     return jsonify({
         'message': 'Consultation booked successfully',
@@ -59,16 +114,24 @@ def book_consultation():
 
 @consultations.route('/my-consultations', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def get_my_consultations():
+    """
+    List the user's consultations, latest first.
+    
+    Query parameters:
+    - compact: Set to true for columnar consultations (columns and rows)
+    """
     current_user_id = get_jwt_identity()
     consultations = Consultation.query.filter_by(user_id=current_user_id).order_by(Consultation.datetime.desc()).all()
     
     return jsonify({
-        'consultations': [consultation.to_dict() for consultation in consultations]
+        'consultations': list_payload([consultation.to_dict() for consultation in consultations])
     })
 
 @consultations.route('/<int:consultation_id>', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def get_consultation(consultation_id):
     current_user_id = get_jwt_identity()
     consultation = Consultation.query.get_or_404(consultation_id)
@@ -81,6 +144,7 @@ def get_consultation(consultation_id):
 
 @consultations.route('/<int:consultation_id>/join', methods=['POST'])
 @jwt_required()
+@query_budget(1)
 def join_consultation(consultation_id):
     current_user_id = get_jwt_identity()
     consultation = Consultation.query.get_or_404(consultation_id)
@@ -89,21 +153,23 @@ def join_consultation(consultation_id):
     if consultation.user_id != current_user_id and consultation.doctor_id != current_user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Generate new token for joining
-    token = AccessToken(
-        Config.TWILIO_ACCOUNT_SID,
-        Config.TWILIO_API_KEY,
-        Config.TWILIO_API_SECRET
-    )
-    token.add_grant(VideoGrant(room=consultation.room_name))
+    # Reuses the user's token for this room until shortly before it expires
+    video = get_video_service()
+    try:
+        token, expires_at = video.join_token(current_user_id, consultation.room_name)
+    except VideoUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     
     return jsonify({
-        'token': token.to_jwt(),
-        'room_name': consultation.room_name
+        'token': token,
+        'room_name': consultation.room_name,
+        'expires_at': datetime.utcfromtimestamp(expires_at).isoformat() + 'Z',
+        'provider': video.provider.name
     })
 
 @consultations.route('/<int:consultation_id>/complete', methods=['POST'])
 @jwt_required()
+@query_budget(3)
 def complete_consultation(consultation_id):
     current_user_id = get_jwt_identity()
     consultation = Consultation.query.get_or_404(consultation_id)
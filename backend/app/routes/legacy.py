@@ -0,0 +1,311 @@
+import os
+import uuid
+import numpy as np
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+
+# The symptom checker model, registered with the shared model registry and
+# loaded on first use
+from symptom_checker import symptom_checker, predict_scores, classify_scores, get_batching_stats, get_cache_stats
+from model_registry import registry as model_registry
+from fast_json import list_payload
+
+from database.db import (
+    create_user,
+    get_user_by_email,
+    save_symptom_input,
+    save_prediction,
+    save_symptom_batch,
+    get_user_history_page,
+    iter_user_history,
+    queue_symptom_check,
+    get_pool_stats,
+    get_write_behind_stats,
+    WRITE_BEHIND_ENABLED
+)
+from ..utils.listing import parse_bool
+
+# The symptom checker API (/api/users, /api/symptom-checker, /api/health),
+# mounted at /api by create_app() and by the standalone backend/app.py
+legacy = Blueprint('legacy', __name__)
+
+# Largest number of feature vectors accepted by the batch endpoint
+MAX_BATCH_SIZE = int(os.environ.get('SYMPTOM_BATCH_MAX_SIZE', '5000'))
+
+# Default and maximum number of symptom inputs per history page
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', '50'))
+HISTORY_PAGE_MAX = int(os.environ.get('HISTORY_PAGE_MAX', '500'))
+
+# Fields of the connection pool and write-behind queue stats exported to /metrics
+POOL_FIELDS = {
+    'in_use': ('gauge', 'Connections checked out of the pool'),
+    'idle': ('gauge', 'Idle connections in the pool'),
+    'max_size': ('gauge', 'Maximum pool size'),
+    'waits': ('counter', 'Checkouts that had to wait for a connection'),
+    'timeouts': ('counter', 'Checkouts that timed out'),
+    'checkout_ms_avg': ('gauge', 'Mean connection checkout time in milliseconds'),
+}
+WRITE_BEHIND_FIELDS = {
+    'queue_depth': ('gauge', 'Symptom checks waiting to be written'),
+    'written': ('counter', 'Symptom checks written in the background'),
+    'rejected': ('counter', 'Symptom checks written synchronously because the queue was full'),
+    'failures': ('counter', 'Failed background flushes'),
+    'dead_lettered': ('counter', 'Symptom checks that could not be written and were dead-lettered'),
+    'flush_ms_avg': ('gauge', 'Mean background flush time in milliseconds'),
+}
+
+def validate_features(features):
+    """
+    Check a feature vector has 10 numeric values.
+
+    Returns:
+        str: An error message, or None if the vector is valid
+    """
+    if not isinstance(features, list) or len(features) != 10:
+        return "Expected 10 features."
+    if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in features):
+        return "Features must be numbers."
+    return None
+
+@legacy.route('/users', methods=['POST'])
+def register_user():
+    """
+    Register a new user.
+
+    Expects JSON body with:
+    - name: User's full name
+    - email: User's email address
+    """
+    data = request.get_json()
+    name = data.get('name')
+    email = data.get('email')
+
+    if not name or not email:
+        return jsonify({"error": "Name and email are required"}), 400
+
+    # Check if user already exists
+    existing_user = get_user_by_email(email)
+    if existing_user:
+        return jsonify({"error": "User with this email already exists"}), 409
+
+    # Create new user
+    user = create_user(name, email)
+    if not user:
+        return jsonify({"error": "Failed to create user"}), 500
+
+    return jsonify({"user": user}), 201
+
+@legacy.route('/users/login', methods=['POST'])
+def login_user():
+    """
+    Login a user by email.
+
+    Expects JSON body with:
+    - email: User's email address
+    """
+    data = request.get_json()
+    email = data.get('email')
+
+    if not email:
+        return jsonify({"error": "Email is required"}), 400
+
+    # Get user by email
+    user = get_user_by_email(email)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    return jsonify({"user": user}), 200
+
+@legacy.route('/symptom-checker', methods=['POST'])
+def symptom_checker_endpoint():
+    """
+    Process symptom data and return prediction.
+
+    Expects JSON body with:
+    - user_id: UUID of the user (optional if not authenticated)
+    - features: List of 10 symptom severity values
+    """
+    data = request.get_json()
+    user_id = data.get('user_id')
+    features = data.get('features', [])
+
+    # Validate input
+    if not features or len(features) != 10:
+        return jsonify({"error": "Invalid input. Expected 10 features."}), 400
+
+    # If user_id is provided, validate and save to database
+    if user_id:
+        try:
+            # Convert user_id string to UUID
+            user_id_uuid = uuid.UUID(user_id)
+
+            # Save symptom input to database (with write-behind it is saved
+            # together with the prediction after responding)
+            input_data = None
+            if not WRITE_BEHIND_ENABLED:
+                input_data = save_symptom_input(user_id, features)
+                if not input_data:
+                    return jsonify({"error": "Failed to save symptom input"}), 500
+        except ValueError:
+            return jsonify({"error": "Invalid user ID format"}), 400
+    else:
+        # If no user_id, create a temporary input data structure
+        input_data = {
+            'input_id': None,
+            'timestamp': None,
+            'features': features
+        }
+
+    # Get prediction from the AI module
+    confidence_score = symptom_checker(features)
+
+    # Determine condition based on confidence score (simplified example)
+    predicted_condition = str(classify_scores(confidence_score))
+
+    # Create prediction data
+    prediction = {
+        'predicted_condition': predicted_condition,
+        'confidence_score': confidence_score
+    }
+
+    # Queue input and prediction for the background writer
+    if user_id and WRITE_BEHIND_ENABLED:
+        queued = queue_symptom_check(user_id, features, predicted_condition, confidence_score)
+        if not queued:
+            return jsonify({"error": "Failed to save symptom input"}), 500
+        input_data, prediction = queued
+
+    # Save prediction to database if user is authenticated
+    elif user_id and input_data.get('input_id'):
+        saved_prediction = save_prediction(input_data['input_id'], predicted_condition, confidence_score)
+        if saved_prediction:
+            prediction = saved_prediction
+
+    return jsonify({
+        "input": input_data,
+        "prediction": prediction
+    })
+
+@legacy.route('/symptom-checker/batch', methods=['POST'])
+def symptom_checker_batch_endpoint():
+    """
+    Process many symptom screenings in one request.
+
+    Expects JSON body with:
+    - user_id: UUID of the user (optional if not authenticated)
+    - features: List of feature vectors, each a list of 10 symptom severity values
+
+    All vectors are scored in one model call and, if user_id is provided,
+    saved in a single transaction.
+    """
+    data = request.get_json()
+    user_id = data.get('user_id')
+    batch = data.get('features', [])
+
+    # Validate input
+    if not isinstance(batch, list) or not batch:
+        return jsonify({"error": "Invalid input. Expected a list of feature vectors."}), 400
+    if len(batch) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Too many feature vectors. Maximum is {MAX_BATCH_SIZE}."}), 413
+
+    errors = []
+    for index, features in enumerate(batch):
+        error = validate_features(features)
+        if error:
+            errors.append({"index": index, "error": error})
+    if errors:
+        return jsonify({"error": "Invalid input.", "items": errors}), 400
+
+    if user_id:
+        try:
+            uuid.UUID(user_id)
+        except ValueError:
+            return jsonify({"error": "Invalid user ID format"}), 400
+
+    # Get predictions for every uncached vector in one forward pass
+    confidence_scores = predict_scores(np.array(batch, dtype=np.float32))
+    predicted_conditions = classify_scores(confidence_scores)
+    predictions = list(zip(predicted_conditions.tolist(), confidence_scores.tolist()))
+
+    if user_id:
+        saved = save_symptom_batch(user_id, batch, predictions)
+        if saved is None:
+            return jsonify({"error": "Failed to save symptom inputs"}), 500
+        results = [{"input": input_data, "prediction": prediction} for input_data, prediction in saved]
+    else:
+        results = [
+            {
+                "input": {'input_id': None, 'timestamp': None, 'features': features},
+                "prediction": {'predicted_condition': condition, 'confidence_score': score}
+            }
+            for features, (condition, score) in zip(batch, predictions)
+        ]
+
+    return jsonify({"results": results})
+
+@legacy.route('/users/<user_id>/history', methods=['GET'])
+def user_history(user_id):
+    """
+    Get a user's symptom input and prediction history, newest first.
+
+    Query parameters:
+    - limit: Number of symptom inputs per page (default 50, max 500)
+    - cursor: The next_cursor value from the previous page
+    - stream: Set to "ndjson" to stream the full history as newline-delimited JSON
+    - compact: Set to true for a columnar history (columns and rows)
+    - archived: Set to true to continue into archived months after the
+      database rows (see database/README.md)
+    """
+    include_archived = bool(parse_bool(request.args.get('archived')))
+    try:
+        # Convert user_id string to UUID
+        user_id_uuid = uuid.UUID(user_id)
+    except ValueError:
+        return jsonify({"error": "Invalid user ID format"}), 400
+
+    if request.args.get('stream') == 'ndjson':
+        dumps = current_app.json.dumps
+
+        def generate():
+            # One chunk per server-side cursor fetch
+            for records in iter_user_history(user_id, include_archived):
+                yield ''.join(dumps(record) + '\n' for record in records)
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        limit = int(request.args.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    limit = min(limit, HISTORY_PAGE_MAX)
+
+    try:
+        history, next_cursor = get_user_history_page(user_id, limit, request.args.get('cursor'), include_archived)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    if history is None:
+        return jsonify({"error": "Failed to load history"}), 500
+
+    return jsonify({"history": list_payload(history), "next_cursor": next_cursor})
+
+@legacy.route('/health/db', methods=['GET'])
+def db_pool_stats():
+    """
+    Get database connection pool and write-behind queue statistics.
+    """
+    return jsonify({"pool": get_pool_stats(), "write_behind": get_write_behind_stats()})
+
+@legacy.route('/health/inference', methods=['GET'])
+def inference_stats():
+    """
+    Get micro-batching and prediction cache statistics for the symptom checker model.
+    """
+    return jsonify({"batching": get_batching_stats(), "cache": get_cache_stats()})
+
+@legacy.route('/health/models', methods=['GET'])
+def model_stats():
+    """
+    Get model loading status and this worker's memory use.
+    """
+    return jsonify(model_registry.stats())
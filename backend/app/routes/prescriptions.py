@@ -1,14 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from ..models.prescription import Prescription
 from ..models.consultation import Consultation
 from ..models.user import User
 from .. import db
+from ..utils.query_budget import query_budget
+from ..utils.idempotency import idempotent, commit_write
+from ..utils.response_cache import cached_response, invalidate_responses
+from fast_json import list_payload
 
 prescriptions = Blueprint('prescriptions', __name__)
 
 @prescriptions.route('/create', methods=['POST'])
 @jwt_required()
+@idempotent
+@query_budget(3)
 def create_prescription():
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -30,34 +37,58 @@ def create_prescription():
         notes=data.get('notes')
     )
     
+    # Read before commit() expires the consultation, which would reload it
+    patient_id = consultation.user_id
     db.session.add(prescription)
-    db.session.commit()
+    commit_write()
+    invalidate_responses(f'prescriptions:{patient_id}')
     
     return jsonify({
         'message': 'Prescription created successfully',
         'prescription': prescription.to_dict()
     }), 201
 
+def _my_prescriptions_version():
+    return tuple(db.session.query(db.func.count(Prescription.id), db.func.max(Prescription.updated_at)).join(
+        Prescription.consultation
+    ).filter(Consultation.user_id == get_jwt_identity()).one())
+
 @prescriptions.route('/my-prescriptions', methods=['GET'])
 @jwt_required()
+@query_budget(2)
+@cached_response(lambda: f'prescriptions:{get_jwt_identity()}', _my_prescriptions_version)
 def get_my_prescriptions():
+    """
+    List the prescriptions from the user's consultations, newest first.
+    
+    Query parameters:
+    - compact: Set to true for columnar prescriptions (columns and rows)
+    """
     current_user_id = get_jwt_identity()
-    consultations = Consultation.query.filter_by(user_id=current_user_id).all()
-    consultation_ids = [c.id for c in consultations]
     
-    prescriptions = Prescription.query.filter(
-        Prescription.consultation_id.in_(consultation_ids)
+    # Filter through the join instead of loading every consultation first
+    prescriptions = Prescription.query.join(Prescription.consultation).filter(
+        Consultation.user_id == current_user_id
     ).order_by(Prescription.created_at.desc()).all()
     
     return jsonify({
-        'prescriptions': [prescription.to_dict() for prescription in prescriptions]
+        'prescriptions': list_payload([prescription.to_dict() for prescription in prescriptions])
     })
 
+def get_prescription_with_consultation(prescription_id):
+    """
+    Load a prescription and its consultation in one query, or abort with 404.
+    """
+    return Prescription.query.options(
+        joinedload(Prescription.consultation)
+    ).filter_by(id=prescription_id).first_or_404()
+
 @prescriptions.route('/<int:prescription_id>', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def get_prescription(prescription_id):
     current_user_id = get_jwt_identity()
-    prescription = Prescription.query.get_or_404(prescription_id)
+    prescription = get_prescription_with_consultation(prescription_id)
     
     # Ensure user is either the patient or the doctor
     if prescription.consultation.user_id != current_user_id and prescription.consultation.doctor_id != current_user_id:
@@ -67,9 +98,10 @@ def get_prescription(prescription_id):
 
 @prescriptions.route('/<int:prescription_id>', methods=['PUT'])
 @jwt_required()
+@query_budget(3)
 def update_prescription(prescription_id):
     current_user_id = get_jwt_identity()
-    prescription = Prescription.query.get_or_404(prescription_id)
+    prescription = get_prescription_with_consultation(prescription_id)
     
     # Ensure user is the doctor
     if prescription.consultation.doctor_id != current_user_id:
@@ -84,7 +116,10 @@ def update_prescription(prescription_id):
     if 'notes' in data:
         prescription.notes = data['notes']
     
+    # Read before commit() expires the consultation, which would reload it
+    patient_id = prescription.consultation.user_id
     db.session.commit()
+    invalidate_responses(f'prescriptions:{patient_id}')
     
     return jsonify({
         'message': 'Prescription updated successfully',
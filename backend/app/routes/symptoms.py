@@ -3,55 +3,70 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.symptom import SymptomCheck
 from ..models.user import User
 from .. import db
-from ..services.ai_service import get_prediction
+from ..services.ai_service import get_label_table
+from ..services.archive_service import get_archived_checks
+from ..services.symptom_service import record_symptom_check
+from ..utils.idempotency import idempotent, commit_write
+from ..utils.listing import parse_bool
+from ..utils.response_cache import cached_response, invalidate_responses
 from datetime import datetime
+from fast_json import list_payload
 
 symptoms = Blueprint('symptoms', __name__)
 
 @symptoms.route('/check', methods=['POST'])
 @jwt_required()
+@idempotent
 def check_symptoms():
     current_user_id = get_jwt_identity()
     data = request.get_json()
     
-    # Get prediction from AI model
-    prediction, confidence_score, recommendations = get_prediction(data['symptoms'])
-    
-    # Save symptom check
-    symptom_check = SymptomCheck(
-        user_id=current_user_id,
-        symptoms=data['symptoms'],
-        prediction=prediction,
-        confidence_score=confidence_score,
-        recommendations=recommendations
-    )
-    
-    db.session.add(symptom_check)
-    db.session.commit()
+    symptom_check, prediction = record_symptom_check(current_user_id, data['symptoms'])
+    commit_write()
+    invalidate_responses(f'symptoms:{current_user_id}')
     
     return jsonify({
         'message': 'Symptoms checked successfully',
-        'prediction': prediction,
-        'confidence_score': confidence_score,
-        'recommendations': recommendations,
+        'prediction': symptom_check.prediction,
+        'confidence_score': symptom_check.confidence_score,
+        'recommendations': symptom_check.recommendations,
+        'top_predictions': prediction['top_predictions'],
+        'labels_version': get_label_table().version,
         'symptom_check': symptom_check.to_dict()
     })
 
+def _history_version():
+    return tuple(db.session.query(db.func.count(SymptomCheck.id), db.func.max(SymptomCheck.id)).filter(
+        SymptomCheck.user_id == get_jwt_identity()
+    ).one())
+
 @symptoms.route('/history', methods=['GET'])
 @jwt_required()
+@cached_response(lambda: f'symptoms:{get_jwt_identity()}', _history_version)
 def get_symptom_history():
+    """
+    List the user's symptom checks, newest first.
+    
+    Query parameters:
+    - compact: Set to true for columnar symptom_checks (columns and rows)
+    - archived: Set to true to also list checks from archived months, after
+      the others
+    """
     current_user_id = get_jwt_identity()
     symptom_checks = SymptomCheck.query.filter_by(user_id=current_user_id).order_by(SymptomCheck.created_at.desc()).all()
+    symptom_checks = [check.to_dict() for check in symptom_checks]
+    if parse_bool(request.args.get('archived')):
+        symptom_checks += get_archived_checks(current_user_id)
     
     return jsonify({
-        'symptom_checks': [check.to_dict() for check in symptom_checks]
+        'symptom_checks': list_payload(symptom_checks)
     })
 
 @symptoms.route('/<int:check_id>', methods=['GET'])
 @jwt_required()
 def get_symptom_check(check_id):
     current_user_id = get_jwt_identity()
-    symptom_check = SymptomCheck.query.get_or_404(check_id)
+    symptom_check = SymptomCheck.query.filter_by(id=check_id).first_or_404()
     
     # Ensure user can only access their own symptom checks
     if symptom_check.user_id != current_user_id:
@@ -0,0 +1,42 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..services.sync_service import SyncError, sync as run_sync
+from fast_json import list_payload
+
+sync = Blueprint('sync', __name__)
+
+@sync.route('', methods=['POST'])
+@jwt_required()
+def sync_device():
+    """
+    Upload a device's queued writes and download what changed since its last sync.
+
+    Request body:
+    - cursors: Entity -> the cursor returned by the previous sync; omit an
+      entity (or send null) to get all of its rows
+    - writes: Queued writes, applied in order, each {key, type, data} where
+      key is a unique idempotency key generated on the device and type is
+      symptom_check ({symptoms}) or booking ({doctor_id, datetime, notes})
+    - entities: Entities to download (default: symptom_checks, consultations,
+      prescriptions, doctors)
+    - limit: Rows per entity (default 500)
+
+    Query parameters:
+    - compact: Set to true for columnar upserted rows (columns and rows)
+
+    Each entity's changes hold upserted rows, the ids of deleted rows, the
+    cursor to send next time and has_more when another page is waiting.
+    """
+    data = request.get_json(silent=True) or {}
+    limit = data.get('limit')
+    if limit is not None and (not isinstance(limit, int) or limit < 1):
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    try:
+        result = run_sync(get_jwt_identity(), data.get('cursors'), data.get('writes'), data.get('entities'), limit)
+    except SyncError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for changes in result['changes'].values():
+        changes['upserted'] = list_payload(changes['upserted'])
+    return jsonify(result)
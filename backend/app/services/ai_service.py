@@ -1,79 +1,250 @@
-import tensorflow as tf
+import os
+import sys
 import numpy as np
 from ..config import Config
 
-# Load the model
-model = tf.keras.models.load_model(Config.MODEL_PATH)
+# Add the ai-module directory to the Python path to share its inference helpers
+AI_MODULE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    'ai-module'
+)
+if AI_MODULE_DIR not in sys.path:
+    sys.path.append(AI_MODULE_DIR)
 
-def preprocess_symptoms(symptoms):
+from inference_batcher import MicroBatcher
+from label_table import LABELS_DIR, load_label_table, top_k
+from metrics import INFERENCE_ROWS, INFERENCE_SECONDS
+from model_registry import registry, file_version
+from numpy_engine import NumpyDenseModel
+from prediction_cache import PredictionCache, feature_key
+
+def load_model():
     """
-    Preprocess the symptoms input for the model.
-    This function should be customized based on your model's requirements.
+    Load the symptom model for the configured inference engine.
+    
+    The numpy engine reads weights exported by ai-module/export_weights.py
+    and does not import TensorFlow.
     """
-    # Convert symptoms to a format suitable for the model
-    # This is a placeholder - implement according to your model's needs
-    processed_symptoms = np.array(symptoms)
-    return processed_symptoms
+    if Config.MODEL_ENGINE == 'numpy':
+        return NumpyDenseModel.load(Config.MODEL_WEIGHTS_PATH)
+    
+    import tensorflow as tf
+    return tf.keras.models.load_model(Config.MODEL_PATH)
 
-def get_prediction(symptoms):
+# The model is loaded on first use (or by registry.warm_up()), not at import time
+MODEL_NAME = 'symptom_classifier'
+
+def model_version():
     """
-    Get prediction from the AI model.
+    Version the model by the content of the file it is loaded from.
+    """
+    if Config.MODEL_ENGINE == 'numpy':
+        return file_version(Config.MODEL_WEIGHTS_PATH)
+    return file_version(Config.MODEL_PATH)
+
+registry.register(MODEL_NAME, load_model, version=model_version)
+
+def get_model():
+    """
+    Get the symptom model, loading it on first use.
+    """
+    return registry.get(MODEL_NAME)
+
+def predict_batch(batch):
+    """
+    Run one forward pass over a batch of preprocessed symptom rows.
+    """
+    model = get_model()
+    with INFERENCE_SECONDS.labels(MODEL_NAME).time():
+        prediction = model.predict_on_batch(batch)
+    INFERENCE_ROWS.labels(MODEL_NAME).inc(len(batch))
+    return np.asarray(prediction)
+
+# Concurrent symptom checks share forward passes through this batcher
+batcher = MicroBatcher(
+    predict_batch,
+    max_batch_size=Config.INFERENCE_BATCH_MAX_SIZE,
+    max_wait_us=Config.INFERENCE_BATCH_MAX_WAIT_US,
+    enabled=Config.INFERENCE_BATCHING
+)
+
+# Repeated symptom vectors are answered from this cache instead of the model
+prediction_cache = PredictionCache(
+    max_entries=Config.PREDICTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.PREDICTION_CACHE_TTL,
+    shared_url=Config.PREDICTION_CACHE_URL,
+    enabled=Config.PREDICTION_CACHE_ENABLED
+)
+
+def predict_cached(processed_symptoms):
+    """
+    Get the model output for one preprocessed row, from the cache if possible.
+    """
+    version = registry.version(MODEL_NAME)
+    prediction_cache.bind_version(version)
+    key = feature_key(MODEL_NAME, version, np.ravel(processed_symptoms))
+    
+    prediction = prediction_cache.get(key)
+    if prediction is None:
+        prediction = np.asarray(batcher.submit(processed_symptoms)).tolist()
+        prediction_cache.set(key, prediction)
+    return np.asarray(prediction)
+
+def predict_many(processed_rows):
+    """
+    Get the model outputs for many preprocessed rows, running the model
+    once over the distinct uncached rows.
     
     Args:
-        symptoms (list): List of symptoms
+        processed_rows (numpy.ndarray): An (N, features) array
         
     Returns:
-        tuple: (prediction, confidence_score, recommendations)
+        numpy.ndarray: An (N, classes) array of model outputs
     """
-    # Preprocess symptoms
-    processed_symptoms = preprocess_symptoms(symptoms)
+    version = registry.version(MODEL_NAME)
+    prediction_cache.bind_version(version)
+    keys = [feature_key(MODEL_NAME, version, row) for row in processed_rows]
+    outputs = prediction_cache.get_many(keys)
     
-    # Get model prediction
-    prediction = model.predict(processed_symptoms)
+    missing = {}
+    for index, (key, output) in enumerate(zip(keys, outputs)):
+        if output is None:
+            missing.setdefault(key, index)
+    if missing:
+        computed = predict_batch(processed_rows[list(missing.values())]).tolist()
+        prediction_cache.set_many(list(zip(missing, computed)))
+        computed = dict(zip(missing, computed))
+        outputs = [computed[key] if output is None else output for key, output in zip(keys, outputs)]
+    return np.asarray(outputs)
+
+def preprocess_symptoms(symptoms):
+    """
+    Shape one symptom vector into a model input row.
     
-    # Get confidence score
-    confidence_score = float(np.max(prediction))
+    The batcher and predict_many() add the batch dimension.
     
-    # Get predicted class
-    predicted_class = np.argmax(prediction)
+    Raises:
+        ValueError: If the symptoms are not a flat list of numbers
+    """
+    return np.asarray(symptoms, dtype=np.float32).reshape(-1)
+
+def preprocess_batch(symptom_lists):
+    """
+    Shape many symptom vectors into an (N, features) model input.
     
-    # Get recommendations based on prediction
-    recommendations = get_recommendations(predicted_class, confidence_score)
+    Raises:
+        ValueError: If the vectors are not numbers or differ in length
+    """
+    return np.asarray(symptom_lists, dtype=np.float32).reshape(len(symptom_lists), -1)
+
+def get_label_table():
+    """
+    Get the table mapping the model's classes to conditions and
+    recommendations, loaded once per process.
+    """
+    return load_label_table(Config.LABEL_TABLE_PATH or os.path.join(LABELS_DIR, 'symptom_classifier.json'))
+
+def label_predictions(probabilities, k=None):
+    """
+    Turn model outputs into conditions, recommendations and the top classes.
     
-    return predicted_class, confidence_score, recommendations
+    Args:
+        probabilities (array-like): An (N, classes) array of model outputs
+        k (int): Classes reported per row (default PREDICTION_TOP_K)
+        
+    Returns:
+        list: One dict per row with prediction (the most likely condition),
+              confidence_score, recommendations and top_predictions, the
+              k most likely classes with their conditions and probabilities
+              (classes past the end of the label table share its default condition)
+    """
+    table = get_label_table()
+    classes, probabilities = top_k(probabilities, k or Config.PREDICTION_TOP_K)
+    conditions = table.conditions(classes).tolist()
+    recommendations = table.recommendations(classes[:, 0], probabilities[:, 0]).tolist()
+    return [
+        {
+            'prediction': row_conditions[0],
+            'confidence_score': row_probabilities[0],
+            'recommendations': list(row_recommendations),
+            'top_predictions': [
+                {'class': index, 'condition': condition, 'probability': probability}
+                for index, condition, probability in zip(row_classes, row_conditions, row_probabilities)
+            ],
+        }
+        for row_classes, row_conditions, row_probabilities, row_recommendations
+        in zip(classes.tolist(), conditions, probabilities.tolist(), recommendations)
+    ]
 
-def get_recommendations(predicted_class, confidence_score):
+def get_prediction(symptoms, k=None):
     """
-    Generate recommendations based on the prediction and confidence score.
+    Get prediction from the AI model.
     
     Args:
-        predicted_class (int): The predicted class from the model
-        confidence_score (float): The confidence score of the prediction
+        symptoms (list): List of symptoms
+        k (int): Conditions reported in top_predictions (default PREDICTION_TOP_K)
         
     Returns:
-        list: List of recommendations
+        dict: prediction, confidence_score, recommendations and
+              top_predictions (see label_predictions())
+    """
+    # Get model prediction, cached or batched with any concurrent requests
+    prediction = predict_cached(preprocess_symptoms(symptoms))
+    return label_predictions(prediction[np.newaxis, ...], k)[0]
+
+def get_predictions(symptom_lists, k=None):
     """
-    recommendations = []
+    Get predictions for many symptom vectors in one forward pass.
     
-    # Add recommendations based on confidence score
-    if confidence_score < 0.7:
-        recommendations.append("Consider consulting a healthcare professional for a more accurate diagnosis.")
+    Args:
+        symptom_lists (list): Symptom vectors of equal length
+        k (int): Conditions reported in top_predictions (default PREDICTION_TOP_K)
+        
+    Returns:
+        list: One dict per vector, as returned by get_prediction()
+    """
+    if not symptom_lists:
+        return []
+    return label_predictions(predict_many(preprocess_batch(symptom_lists)), k)
+
+def prime_predictions(symptom_lists):
+    """
+    Score symptom vectors in one forward pass ahead of time, so
+    get_prediction() answers them from the prediction cache, e.g. a device's
+    queued symptom checks before they are applied one by one.
     
-    # Add class-specific recommendations
-    if predicted_class == 0:  # Example: No serious condition
-        recommendations.extend([
-            "Monitor your symptoms and seek medical attention if they worsen.",
-            "Get adequate rest and stay hydrated."
-        ])
-    elif predicted_class == 1:  # Example: Mild condition
-        recommendations.extend([
-            "Schedule a follow-up with your healthcare provider.",
-            "Take prescribed medications as directed."
-        ])
-    else:  # Example: Serious condition
-        recommendations.extend([
-            "Seek immediate medical attention.",
-            "Do not delay treatment."
-        ])
+    Vectors the model cannot score are skipped here and fail in get_prediction().
+    """
+    if not prediction_cache.enabled or not symptom_lists:
+        return
+    try:
+        predict_many(preprocess_batch(symptom_lists))
+    except (TypeError, ValueError):
+        pass
+
+def warm_up():
+    """
+    Load every registered model ahead of the first request.
     
-    return recommendations 
\ No newline at end of file
+    Returns:
+        dict: Load time in seconds for each model
+    """
+    return registry.warm_up()
+
+def get_model_stats():
+    """
+    Get model loading status and process memory use.
+    """
+    return registry.stats()
+
+def get_batching_stats():
+    """
+    Get batch-size and queue-wait statistics for the symptom model.
+    """
+    return batcher.stats()
+
+def get_cache_stats():
+    """
+    Get hit, miss and eviction counters for the prediction cache.
+    """
+    return prediction_cache.stats()
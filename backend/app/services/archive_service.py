@@ -0,0 +1,103 @@
+from datetime import datetime
+from flask import current_app
+from .. import db
+
+from database import archive, partitions
+
+# symptom_checks is partitioned by month of created_at; archived months are
+# stored under ARCHIVE_DIR/symptom_checks
+ARCHIVE_DATASET = 'symptom_checks'
+
+# A month of checks for the archive, grouped by user, newest first
+ARCHIVE_QUERY = """
+    SELECT id, user_id, symptoms, prediction, confidence_score, recommendations, created_at
+    FROM symptom_checks
+    WHERE created_at >= %(start)s AND created_at < %(end)s
+    ORDER BY user_id, created_at DESC, id DESC
+"""
+
+
+def _raw_connection():
+    # The psycopg2 connection behind a pooled SQLAlchemy connection
+    return db.engine.raw_connection()
+
+
+def maintain_partitions(months_ahead=None, since=None):
+    """
+    Create the default partition of symptom_checks and any missing monthly
+    partitions up to `months_ahead` months ahead. Does nothing on a
+    database whose symptom_checks is not partitioned yet.
+
+    Args:
+        months_ahead (int): Future months (default PARTITION_MONTHS_AHEAD)
+        since (datetime): First month to create a partition for (default: this month)
+
+    Returns:
+        list: Names of the partitions created
+    """
+    if months_ahead is None:
+        months_ahead = current_app.config['PARTITION_MONTHS_AHEAD']
+    conn = _raw_connection()
+    try:
+        return partitions.ensure_partitions(conn, 'symptom_checks', 'created_at', months_ahead, since)
+    finally:
+        conn.close()
+
+
+def get_cold_months(archive_after_months=None):
+    """
+    Get the months of symptom_checks due for archival, oldest first.
+    """
+    if archive_after_months is None:
+        archive_after_months = current_app.config['ARCHIVE_AFTER_MONTHS']
+    cutoff = partitions.add_months(partitions.month_start(datetime.utcnow()), -archive_after_months)
+    conn = _raw_connection()
+    try:
+        return [month for month in partitions.list_partitions(conn, 'symptom_checks') if month < cutoff]
+    finally:
+        conn.close()
+
+
+def archive_cold_partitions(archive_after_months=None):
+    """
+    Move months of symptom_checks older than `archive_after_months` to
+    ARCHIVE_DIR, oldest first, dropping each month's partition once its
+    file is written.
+
+    Archived checks are left out of the sync feed and exports, and no longer
+    found by id; GET /api/symptoms/history?archived=true still lists them.
+
+    Returns:
+        list: (month, dict of rows, users and bytes written) per archived month
+    """
+    archived = []
+    for month in get_cold_months(archive_after_months):
+        conn = _raw_connection()
+        try:
+            stats = archive.archive_month(
+                conn, current_app.config['ARCHIVE_DIR'], ARCHIVE_DATASET, month, ARCHIVE_QUERY,
+                [('symptom_checks', 'created_at')], user_key='user_id', row_key='id'
+            )
+        finally:
+            conn.close()
+        archived.append((month, stats))
+    return archived
+
+
+def get_archived_checks(user_id):
+    """
+    Read a user's archived symptom checks, newest first.
+
+    Args:
+        user_id (int): The user's ID
+
+    Returns:
+        list: Symptom check dicts shaped like SymptomCheck.to_dict()
+    """
+    # Rows are archived with ISO timestamps, as to_dict() formats them
+    checks = []
+    for _, records in archive.iter_user_archive(
+        current_app.config['ARCHIVE_DIR'], ARCHIVE_DATASET, user_id, decode=False
+    ):
+        checks += records
+    return checks
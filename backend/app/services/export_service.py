@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+from sqlalchemy import select
+from .. import db
+from ..models.user import User
+from ..models.symptom import SymptomCheck
+from ..models.consultation import Consultation
+from ..models.prescription import Prescription
+
+# Rows fetched per round trip and encoded per output chunk
+EXPORT_BATCH_SIZE = 1000
+
+# Datasets served from the app database: model, exported columns and the
+# timestamp the date range applies to. Password hashes are never exported.
+MODEL_DATASETS = {
+    'users': (User, ['id', 'email', 'first_name', 'last_name', 'phone', 'date_of_birth',
+                     'is_active', 'is_admin', 'created_at', 'updated_at'], 'created_at'),
+    'symptom_checks': (SymptomCheck, ['id', 'user_id', 'symptoms', 'prediction', 'confidence_score',
+                                      'recommendations', 'created_at'], 'created_at'),
+    'consultations': (Consultation, ['id', 'user_id', 'doctor_id', 'datetime', 'ends_at', 'status', 'room_name',
+                                     'notes', 'created_at', 'updated_at'], 'datetime'),
+    'prescriptions': (Prescription, ['id', 'consultation_id', 'diagnosis', 'medications', 'notes',
+                                     'created_at', 'updated_at'], 'created_at'),
+}
+
+# Raw symptom checker tables, served from the symptom checker database
+RAW_DATASETS = ('symptom_inputs', 'predictions')
+
+DATASETS = tuple(MODEL_DATASETS) + RAW_DATASETS
+FORMATS = ('csv', 'ndjson')
+
+
+class ExportError(ValueError):
+    """
+    Raised for an unknown dataset or format.
+    """
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        # JSON columns and arrays go into a single cell
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def export_columns(dataset):
+    """
+    Get the column names a dataset is exported with.
+    """
+    if dataset in MODEL_DATASETS:
+        return list(MODEL_DATASETS[dataset][1])
+    from database.db import EXPORT_TABLES
+    return list(EXPORT_TABLES[dataset][0])
+
+
+def iter_rows(dataset, start=None, end=None):
+    """
+    Stream a dataset's rows in batches without loading it into memory.
+
+    App tables are read with a streaming (server-side on PostgreSQL)
+    SQLAlchemy result; the raw symptom checker tables through the symptom
+    checker database's pool.
+
+    Args:
+        dataset (str): One of DATASETS
+        start (datetime): Only rows at or after this time
+        end (datetime): Only rows before this time
+
+    Yields:
+        list: Batches of row dicts
+    """
+    if dataset in RAW_DATASETS:
+        from database.db import iter_export_rows
+        yield from iter_export_rows(dataset, start, end)
+        return
+
+    model, columns, time_column = MODEL_DATASETS[dataset]
+    query = select(*[getattr(model, name) for name in columns])
+    if start is not None:
+        query = query.where(getattr(model, time_column) >= start)
+    if end is not None:
+        query = query.where(getattr(model, time_column) < end)
+
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_SIZE).execute(query)
+        for partition in result.mappings().partitions(EXPORT_BATCH_SIZE):
+            yield [dict(row) for row in partition]
+
+
+def _encode_csv(columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(rows):
+        if rows is None:
+            writer.writerow(columns)
+        else:
+            writer.writerows([_csv_value(row[name]) for name in columns] for row in rows)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    return encode
+
+
+def _encode_ndjson(columns):
+    def encode(rows):
+        if rows is None:
+            return ''
+        return ''.join(json.dumps(row, default=_json_default) + '\n' for row in rows)
+
+    return encode
+
+
+def iter_export(dataset, fmt='csv', start=None, end=None, compress=False):
+    """
+    Stream a dataset as CSV or NDJSON, optionally gzip-compressed on the fly.
+
+    Memory stays constant: one batch of rows is fetched, encoded and
+    compressed at a time.
+
+    Args:
+        dataset (str): One of DATASETS
+        fmt (str): 'csv' or 'ndjson'
+        start (datetime): Only rows at or after this time
+        end (datetime): Only rows before this time
+        compress (bool): gzip the output
+
+    Returns:
+        generator: Chunks (bytes) of the export file
+
+    Raises:
+        ExportError: If the dataset or format is unknown
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"dataset must be one of: {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+
+    columns = export_columns(dataset)
+    encode = _encode_csv(columns) if fmt == 'csv' else _encode_ndjson(columns)
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    def generate():
+        chunk = emit(encode(None))
+        if chunk:
+            yield chunk
+        for rows in iter_rows(dataset, start, end):
+            chunk = emit(encode(rows))
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+
+    return generate()
+
+
+def export_filename(dataset, fmt, start=None, end=None, compress=False):
+    """
+    Build a download filename such as symptom_checks_2024-01-01_2024-02-01.csv.gz
+    """
+    parts = [dataset]
+    if start or end:
+        parts.append(start.date().isoformat() if start else 'start')
+        parts.append(end.date().isoformat() if end else 'now')
+    return '_'.join(parts) + f'.{fmt}' + ('.gz' if compress else '')
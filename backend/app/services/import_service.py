@@ -0,0 +1,394 @@
+import csv
+import io
+import json
+from datetime import date
+from flask import current_app
+from .. import db
+from ..models.user import User
+from ..models.consultation import Doctor
+from ..utils.identity import invalidate_identity
+from ..utils.response_cache import invalidate_responses
+from .password_service import hash_passwords
+
+# Rows sent per COPY statement
+IMPORT_BATCH_SIZE = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+# Accepted columns per dataset, with the type each value is parsed as
+IMPORT_COLUMNS = {
+    'users': {
+        'email': 'text',
+        'password': 'text',
+        'first_name': 'text',
+        'last_name': 'text',
+        'phone': 'text',
+        'date_of_birth': 'date',
+        'is_active': 'bool',
+        'is_admin': 'bool',
+    },
+    # A doctor's user is given by user_id or by email
+    'doctors': {
+        'user_id': 'int',
+        'email': 'text',
+        'specialization': 'text',
+        'license_number': 'text',
+        'is_active': 'bool',
+    },
+}
+
+DATASETS = tuple(IMPORT_COLUMNS)
+
+_SQL_TYPES = {'text': 'text', 'date': 'date', 'bool': 'boolean', 'int': 'bigint'}
+
+
+class BulkImportError(ValueError):
+    """
+    Raised when a whole import file is rejected (unknown dataset, format or
+    columns, too many rows). Problems with single rows go in the report.
+    """
+
+
+def _parse_value(kind, value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value) if not isinstance(value, bool) else ('true' if value else 'false')
+    value = value.strip()
+    if value == '':
+        return None
+    if kind == 'date':
+        return date.fromisoformat(value)
+    if kind == 'bool':
+        lowered = value.lower()
+        if lowered in ('true', '1', 't', 'yes'):
+            return True
+        if lowered in ('false', '0', 'f', 'no'):
+            return False
+        raise ValueError(value)
+    if kind == 'int':
+        return int(value)
+    return value
+
+
+def _iter_records(stream, fmt):
+    """
+    Yield one dict per data row of a CSV (with a header) or NDJSON file.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        # Malformed lines become rows whose only error is that they are invalid
+        yield record if isinstance(record, dict) else {None: line}
+
+
+def _parse_rows(records, columns, max_rows):
+    """
+    Parse raw records into staging rows, noting values of the wrong type.
+
+    Yields:
+        tuple: (row number, parsed values..., parse error or None)
+    """
+    for row_no, record in enumerate(records, start=1):
+        if row_no > max_rows:
+            raise BulkImportError(f"Import files are limited to {max_rows} rows")
+
+        if None in record and not isinstance(record[None], list):
+            yield (row_no,) + (None,) * len(columns) + ('row is not a JSON object',)
+            continue
+        unknown = [name for name in record if name is not None and name not in columns]
+        if unknown:
+            raise BulkImportError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+        values = []
+        problems = []
+        for name, kind in columns.items():
+            try:
+                values.append(_parse_value(kind, record.get(name)))
+            except ValueError:
+                values.append(None)
+                problems.append(f"{name} is not a valid {kind}")
+        if record.get(None):
+            problems.append("row has more values than the header")
+        yield (row_no,) + tuple(values) + ('; '.join(problems) or None,)
+
+
+def _copy_rows(cursor, table, names, rows):
+    """
+    Stage parsed rows with COPY FROM, IMPORT_BATCH_SIZE rows per statement.
+
+    Returns:
+        int: Rows staged
+    """
+    total = 0
+    batch = []
+
+    def flush():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow(['' if value is None else value for value in row])
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush()
+            total += len(batch)
+            batch = []
+    if batch:
+        flush()
+        total += len(batch)
+    return total
+
+
+def _flag(cursor, message, condition, params=None):
+    """
+    Add `message` to the errors of every staged row matching `condition`.
+    """
+    cursor.execute(
+        f"UPDATE import_rows s SET errors = array_append(s.errors, {message}) WHERE {condition}",
+        params
+    )
+
+
+def _check_lengths(cursor, model, columns):
+    for name in columns:
+        column = model.__table__.columns.get(name)
+        length = getattr(column.type, 'length', None) if column is not None else None
+        if length:
+            _flag(cursor, f"'{name} is longer than {length} characters'", f"length(s.{name}) > %s", (length,))
+
+
+def _validate_users(cursor):
+    _flag(cursor, "'email is required'", "s.email IS NULL")
+    _flag(cursor, "'email is invalid'", "s.email !~ '^[^@[:space:]]+@[^@[:space:]]+$'")
+    cursor.execute("""
+        UPDATE import_rows s
+        SET errors = array_append(s.errors, 'duplicate email (first in row ' || d.first_row || ')')
+        FROM (
+            SELECT row_no, min(row_no) OVER (PARTITION BY lower(email)) AS first_row
+            FROM import_rows WHERE email IS NOT NULL
+        ) d
+        WHERE s.row_no = d.row_no AND d.row_no > d.first_row
+    """)
+    # Rows for existing accounts update them; new accounts need a password
+    cursor.execute("""
+        UPDATE import_rows s SET user_id = u.id
+        FROM users u WHERE lower(u.email) = lower(s.email)
+    """)
+    _flag(cursor, "'password is required for new users'", "s.user_id IS NULL AND s.password IS NULL")
+    _check_lengths(cursor, User, ['email', 'first_name', 'last_name', 'phone'])
+
+
+def _validate_doctors(cursor):
+    _flag(cursor, "'user_id or email is required'", "s.user_id IS NULL AND s.email IS NULL")
+    _flag(
+        cursor,
+        "'user ' || s.user_id || ' does not exist'",
+        "s.user_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id)"
+    )
+    cursor.execute("""
+        UPDATE import_rows s SET user_id = u.id
+        FROM users u
+        WHERE s.user_id IS NULL AND lower(u.email) = lower(s.email)
+    """)
+    _flag(cursor, "'no user with email ' || s.email", "s.user_id IS NULL AND s.email IS NOT NULL")
+    cursor.execute("""
+        UPDATE import_rows s
+        SET errors = array_append(s.errors, 'duplicate user (first in row ' || d.first_row || ')')
+        FROM (
+            SELECT row_no, min(row_no) OVER (PARTITION BY user_id) AS first_row
+            FROM import_rows WHERE user_id IS NOT NULL
+        ) d
+        WHERE s.row_no = d.row_no AND d.row_no > d.first_row
+    """)
+    _flag(cursor, "'specialization is required'", "s.specialization IS NULL")
+    _flag(cursor, "'license_number is required'", "s.license_number IS NULL")
+    _check_lengths(cursor, Doctor, ['specialization', 'license_number'])
+
+
+def _hash_staged_passwords(cursor):
+    """
+    Hash the passwords of valid rows in parallel and stage the hashes.
+    """
+    cursor.execute(
+        "SELECT row_no, password FROM import_rows "
+        "WHERE cardinality(errors) = 0 AND password IS NOT NULL ORDER BY row_no"
+    )
+    pending = cursor.fetchall()
+    if not pending:
+        return
+    hashes = hash_passwords([password for _, password in pending])
+    cursor.execute("CREATE TEMP TABLE import_hashes (row_no integer PRIMARY KEY, password_hash text) ON COMMIT DROP")
+    _copy_rows(cursor, 'import_hashes', ['row_no', 'password_hash'],
+               ((row_no, password_hash) for (row_no, _), password_hash in zip(pending, hashes)))
+    cursor.execute("""
+        UPDATE import_rows s SET password_hash = h.password_hash
+        FROM import_hashes h WHERE h.row_no = s.row_no
+    """)
+
+
+def _upsert_users(cursor):
+    cursor.execute("""
+        UPDATE users u SET
+            first_name = coalesce(s.first_name, u.first_name),
+            last_name = coalesce(s.last_name, u.last_name),
+            phone = coalesce(s.phone, u.phone),
+            date_of_birth = coalesce(s.date_of_birth, u.date_of_birth),
+            is_active = coalesce(s.is_active, u.is_active),
+            is_admin = coalesce(s.is_admin, u.is_admin),
+            password_hash = coalesce(s.password_hash, u.password_hash),
+            updated_at = timezone('utc', now())
+        FROM import_rows s
+        WHERE u.id = s.user_id AND cardinality(s.errors) = 0
+        RETURNING u.id
+    """)
+    updated_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO users (email, password_hash, first_name, last_name, phone, date_of_birth,
+                           is_active, is_admin, created_at, updated_at)
+        SELECT s.email, s.password_hash, s.first_name, s.last_name, s.phone, s.date_of_birth,
+               coalesce(s.is_active, true), coalesce(s.is_admin, false),
+               timezone('utc', now()), timezone('utc', now())
+        FROM import_rows s
+        WHERE s.user_id IS NULL AND cardinality(s.errors) = 0
+        ORDER BY s.row_no
+    """)
+    return cursor.rowcount, updated_ids
+
+
+def _upsert_doctors(cursor):
+    # clock_timestamp(), not now(): rows are stamped when written rather than
+    # when a long import began, so they are not behind the sync change feed's
+    # safety lag by the time they commit
+    cursor.execute("""
+        UPDATE doctors d SET
+            specialization = s.specialization,
+            license_number = s.license_number,
+            is_active = coalesce(s.is_active, d.is_active),
+            updated_at = timezone('utc', clock_timestamp())
+        FROM import_rows s
+        WHERE d.user_id = s.user_id AND cardinality(s.errors) = 0
+    """)
+    updated = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO doctors (user_id, specialization, license_number, is_active, created_at, updated_at)
+        SELECT s.user_id, s.specialization, s.license_number, coalesce(s.is_active, true),
+               timezone('utc', clock_timestamp()), timezone('utc', clock_timestamp())
+        FROM import_rows s
+        WHERE cardinality(s.errors) = 0
+          AND NOT EXISTS (SELECT 1 FROM doctors d WHERE d.user_id = s.user_id)
+        ORDER BY s.row_no
+    """)
+    return cursor.rowcount, updated
+
+
+def run_import(dataset, stream, fmt='csv', dry_run=False):
+    """
+    Bulk create or update users or doctors from a CSV or NDJSON file.
+
+    Rows are staged in a temporary table with COPY FROM and validated with
+    set-based SQL (duplicates within the file, unknown users, missing
+    fields). Valid rows are upserted in one transaction: users match on
+    email (case-insensitive), doctors on user. Passwords are hashed in
+    parallel, and only for rows that passed validation. Invalid rows are
+    skipped and listed in the report.
+
+    Args:
+        dataset (str): 'users' or 'doctors'
+        stream: Binary file object with the import file
+        fmt (str): 'csv' (with a header row) or 'ndjson'
+        dry_run (bool): Validate and count, then roll back without writing
+
+    Returns:
+        dict: Rows read, created and updated, and the errors of each rejected
+            row (row numbers count data rows from 1)
+
+    Raises:
+        BulkImportError: If the file as a whole cannot be imported
+    """
+    if dataset not in IMPORT_COLUMNS:
+        raise BulkImportError(f"dataset must be one of: {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise BulkImportError(f"format must be one of: {', '.join(FORMATS)}")
+    if db.engine.dialect.name != 'postgresql':
+        raise BulkImportError("Bulk import requires PostgreSQL")
+
+    columns = IMPORT_COLUMNS[dataset]
+    max_rows = current_app.config.get('IMPORT_MAX_ROWS', 50000)
+
+    staging_columns = [f"{name} {_SQL_TYPES[kind]}" for name, kind in columns.items()]
+    if 'user_id' not in columns:
+        staging_columns.append('user_id bigint')
+    if 'password' in columns:
+        staging_columns.append('password_hash text')
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TEMP TABLE import_rows (
+                row_no integer PRIMARY KEY,
+                {', '.join(staging_columns)},
+                parse_error text,
+                errors text[] NOT NULL DEFAULT '{{}}'
+            ) ON COMMIT DROP
+        """)
+        total = _copy_rows(
+            cursor, 'import_rows', ['row_no'] + list(columns) + ['parse_error'],
+            _parse_rows(_iter_records(stream, fmt), columns, max_rows)
+        )
+        cursor.execute("ANALYZE import_rows")
+        _flag(cursor, "s.parse_error", "s.parse_error IS NOT NULL")
+
+        if dataset == 'users':
+            _validate_users(cursor)
+            if not dry_run:
+                _hash_staged_passwords(cursor)
+            created, updated_ids = _upsert_users(cursor)
+            updated = len(updated_ids)
+        else:
+            _validate_doctors(cursor)
+            created, updated = _upsert_doctors(cursor)
+            updated_ids = []
+
+        cursor.execute(
+            "SELECT row_no, errors FROM import_rows WHERE cardinality(errors) > 0 ORDER BY row_no"
+        )
+        errors = [{'row': row_no, 'errors': row_errors} for row_no, row_errors in cursor.fetchall()]
+    except Exception:
+        cursor.close()
+        db.session.rollback()
+        raise
+
+    cursor.close()
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        # Imports can change is_active/is_admin of existing accounts
+        for user_id in updated_ids:
+            invalidate_identity(user_id)
+            invalidate_responses(f'user:{user_id}')
+        if dataset == 'doctors':
+            invalidate_responses('doctors')
+
+    return {
+        'dataset': dataset,
+        'dry_run': dry_run,
+        'rows': total,
+        'created': created,
+        'updated': updated,
+        'rejected': len(errors),
+        'errors': errors,
+    }
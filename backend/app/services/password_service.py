@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from ..config import Config
+
+from metrics import metrics
+
+HASH_SECONDS = metrics.histogram(
+    'password_hash_duration_seconds',
+    'Time spent in the password KDF',
+    ('pool', 'operation'),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+HASH_QUEUE_WAIT_SECONDS = metrics.histogram(
+    'password_hash_queue_wait_seconds',
+    'Time password hashing jobs waited for a worker',
+    ('pool',)
+)
+HASH_REJECTED = metrics.counter(
+    'password_hash_rejected',
+    'Password hashing jobs turned away because the pool was saturated or too slow',
+    ('pool', 'reason')
+)
+
+
+class HashingOverloaded(Exception):
+    """
+    Raised when a hashing pool has no room for another job, or a job waited
+    longer than the queue timeout without being started.
+    """
+
+    def __init__(self, pool, retry_after):
+        super().__init__(f"Password hashing pool '{pool}' is overloaded")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """
+    Admission control for the deliberately slow password KDF.
+
+    The calling request thread still waits for the hash; what the pool
+    bounds is how much hashing runs and how long a request may wait for it.
+    At most `max_workers` hashes run at once, at most `max_queue` more wait
+    for a worker, and a job that is not started within `queue_timeout`
+    seconds is cancelled. A caller waits at most `timeout` seconds in all:
+    a hash still running then finishes in the background and its result is
+    dropped. Anything beyond that fails fast with HashingOverloaded, so an
+    auth burst gets 503s instead of occupying every request thread and
+    starving other routes.
+    """
+
+    def __init__(self, name, max_workers=2, max_queue=16, queue_timeout=0.5, timeout=2.0):
+        """
+        Args:
+            name (str): Pool name used in metrics and errors
+            max_workers (int): Hashes run concurrently
+            max_queue (int): Jobs allowed to wait for a worker
+            queue_timeout (float): Seconds a job may wait before it is rejected
+            timeout (float): Seconds a caller waits in all, queueing and hashing
+                (at least queue_timeout)
+        """
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.timeout = max(timeout, queue_timeout)
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+    def _get_executor(self):
+        # Threads do not survive a fork; each worker process starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f'hash-{self.name}'
+                    )
+                    self._pid = os.getpid()
+                    self._pending = 0
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self, operation, fn, *args):
+        """
+        Run `fn(*args)` on the pool and wait for its result.
+
+        Blocks the caller for at most `timeout` seconds.
+
+        Args:
+            operation (str): 'hash' or 'verify', for metrics
+
+        Raises:
+            HashingOverloaded: If the pool is full or the job waited too long
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                HASH_REJECTED.labels(self.name, 'full').inc()
+                raise HashingOverloaded(self.name, self.retry_after())
+            self._pending += 1
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            HASH_QUEUE_WAIT_SECONDS.labels(self.name).observe(started - submitted)
+            try:
+                return fn(*args)
+            finally:
+                HASH_SECONDS.labels(self.name, operation).observe(time.perf_counter() - started)
+
+        future = executor.submit(job)
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.queue_timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                HASH_REJECTED.labels(self.name, 'timeout').inc()
+                raise HashingOverloaded(self.name, self.retry_after())
+        # Already running: wait out the rest of the caller's time. A hash
+        # still running after that finishes in the background, and its
+        # done callback frees the slot.
+        try:
+            return future.result(timeout=max(0.0, submitted + self.timeout - time.perf_counter()))
+        except FutureTimeoutError:
+            HASH_REJECTED.labels(self.name, 'slow').inc()
+            raise HashingOverloaded(self.name, self.retry_after())
+
+    def retry_after(self):
+        """
+        Seconds a rejected client should wait before retrying.
+        """
+        return max(1, int(round(self.queue_timeout)))
+
+    def stats(self):
+        """
+        Get the pool's limits and current load.
+
+        Returns:
+            dict: Worker and queue limits and jobs running or waiting
+        """
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'timeout': self.timeout,
+            'pending': self._pending,
+        }
+
+
+# Logins get their own pool so a registration burst cannot lock patients out
+# and a credential-stuffing burst cannot block registrations.
+login_pool = HashingPool(
+    'login',
+    max_workers=Config.LOGIN_HASH_WORKERS,
+    max_queue=Config.LOGIN_HASH_QUEUE,
+    queue_timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT,
+    timeout=Config.PASSWORD_HASH_TIMEOUT
+)
+hash_pool = HashingPool(
+    'default',
+    max_workers=Config.PASSWORD_HASH_WORKERS,
+    max_queue=Config.PASSWORD_HASH_QUEUE,
+    queue_timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT,
+    timeout=Config.PASSWORD_HASH_TIMEOUT
+)
+
+
+def hash_password(password):
+    """
+    Hash a password on the hashing pool.
+
+    Returns:
+        str: The werkzeug password hash
+
+    Raises:
+        HashingOverloaded: If the pool is saturated
+    """
+    return hash_pool.run('hash', generate_password_hash, password)
+
+
+def hash_passwords(passwords, max_workers=None):
+    """
+    Hash many passwords at once for a bulk import.
+
+    Runs on a short-lived pool of its own rather than hash_pool, whose
+    bounded queue is sized for interactive traffic and would reject a batch.
+
+    Args:
+        passwords (list): Plain-text passwords
+        max_workers (int): Hashes run concurrently (default: IMPORT_HASH_WORKERS)
+
+    Returns:
+        list: The werkzeug password hashes, in the same order
+    """
+    def job(password):
+        started = time.perf_counter()
+        try:
+            return generate_password_hash(password)
+        finally:
+            HASH_SECONDS.labels('import', 'hash').observe(time.perf_counter() - started)
+
+    workers = max(1, int(max_workers or Config.IMPORT_HASH_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash-import') as executor:
+        return list(executor.map(job, passwords))
+
+
+def verify_password(password_hash, password, pool=None):
+    """
+    Check a password against its hash on a hashing pool.
+
+    Args:
+        password_hash (str): The stored hash
+        password (str): The password to check
+        pool (HashingPool): Pool to run on (default: the login pool)
+
+    Returns:
+        bool: Whether the password matches
+
+    Raises:
+        HashingOverloaded: If the pool is saturated
+    """
+    if not password_hash:
+        return False
+    return (pool or login_pool).run('verify', check_password_hash, password_hash, password)
+
+
+def get_hashing_stats():
+    """
+    Get load for both hashing pools.
+    """
+    return {'login': login_pool.stats(), 'default': hash_pool.stats()}
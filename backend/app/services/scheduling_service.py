@@ -0,0 +1,369 @@
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import islice
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models.consultation import Consultation, Doctor, DoctorAvailability
+from .video_service import VideoSessionService
+
+# SQLSTATE of an exclusion constraint violation
+EXCLUSION_VIOLATION = '23P01'
+
+
+class SlotUnavailable(ValueError):
+    """
+    Raised when a requested time is not a bookable slot of the doctor
+    (outside their schedule, in the past, or not on a slot boundary).
+    """
+
+
+class SlotConflict(Exception):
+    """
+    Raised when a requested slot overlaps a consultation the doctor already has.
+    """
+
+
+def to_naive(value):
+    """
+    Convert an aware datetime to the naive server-local clock consultations use.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class AvailabilityIndex:
+    """
+    In-memory index of doctors' weekly windows and booked intervals over a
+    time range, answering "is this slot free" in O(log n) and listing free
+    slots in time order across doctors.
+
+    Built from the windows of the candidate doctors and their bookings
+    overlapping the range being searched.
+    """
+
+    def __init__(self, windows, bookings):
+        """
+        Args:
+            windows (list): DoctorAvailability rows
+            bookings (list): (doctor_id, start, end) of consultations that
+                are not cancelled
+        """
+        self._windows = defaultdict(lambda: defaultdict(list))  # doctor -> weekday -> windows
+        for window in windows:
+            self._windows[window.doctor_id][window.weekday].append(
+                (window.start_time, window.end_time, window.slot_minutes)
+            )
+        for by_day in self._windows.values():
+            for day_windows in by_day.values():
+                day_windows.sort()
+
+        self._starts = defaultdict(list)
+        self._max_ends = defaultdict(list)  # running max of ends, in start order
+        for doctor_id, start, end in sorted(bookings):
+            max_ends = self._max_ends[doctor_id]
+            self._starts[doctor_id].append(start)
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    def is_free(self, doctor_id, start, end):
+        """
+        Check that no booking of the doctor overlaps [start, end).
+        """
+        # Bookings starting before `end` are [0, i); one of them overlaps
+        # when the latest end among them is after `start`
+        i = bisect_left(self._starts.get(doctor_id, ()), end)
+        return i == 0 or self._max_ends[doctor_id][i - 1] <= start
+
+    def slot_length(self, doctor_id, start):
+        """
+        Get the length of the schedule slot beginning at `start`.
+
+        Returns:
+            timedelta: The slot length, or None if no window has a slot there
+        """
+        for window_start, window_end, minutes in self._windows[doctor_id].get(start.weekday(), ()):
+            opens = datetime.combine(start.date(), window_start)
+            step = timedelta(minutes=minutes)
+            if opens <= start and start + step <= datetime.combine(start.date(), window_end):
+                if (start - opens) % step == timedelta(0):
+                    return step
+        return None
+
+    def iter_free_slots(self, doctor_id, start, until):
+        """
+        Yield (start, end, doctor_id) for each free slot of one doctor
+        beginning in [start, until), in time order.
+        """
+        by_day = self._windows.get(doctor_id)
+        if not by_day:
+            return
+        day = start.date()
+        while datetime.combine(day, time.min) < until:
+            for window_start, window_end, minutes in by_day.get(day.weekday(), ()):
+                step = timedelta(minutes=minutes)
+                slot = datetime.combine(day, window_start)
+                closes = datetime.combine(day, window_end)
+                if slot < start:
+                    # Skip ahead to the first slot boundary not in the past
+                    slot += -((slot - start) // step) * step
+                while slot + step <= closes and slot < until:
+                    if self.is_free(doctor_id, slot, slot + step):
+                        yield slot, slot + step, doctor_id
+                    slot += step
+            day += timedelta(days=1)
+
+    def free_slots(self, start, until, limit):
+        """
+        Get the first `limit` free slots across all indexed doctors.
+        """
+        merged = heapq.merge(*[self.iter_free_slots(doctor_id, start, until) for doctor_id in self._windows])
+        return list(islice(merged, limit))
+
+    def first_free_slots(self, doctor_ids, start, until):
+        """
+        Get the first free slot beginning in [start, until) of each of the
+        doctors that has one.
+        """
+        slots = (next(self.iter_free_slots(doctor_id, start, until), None) for doctor_id in doctor_ids)
+        return [slot for slot in slots if slot is not None]
+
+
+def _bookings(doctor_ids, start, until):
+    """
+    Get (doctor_id, start, end) of the doctors' consultations overlapping [start, until).
+    """
+    if not doctor_ids:
+        return []
+    query = db.session.query(Consultation.doctor_id, Consultation.datetime, Consultation.ends_at).filter(
+        Consultation.doctor_id.in_(doctor_ids),
+        Consultation.status != 'cancelled'
+    )
+    if db.engine.dialect.name == 'postgresql':
+        # Same expression as the exclusion constraint, so its GiST index is used
+        query = query.filter(
+            func.tsrange(Consultation.datetime, Consultation.ends_at).op('&&')(func.tsrange(start, until))
+        )
+    else:
+        query = query.filter(Consultation.datetime < until, Consultation.ends_at > start)
+    return query.all()
+
+
+def load_windows(specialization=None, doctor_id=None):
+    """
+    Get the weekly windows of active doctors.
+
+    Args:
+        specialization (str): Only doctors with this specialization (case-insensitive)
+        doctor_id (int): Only this doctor
+
+    Returns:
+        list: DoctorAvailability rows
+    """
+    query = DoctorAvailability.query.join(Doctor).filter(Doctor.is_active.is_(True))
+    if specialization:
+        query = query.filter(func.lower(Doctor.specialization) == specialization.strip().lower())
+    if doctor_id is not None:
+        query = query.filter(Doctor.id == doctor_id)
+    return query.all()
+
+
+def find_free_slots(specialization=None, doctor_id=None, start=None, limit=10, days=None,
+                    first_per_doctor=False):
+    """
+    Find the next free consultation slots, earliest first, across doctors.
+
+    Bookings are loaded in chunks of 1, 2, 4, ... days and the search stops
+    as soon as enough slots are found, so a busy calendar far ahead is never
+    read for a search that is answered by tomorrow's slots.
+
+    With `first_per_doctor` the search instead finds each doctor's first
+    free slot. It only stops once every doctor has one or the search window
+    ends, so a doctor is not left out because others have many earlier
+    slots, and later chunks only load the bookings of doctors still without
+    a slot.
+
+    Args:
+        specialization (str): Only doctors with this specialization
+        doctor_id (int): Only this doctor
+        start (datetime): Earliest slot start (default: now)
+        limit (int): Slots to return (capped at SLOT_SEARCH_MAX)
+        days (int): Days ahead to search (capped at SLOT_SEARCH_DAYS)
+        first_per_doctor (bool): Return only each doctor's first free slot;
+            `limit` does not apply
+
+    Returns:
+        list: Slot dicts with doctor_id, start and end
+    """
+    max_days = current_app.config.get('SLOT_SEARCH_DAYS', 14)
+    limit = max(1, min(limit, current_app.config.get('SLOT_SEARCH_MAX', 50)))
+    now = datetime.now()
+    start = max(to_naive(start) or now, now)
+    until = start + timedelta(days=min(days or max_days, max_days))
+
+    windows = load_windows(specialization, doctor_id)
+    if not windows:
+        return []
+    doctor_ids = sorted({window.doctor_id for window in windows})
+    # Slots starting near the end of a chunk run past it by up to this much
+    overhang = timedelta(minutes=max(window.slot_minutes for window in windows))
+
+    slots = []
+    chunk_start = start
+    span = timedelta(days=1)
+    while chunk_start < until and (doctor_ids if first_per_doctor else len(slots) < limit):
+        chunk_end = min(chunk_start + span, until)
+        index = AvailabilityIndex(windows, _bookings(doctor_ids, chunk_start, chunk_end + overhang))
+        if first_per_doctor:
+            found = index.first_free_slots(doctor_ids, chunk_start, chunk_end)
+            slots.extend(found)
+            found_ids = {slot_doctor for _, _, slot_doctor in found}
+            doctor_ids = [doctor for doctor in doctor_ids if doctor not in found_ids]
+        else:
+            slots.extend(index.free_slots(chunk_start, chunk_end, limit - len(slots)))
+        chunk_start = chunk_end
+        span *= 2
+    slots.sort()
+
+    return [
+        {'doctor_id': slot_doctor, 'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+        for slot_start, slot_end, slot_doctor in slots
+    ]
+
+
+def booking_end(doctor_id, start):
+    """
+    Check that `start` is a free slot of the doctor and get when it ends.
+
+    Doctors without a schedule accept any future time, for
+    CONSULTATION_MINUTES. The database constraint still rejects overlaps
+    that race past this check.
+
+    Args:
+        doctor_id (int): The doctor's ID
+        start (datetime): Requested consultation start
+
+    Returns:
+        datetime: The end of the consultation
+
+    Raises:
+        SlotUnavailable: If the time is not one of the doctor's slots
+        SlotConflict: If the slot is already booked
+    """
+    start = to_naive(start)
+    if start < datetime.now():
+        raise SlotUnavailable("Consultations cannot be booked in the past")
+
+    windows = DoctorAvailability.query.filter_by(doctor_id=doctor_id).all()
+    if windows:
+        length = AvailabilityIndex(windows, []).slot_length(doctor_id, start)
+        if length is None:
+            raise SlotUnavailable("The doctor has no consultation slot at that time")
+    else:
+        length = timedelta(minutes=current_app.config.get('CONSULTATION_MINUTES', 30))
+
+    index = AvailabilityIndex([], _bookings([doctor_id], start, start + length))
+    if not index.is_free(doctor_id, start, start + length):
+        raise SlotConflict("That slot is already booked")
+    return start + length
+
+
+def save_booking(consultation, commit=True):
+    """
+    Save a new consultation, turning a lost race for its slot into SlotConflict.
+
+    Args:
+        consultation (Consultation): The new consultation
+        commit (bool): Commit the transaction. With False the row is only
+            flushed, for callers saving more in the same transaction; they
+            roll back themselves on failure, e.g. through a savepoint.
+
+    Raises:
+        SlotConflict: If a concurrent booking took the slot first
+    """
+    db.session.add(consultation)
+    try:
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+    except IntegrityError as e:
+        if commit:
+            db.session.rollback()
+        if getattr(e.orig, 'pgcode', None) == EXCLUSION_VIOLATION:
+            raise SlotConflict("That slot is already booked")
+        raise
+
+
+def book_slot(user_id, doctor_id, start, notes=None, commit=True):
+    """
+    Book a consultation in one of a doctor's free slots.
+
+    Args:
+        user_id (int): The patient's ID
+        doctor_id (int): An active doctor's ID
+        start (datetime): The slot's start
+        notes (str): Notes for the doctor
+        commit (bool): See save_booking()
+
+    Returns:
+        Consultation: The booked consultation
+
+    Raises:
+        SlotUnavailable: If the time is not one of the doctor's slots
+        SlotConflict: If the slot is already booked
+    """
+    start = to_naive(start)
+    consultation = Consultation(
+        user_id=user_id,
+        doctor_id=doctor_id,
+        datetime=start,
+        ends_at=booking_end(doctor_id, start),
+        notes=notes
+    )
+    # Tokens are minted when a participant joins, not at booking time
+    consultation.room_name = VideoSessionService.new_room_name()
+
+    # The exclusion constraint settles concurrent bookings of the same slot
+    save_booking(consultation, commit)
+    return consultation
+
+
+def parse_windows(windows):
+    """
+    Validate a weekly schedule from a request body.
+
+    Args:
+        windows (list): Dicts with weekday (0 = Monday), start and end
+            ('HH:MM') and optional slot_minutes
+
+    Returns:
+        list: (weekday, start time, end time, slot minutes) tuples
+
+    Raises:
+        SlotUnavailable: If a window is invalid or windows overlap
+    """
+    if not isinstance(windows, list):
+        raise SlotUnavailable("windows must be a list")
+    default_minutes = current_app.config.get('CONSULTATION_MINUTES', 30)
+    parsed = []
+    for window in windows:
+        try:
+            weekday = int(window['weekday'])
+            start = time.fromisoformat(window['start'])
+            end = time.fromisoformat(window['end'])
+            minutes = int(window.get('slot_minutes') or default_minutes)
+        except (KeyError, TypeError, ValueError):
+            raise SlotUnavailable("Each window needs weekday, start and end (HH:MM)")
+        if not 0 <= weekday <= 6 or start >= end or not 0 < minutes <= 24 * 60:
+            raise SlotUnavailable(f"Invalid window: {window}")
+        parsed.append((weekday, start, end, minutes))
+
+    parsed.sort()
+    for previous, current in zip(parsed, parsed[1:]):
+        if previous[0] == current[0] and current[1] < previous[2]:
+            raise SlotUnavailable(f"Windows overlap on weekday {current[0]}")
+    return parsed
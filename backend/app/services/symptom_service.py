@@ -0,0 +1,33 @@
+from .. import db
+from ..models.symptom import SymptomCheck
+from .ai_service import get_prediction
+
+
+def record_symptom_check(user_id, symptoms):
+    """
+    Run the symptom checker and add the result to the user's history.
+
+    The row is flushed, not committed, so callers can save it together with
+    other changes.
+
+    Args:
+        user_id (int): The user's ID
+        symptoms (list): The symptom features
+
+    Returns:
+        tuple: (SymptomCheck, the prediction from ai_service.get_prediction(),
+                including its top_predictions)
+    """
+    # Get prediction from AI model
+    prediction = get_prediction(symptoms)
+
+    symptom_check = SymptomCheck(
+        user_id=user_id,
+        symptoms=symptoms,
+        prediction=prediction['prediction'],
+        confidence_score=prediction['confidence_score'],
+        recommendations=prediction['recommendations']
+    )
+    db.session.add(symptom_check)
+    db.session.flush()
+    return symptom_check, prediction
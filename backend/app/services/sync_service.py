@@ -0,0 +1,291 @@
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+from .. import db
+from ..models.consultation import Consultation, Doctor
+from ..models.idempotency import IdempotencyKey
+from ..models.prescription import Prescription
+from ..models.symptom import SymptomCheck
+from ..utils.idempotency import IN_PROGRESS
+from ..utils.response_cache import invalidate_responses
+from .scheduling_service import SlotConflict, SlotUnavailable, book_slot
+from .ai_service import prime_predictions
+from .symptom_service import record_symptom_check
+
+
+class SyncError(ValueError):
+    """
+    Raised for an invalid sync request or queued write; answered with 400.
+    """
+
+
+def _symptom_checks(user_id):
+    # Append-only: a check never changes after it is created
+    return SymptomCheck.query.filter(SymptomCheck.user_id == user_id), SymptomCheck.created_at, None
+
+
+def _consultations(user_id):
+    return Consultation.query.filter(Consultation.user_id == user_id), Consultation.updated_at, None
+
+
+def _prescriptions(user_id):
+    query = Prescription.query.join(Prescription.consultation).filter(Consultation.user_id == user_id)
+    return query, Prescription.updated_at, None
+
+
+def _doctors(user_id):
+    # Deleting a doctor deactivates them, which bumps updated_at
+    return Doctor.query, Doctor.updated_at, Doctor.is_active.is_(False)
+
+
+# Entity -> function of the user returning (rows the user can see, change
+# timestamp column, tombstone condition or None)
+FEEDS = {
+    'symptom_checks': _symptom_checks,
+    'consultations': _consultations,
+    'prescriptions': _prescriptions,
+    'doctors': _doctors,
+}
+
+
+def encode_cursor(changed_at, row_id):
+    payload = json.dumps([changed_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        changed_at, row_id = json.loads(payload)
+        return datetime.fromisoformat(changed_at), int(row_id)
+    except (TypeError, ValueError):
+        raise SyncError("Invalid cursor")
+
+
+def get_changes(entity, user_id, cursor=None, limit=None):
+    """
+    Get one page of an entity's rows changed since a cursor, oldest change first.
+
+    Rows are ordered by (change timestamp, id), and the cursor is the last
+    pair a client has seen. A row's timestamp is set before its transaction
+    commits, so a slow transaction can commit a change stamped earlier than
+    one already synced. The cursor returned with the last page therefore
+    never passes SYNC_SAFETY_LAG seconds ago; changes inside that window are
+    sent again on the next sync, and clients apply rows by id so repeats are
+    harmless.
+
+    Args:
+        entity (str): One of FEEDS
+        user_id (int): The syncing user
+        cursor (str): The cursor from the previous sync, or None for everything
+        limit (int): Rows per page (default SYNC_PAGE_SIZE, capped at SYNC_PAGE_MAX)
+
+    Returns:
+        dict: upserted (row dicts), deleted (ids), cursor and has_more
+    """
+    query, changed_at, deleted = FEEDS[entity](user_id)
+    model = query.column_descriptions[0]['entity']
+    limit = max(1, min(limit or current_app.config['SYNC_PAGE_SIZE'], current_app.config['SYNC_PAGE_MAX']))
+
+    since = decode_cursor(cursor) if cursor else None
+    if since is not None:
+        query = query.filter(tuple_(changed_at, model.id) > since)
+    elif deleted is not None:
+        # A first sync has nothing to delete on the device
+        query = query.filter(~deleted)
+    rows = query.add_columns(deleted if deleted is not None else db.false()).order_by(
+        changed_at, model.id
+    ).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    upserted, deleted_ids = [], []
+    for row, is_deleted in rows:
+        if is_deleted:
+            deleted_ids.append(row.id)
+        else:
+            upserted.append(row.to_dict())
+
+    last = (getattr(rows[-1][0], changed_at.key), rows[-1][0].id) if rows else since
+    if not has_more:
+        horizon = (datetime.utcnow() - timedelta(seconds=current_app.config['SYNC_SAFETY_LAG']), 0)
+        last = min(last, horizon) if last is not None else horizon
+
+    return {
+        'upserted': upserted,
+        'deleted': deleted_ids,
+        'cursor': encode_cursor(*last),
+        'has_more': has_more,
+    }
+
+
+def _write_symptom_check(user_id, data):
+    symptoms = data.get('symptoms')
+    if not isinstance(symptoms, list):
+        raise SyncError("symptoms must be a list")
+    symptom_check, _ = record_symptom_check(user_id, symptoms)
+    return 201, {'symptom_check': symptom_check.to_dict()}
+
+
+def _write_booking(user_id, data):
+    try:
+        start = datetime.fromisoformat(data['datetime'])
+        doctor_id = int(data['doctor_id'])
+    except (KeyError, TypeError, ValueError):
+        raise SyncError("A booking needs doctor_id and an ISO datetime")
+    doctor = Doctor.query.filter_by(id=doctor_id, is_active=True).first_or_404()
+    consultation = book_slot(user_id, doctor.id, start, data.get('notes'), commit=False)
+    return 201, {'consultation': consultation.to_dict()}
+
+
+# Queued client write type -> handler(user_id, data) returning (status, body).
+# Handlers flush but do not commit.
+WRITE_HANDLERS = {
+    'symptom_check': _write_symptom_check,
+    'booking': _write_booking,
+}
+
+
+def _request_hash(write_type, data):
+    canonical = json.dumps([write_type, data], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return 422, {'error': 'Idempotency key was already used for a different write'}, False
+    return record.status_code, record.response, True
+
+
+def apply_write(user_id, write):
+    """
+    Apply one queued client write exactly once.
+
+    The write's idempotency key is stored with its outcome in the same
+    transaction as the write itself, so a write uploaded again (after a lost
+    response, or from a second queue flush running at the same time) gets
+    the first outcome back instead of being applied twice.
+
+    Args:
+        user_id (int): The syncing user
+        write (dict): key, type (one of WRITE_HANDLERS) and data
+
+    Returns:
+        dict: key, status, body and whether the outcome was replayed
+    """
+    if not isinstance(write, dict):
+        write = {}
+    key = write.get('key')
+    write_type = write.get('type')
+    data = write.get('data') or {}
+
+    def result(status, body, replayed=False):
+        return {'key': key, 'status': status, 'body': body, 'replayed': replayed}
+
+    if not isinstance(key, str) or not 0 < len(key) <= 255:
+        return result(400, {'error': 'Each write needs a key of at most 255 characters'})
+    handler = WRITE_HANDLERS.get(write_type)
+    if handler is None or not isinstance(data, dict):
+        return result(400, {'error': f"Unknown write type: {write_type}"})
+    request_hash = _request_hash(write_type, data)
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing is not None:
+        return result(*_replay(existing, request_hash))
+
+    # Claim the key first: a concurrent upload of the same write waits on
+    # the unique index until this transaction ends, then replays its outcome
+    record = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        scope=f'sync:{write_type}',
+        request_hash=request_hash,
+        status_code=IN_PROGRESS,
+        expires_at=datetime.utcnow() + timedelta(days=current_app.config['SYNC_KEY_TTL_DAYS'])
+    )
+    db.session.add(record)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return result(*_replay(IdempotencyKey.query.filter_by(user_id=user_id, key=key).one(), request_hash))
+
+    try:
+        with db.session.begin_nested():
+            status, body = handler(user_id, data)
+    except HTTPException as e:
+        status, body = e.code, {'error': e.description}
+    except (SyncError, SlotUnavailable, SlotConflict) as e:
+        status, body = 409 if isinstance(e, SlotConflict) else 400, {'error': str(e)}
+    except Exception:
+        # Not stored, so the device can retry it; the rest of its queue still goes through
+        db.session.rollback()
+        current_app.logger.exception("Queued %s write failed", write_type)
+        return result(500, {'error': 'The write could not be applied'})
+
+    # Failures above are deterministic, so they are stored and replayed too
+    record.status_code = status
+    record.response = body
+    db.session.commit()
+    if write_type == 'symptom_check' and status == 201:
+        invalidate_responses(f'symptoms:{user_id}')
+    return result(status, body)
+
+
+def sync(user_id, cursors=None, writes=None, entities=None, limit=None):
+    """
+    Apply a device's queued writes, then send what changed since its last sync.
+
+    Args:
+        user_id (int): The syncing user
+        cursors (dict): Entity -> cursor from the previous sync
+        writes (list): Queued writes, see apply_write()
+        entities (list): Entities to send (default: all of FEEDS)
+        limit (int): Rows per entity
+
+    Returns:
+        dict: writes (one result per queued write, in order) and changes by entity
+
+    Raises:
+        SyncError: If the request is malformed
+    """
+    cursors = cursors or {}
+    writes = writes or []
+    entities = entities or list(FEEDS)
+    if not isinstance(cursors, dict) or not isinstance(writes, list) or not isinstance(entities, list):
+        raise SyncError("cursors must be an object, writes and entities lists")
+    unknown = [entity for entity in entities if entity not in FEEDS]
+    if unknown:
+        raise SyncError(f"Unknown entities: {', '.join(map(str, unknown))}")
+    if len(writes) > current_app.config['SYNC_MAX_WRITES']:
+        raise SyncError(f"At most {current_app.config['SYNC_MAX_WRITES']} writes per sync")
+
+    # Score the queued symptom checks together; each write then finds its
+    # prediction in the cache instead of running the model on its own
+    prime_predictions([
+        write['data']['symptoms'] for write in writes
+        if isinstance(write, dict) and write.get('type') == 'symptom_check'
+        and isinstance(write.get('data'), dict) and isinstance(write['data'].get('symptoms'), list)
+    ])
+    results = [apply_write(user_id, write) for write in writes]
+    changes = {entity: get_changes(entity, user_id, cursors.get(entity), limit) for entity in entities}
+    return {'writes': results, 'changes': changes}
+
+
+def prune_idempotency_keys():
+    """
+    Delete expired idempotency keys.
+
+    Returns:
+        int: Keys deleted
+    """
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow()).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return deleted
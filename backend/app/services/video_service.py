@@ -0,0 +1,197 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import current_app
+import jwt
+
+from metrics import metrics
+
+TOKENS_MINTED = metrics.counter(
+    'video_tokens_minted',
+    'Video access tokens minted (cache misses)',
+    ('provider',)
+)
+
+
+class VideoUnavailable(Exception):
+    """
+    Raised when the video provider is not configured.
+    """
+
+
+class TwilioVideoProvider:
+    """
+    Twilio Video. The SDK is imported, and the REST client built, on first
+    use rather than when the routes are imported.
+    """
+
+    name = 'twilio'
+
+    def __init__(self, account_sid, auth_token, api_key, api_secret):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The Twilio REST client, for room management.
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def mint_token(self, identity, room_name, ttl):
+        if not (self.account_sid and self.api_key and self.api_secret):
+            raise VideoUnavailable("Twilio credentials are not configured")
+        from twilio.jwt.access_token import AccessToken
+        from twilio.jwt.access_token.grants import VideoGrant
+
+        token = AccessToken(self.account_sid, self.api_key, self.api_secret, identity=identity, ttl=ttl)
+        token.add_grant(VideoGrant(room=room_name))
+        value = token.to_jwt()
+        return value.decode() if isinstance(value, bytes) else value
+
+
+class FakeVideoProvider:
+    """
+    Offline stand-in for load tests and local development. Mints signed
+    JWTs shaped like Twilio's, at similar cost, without network access or
+    credentials.
+    """
+
+    name = 'fake'
+
+    def __init__(self, secret='fake-video-secret'):
+        self.secret = secret
+        self.client = None
+
+    def mint_token(self, identity, room_name, ttl):
+        now = int(time.time())
+        payload = {
+            'jti': uuid.uuid4().hex,
+            'sub': 'fake',
+            'iat': now,
+            'exp': now + ttl,
+            'grants': {'identity': identity, 'video': {'room': room_name}},
+        }
+        return jwt.encode(payload, self.secret, algorithm='HS256')
+
+
+class VideoSessionService:
+    """
+    Mints video access tokens when a participant joins and reuses them.
+
+    Tokens are cached per (user, room) and handed out again until
+    `refresh_margin` seconds before they expire, so repeated joins and
+    reconnects within a call do not mint a token each time.
+    """
+
+    def __init__(self, provider, token_ttl=3600, refresh_margin=300, max_entries=10000):
+        """
+        Args:
+            provider: TwilioVideoProvider or FakeVideoProvider
+            token_ttl (int): Lifetime of minted tokens in seconds
+            refresh_margin (int): Seconds before expiry a cached token is replaced
+            max_entries (int): Maximum (user, room) tokens kept in the cache
+        """
+        self.provider = provider
+        self.token_ttl = token_ttl
+        self.refresh_margin = min(refresh_margin, token_ttl // 2)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tokens = OrderedDict()  # (user id, room) -> (token, expires_at)
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def new_room_name():
+        return f"consultation-{uuid.uuid4()}"
+
+    def join_token(self, user_id, room_name):
+        """
+        Get a token for a user to join a room, minting one only when needed.
+
+        Args:
+            user_id: The joining user's ID (the token's identity)
+            room_name (str): The consultation's room
+
+        Returns:
+            tuple: (token, expires_at as a Unix timestamp)
+
+        Raises:
+            VideoUnavailable: If the provider is not configured
+        """
+        key = (user_id, room_name)
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None and entry[1] - self.refresh_margin > now:
+                self._tokens.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        token = self.provider.mint_token(str(user_id), room_name, self.token_ttl)
+        TOKENS_MINTED.labels(self.provider.name).inc()
+        entry = (token, now + self.token_ttl)
+        with self._lock:
+            self._tokens[key] = entry
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.max_entries:
+                self._tokens.popitem(last=False)
+        return entry
+
+    def stats(self):
+        """
+        Get token cache counters.
+
+        Returns:
+            dict: Provider, cache size, hits and misses
+        """
+        with self._lock:
+            return {
+                'provider': self.provider.name,
+                'size': len(self._tokens),
+                'hits': self._hits,
+                'misses': self._misses,
+            }
+
+
+def create_provider(config):
+    """
+    Build the video provider selected by VIDEO_PROVIDER.
+    """
+    name = (config.get('VIDEO_PROVIDER') or 'twilio').lower()
+    if name == 'fake':
+        return FakeVideoProvider()
+    if name == 'twilio':
+        return TwilioVideoProvider(
+            config.get('TWILIO_ACCOUNT_SID'),
+            config.get('TWILIO_AUTH_TOKEN'),
+            config.get('TWILIO_API_KEY'),
+            config.get('TWILIO_API_SECRET')
+        )
+    raise ValueError(f"Unknown VIDEO_PROVIDER: {name}")
+
+
+def get_video_service():
+    """
+    Get the application's video session service.
+    """
+    service = current_app.extensions.get('video_service')
+    if service is None:
+        service = current_app.extensions['video_service'] = VideoSessionService(
+            create_provider(current_app.config),
+            token_ttl=current_app.config.get('VIDEO_TOKEN_TTL', 3600),
+            refresh_margin=current_app.config.get('VIDEO_TOKEN_REFRESH_MARGIN', 300),
+            max_entries=current_app.config.get('VIDEO_TOKEN_CACHE_MAX_ENTRIES', 10000)
+        )
+    return service
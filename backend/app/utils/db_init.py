@@ -1,5 +1,6 @@
 from ..models.user import User
-from ..models.consultation import Doctor
+from datetime import time
+from ..models.consultation import Doctor, DoctorAvailability
 from .. import db
 from werkzeug.security import generate_password_hash
 
@@ -46,6 +47,11 @@ def init_db():
             license_number='MD123456',
             is_active=True
         )
+        # Weekdays 9:00-17:00 in 30 minute slots
+        doctor.availability = [
+            DoctorAvailability(weekday=weekday, start_time=time(9), end_time=time(17), slot_minutes=30)
+            for weekday in range(5)
+        ]
         db.session.add(doctor)
         db.session.commit()
     
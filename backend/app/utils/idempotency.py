@@ -0,0 +1,298 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, g, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models.idempotency import IdempotencyKey
+
+from metrics import metrics
+
+IDEMPOTENCY_REQUESTS = metrics.counter(
+    'idempotent_requests',
+    'Write requests sent with an Idempotency-Key by outcome: executed, replayed, '
+    'in_progress (gave up waiting on the first request) or mismatch (key reused for another request)',
+    ('endpoint', 'outcome')
+)
+
+# status_code of a claimed key whose request has not finished
+IN_PROGRESS = 0
+
+
+class IdempotencyStore:
+    """
+    Per-process side of the idempotency layer: recently completed responses,
+    so a retry landing on the same worker is answered without a query, and
+    an event per in-flight key, so a duplicate arriving while the first
+    request runs waits for it instead of polling the database.
+
+    The idempotency_keys table is the source of truth shared by all workers.
+    """
+
+    def __init__(self, max_entries=10000):
+        """
+        Args:
+            max_entries (int): Maximum completed responses kept in memory
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._completed = OrderedDict()  # (user id, key) -> (request hash, status, body, expires_at)
+        self._in_flight = {}  # (user id, key) -> threading.Event
+        self._hits = 0
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._completed.get(cache_key)
+            if entry is None:
+                return None
+            if entry[3] <= datetime.utcnow():
+                del self._completed[cache_key]
+                return None
+            self._completed.move_to_end(cache_key)
+            self._hits += 1
+            return entry
+
+    def set(self, cache_key, request_hash, status, body, expires_at):
+        with self._lock:
+            self._completed[cache_key] = (request_hash, status, body, expires_at)
+            self._completed.move_to_end(cache_key)
+            while len(self._completed) > self.max_entries:
+                self._completed.popitem(last=False)
+
+    def begin(self, cache_key):
+        """
+        Mark a key in flight in this process.
+
+        Returns:
+            threading.Event: The running request's event to wait on, or None
+                if the caller now owns the key
+        """
+        with self._lock:
+            running = self._in_flight.get(cache_key)
+            if running is None:
+                self._in_flight[cache_key] = threading.Event()
+            return running
+
+    def end(self, cache_key):
+        with self._lock:
+            running = self._in_flight.pop(cache_key, None)
+        if running is not None:
+            running.set()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._completed), 'in_flight': len(self._in_flight), 'hits': self._hits}
+
+
+def _get_store():
+    store = current_app.extensions.get('idempotency_store')
+    if store is None:
+        store = current_app.extensions['idempotency_store'] = IdempotencyStore(
+            max_entries=current_app.config.get('IDEMPOTENCY_CACHE_MAX_ENTRIES', 10000)
+        )
+    return store
+
+
+def _replay(endpoint, request_hash, stored_hash, status, body):
+    if stored_hash != request_hash:
+        IDEMPOTENCY_REQUESTS.labels(endpoint, 'mismatch').inc()
+        return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+    IDEMPOTENCY_REQUESTS.labels(endpoint, 'replayed').inc()
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _in_progress(endpoint):
+    IDEMPOTENCY_REQUESTS.labels(endpoint, 'in_progress').inc()
+    response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+    response.status_code = 409
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def _claim(user_id, key, scope, request_hash):
+    """
+    Insert the key as in progress, or take over one whose request died.
+
+    Returns:
+        tuple: (claimed record or None, existing record or None)
+    """
+    now = datetime.utcnow()
+    record = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        scope=scope,
+        request_hash=request_hash,
+        status_code=IN_PROGRESS,
+        created_at=now,
+        expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+        return record, None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing is None or existing.status_code != IN_PROGRESS:
+        return None, existing
+    stale = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+    if existing.created_at < stale and existing.request_hash == request_hash:
+        # The worker handling the first request died before finishing it
+        taken = IdempotencyKey.query.filter_by(
+            id=existing.id, status_code=IN_PROGRESS, created_at=existing.created_at
+        ).update({'created_at': now}, synchronize_session=False)
+        db.session.commit()
+        if taken:
+            return db.session.get(IdempotencyKey, existing.id), None
+    return None, existing
+
+
+def _wait_for(user_id, key, deadline):
+    """
+    Poll for the outcome of a request another worker is running.
+
+    Returns:
+        IdempotencyKey: The completed record, or None if it was released or
+            did not complete before the deadline
+    """
+    while True:
+        db.session.rollback()  # a fresh snapshot each time
+        record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if record is None or record.status_code != IN_PROGRESS or time.monotonic() >= deadline:
+            return record
+        time.sleep(0.05)
+
+
+def idempotent(view):
+    """
+    Make a JSON write route safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response
+    (status below 500) for IDEMPOTENCY_KEY_TTL seconds. Later requests with
+    the same key get that response back, marked Idempotent-Replayed, without
+    running the view: from this worker's memory, otherwise with one query.
+    A duplicate arriving while the first request still runs waits up to
+    IDEMPOTENCY_WAIT_TIMEOUT seconds for its response, then gets 409.
+    Reusing a key with a different body returns 422. Requests without the
+    header are not affected.
+
+    The view saves its writes with commit_write() rather than committing
+    them. Under a key they are then committed together with the stored
+    response, so a request that dies in between leaves neither behind and
+    its retry runs the view again without creating a duplicate.
+
+    Place it after @jwt_required() and before @query_budget(), so the
+    budget counts the view's own queries. Keys are scoped to the user.
+    """
+    endpoint = view.__name__
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None or not current_app.config.get('IDEMPOTENCY_ENABLED', True):
+            return view(*args, **kwargs)
+        if not 0 < len(key) <= 255:
+            return jsonify({'error': 'Idempotency-Key must be 1 to 255 characters'}), 400
+
+        user_id = get_jwt_identity()
+        scope = f'http:{request.endpoint}'
+        request_hash = hashlib.sha256(scope.encode() + b'\0' + request.get_data()).hexdigest()
+        cache_key = (user_id, key)
+        store = _get_store()
+        deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+
+        # A duplicate on this worker waits for the running request's event
+        running = store.begin(cache_key)
+        while running is not None:
+            if not running.wait(max(0.0, deadline - time.monotonic())):
+                return _in_progress(endpoint)
+            running = store.begin(cache_key)
+
+        try:
+            entry = store.get(cache_key)
+            if entry is not None:
+                return _replay(endpoint, request_hash, *entry[:3])
+
+            record, existing = _claim(user_id, key, scope, request_hash)
+            if record is None and existing is not None and existing.status_code == IN_PROGRESS:
+                # Running on another worker
+                existing = _wait_for(user_id, key, deadline)
+                if existing is None:
+                    # Its request failed and released the key; this one runs instead
+                    record, existing = _claim(user_id, key, scope, request_hash)
+                elif existing.status_code == IN_PROGRESS:
+                    return _in_progress(endpoint)
+            if record is None:
+                if existing is None or existing.status_code == IN_PROGRESS:
+                    return _in_progress(endpoint)
+                store.set(cache_key, existing.request_hash, existing.status_code, existing.response,
+                          existing.expires_at)
+                return _replay(endpoint, request_hash, existing.request_hash, existing.status_code,
+                               existing.response)
+
+            record_id, expires_at = record.id, record.expires_at
+            g.idempotency_record = record_id
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                _release(record_id)
+                raise
+            finally:
+                g.pop('idempotency_record', None)
+            if response.status_code >= 500 or not response.is_json:
+                # Not a final answer: the client may retry with the same key
+                _release(record_id)
+                return response
+
+            body = response.get_json()
+            try:
+                # Same transaction as the view's writes
+                IdempotencyKey.query.filter_by(id=record_id).update(
+                    {'status_code': response.status_code, 'response': body}, synchronize_session=False
+                )
+                db.session.commit()
+            except Exception:
+                _release(record_id)
+                raise
+            store.set(cache_key, request_hash, response.status_code, body, expires_at)
+            IDEMPOTENCY_REQUESTS.labels(endpoint, 'executed').inc()
+            return response
+        finally:
+            store.end(cache_key)
+
+    return wrapper
+
+
+def commit_write():
+    """
+    Commit a write route's transaction.
+
+    Under an Idempotency-Key the changes are only flushed, and @idempotent
+    commits them together with the response it stores.
+    """
+    if g.get('idempotency_record') is not None:
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+def _release(record_id):
+    # Also discards writes the view flushed
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(id=record_id, status_code=IN_PROGRESS).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def get_idempotency_stats():
+    """
+    Get the size of this worker's completed-response cache.
+    """
+    return _get_store().stats()
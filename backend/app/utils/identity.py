@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g
+from flask_jwt_extended import get_jwt_identity
+from .. import db
+from ..models.user import User
+
+# The parts of a user that authorization checks need
+Identity = namedtuple('Identity', ['id', 'is_active', 'is_admin'])
+
+
+class IdentityCache:
+    """
+    Small LRU of user role/active flags with a short TTL.
+
+    Flags are cached per process. Routes that change them call invalidate();
+    other workers pick up the change when their entry expires, so the TTL is
+    the longest a demoted or deactivated user keeps their old access there.
+    """
+
+    def __init__(self, ttl_seconds=30.0, max_entries=10000):
+        """
+        Args:
+            ttl_seconds (float): How long flags are trusted without a query
+            max_entries (int): Maximum users kept in the cache
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user id -> (Identity, expires_at)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+            return None
+
+    def set(self, user_id, identity):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (identity, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Size, hits, misses and hit rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': (self._hits / lookups) if lookups else 0.0,
+            }
+
+
+def _get_cache():
+    cache = current_app.extensions.get('identity_cache')
+    if cache is None:
+        cache = current_app.extensions['identity_cache'] = IdentityCache(
+            ttl_seconds=current_app.config.get('IDENTITY_CACHE_TTL', 30.0),
+            max_entries=current_app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 10000)
+        )
+    return cache
+
+
+def load_identity(user_id):
+    """
+    Get a user's role/active flags, from the cache when possible.
+
+    Args:
+        user_id: The user's ID
+
+    Returns:
+        Identity: The user's flags, or None if the user does not exist
+    """
+    cache = _get_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        # Only the flag columns, not the whole user row
+        row = db.session.query(User.id, User.is_active, User.is_admin).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = Identity(row.id, bool(row.is_active), bool(row.is_admin))
+        cache.set(user_id, identity)
+    return identity
+
+
+def get_current_identity():
+    """
+    Get the flags of the user making the request.
+
+    Must be called inside a @jwt_required() route. The result is kept on
+    the request context, so repeated checks within a request are free.
+
+    Returns:
+        Identity: The current user's flags, or None if the user does not exist
+    """
+    if 'identity' not in g:
+        g.identity = load_identity(get_jwt_identity())
+    return g.identity
+
+
+def invalidate_identity(user_id):
+    """
+    Forget a user's cached flags after they change.
+    """
+    _get_cache().invalidate(user_id)
+    if g.get('identity') is not None and g.identity.id == user_id:
+        g.pop('identity')
+
+
+def get_identity_cache_stats():
+    """
+    Get hit and miss counters for the identity cache.
+    """
+    return _get_cache().stats()
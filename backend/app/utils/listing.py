@@ -0,0 +1,226 @@
+import base64
+import json
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import func, text, tuple_
+from .. import db
+
+
+class ListingError(ValueError):
+    """
+    Raised for invalid listing parameters; routes answer it with 400.
+    """
+
+
+def parse_bool(value):
+    """
+    Parse a query-string boolean the way the config parses env vars.
+
+    Returns:
+        bool: The value, or None when the parameter was not given
+    """
+    if value is None or value == '':
+        return None
+    return value.lower() in ('true', '1', 't')
+
+
+def escape_like(value):
+    """
+    Escape LIKE wildcards so user input only matches literally.
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class CountCache:
+    """
+    Remembers listing totals for a short time so paging through a table does
+    not run COUNT(*) over it on every request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (total, expires_at)
+
+    def get_or_compute(self, key, ttl_seconds, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+        total = compute()
+        with self._lock:
+            self._entries[key] = (total, now + ttl_seconds)
+            if len(self._entries) > 1000:
+                # Drop expired entries, e.g. from one-off prefix searches
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+        return total
+
+
+_counts = CountCache()
+
+
+def _encode_cursor(sort_name, value, row_id):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    payload = json.dumps([sort_name, value, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class Listing:
+    """
+    Paginated, sorted listing of one model for the admin dashboard.
+
+    Loads only the requested columns. Supports offset pagination (`page`)
+    and keyset pagination (`cursor`, which stays fast on deep pages), and
+    reports a cached or estimated total.
+    """
+
+    def __init__(self, model, fields, default_fields, sortable, default_sort):
+        """
+        Args:
+            model: The SQLAlchemy model
+            fields (dict): Field name -> column that clients may request
+            default_fields (list): Fields returned when `fields` is not given
+            sortable (list): Field names allowed in `sort`. Their columns must
+                be NOT NULL: a keyset comparison never matches a NULL, so
+                rows with one would drop out of cursor pages.
+            default_sort (str): Sort used when `sort` is not given, e.g. '-created_at'
+        """
+        nullable = [name for name in sortable if fields[name].expression.nullable]
+        if nullable:
+            raise ValueError(f"Sortable columns must be NOT NULL: {', '.join(nullable)}")
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.sortable = sortable
+        self.default_sort = default_sort
+
+    def _parse_sort(self, sort):
+        sort = sort or self.default_sort
+        descending = sort.startswith('-')
+        name = sort.lstrip('-')
+        if name not in self.sortable:
+            raise ListingError(f"sort must be one of: {', '.join(self.sortable)} (prefix - for descending)")
+        return name, descending
+
+    def _decode_cursor(self, cursor, sort_name):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise ListingError("Invalid cursor")
+        if cursor_sort != sort_name:
+            raise ListingError("cursor was issued for a different sort")
+        column = self.fields[sort_name]
+        if value is not None and column.type.python_type in (datetime, date):
+            value = datetime.fromisoformat(value)
+        return value, row_id
+
+    def _total(self, conditions, count_key):
+        ttl = current_app.config.get('ADMIN_COUNT_CACHE_TTL', 30)
+        table = self.model.__tablename__
+
+        if not conditions and db.engine.dialect.name == 'postgresql':
+            # The planner's row estimate costs nothing even on huge tables
+            estimate = db.session.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+                {'table': table}
+            ).scalar()
+            if estimate is not None and estimate >= 0:
+                return estimate, True
+
+        def compute():
+            query = db.session.query(func.count(self.model.id))
+            if conditions:
+                query = query.filter(*conditions)
+            return query.scalar()
+
+        return _counts.get_or_compute((table, count_key), ttl, compute), False
+
+    def run(self, args, conditions=(), count_key=()):
+        """
+        Run the listing for a request's query parameters.
+
+        Args:
+            args: The request's query parameters (fields, sort, limit, page,
+                cursor, count)
+            conditions (list): SQLAlchemy filter expressions built by the route
+            count_key (tuple): Hashable description of the filters, used to
+                cache the total
+
+        Returns:
+            tuple: (list of row dicts, pagination dict)
+
+        Raises:
+            ListingError: If a parameter is invalid
+        """
+        page_size = current_app.config.get('ADMIN_PAGE_SIZE', 50)
+        page_max = current_app.config.get('ADMIN_PAGE_MAX', 500)
+
+        names = [name.strip() for name in args.get('fields', '').split(',') if name.strip()] or self.default_fields
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+
+        sort_name, descending = self._parse_sort(args.get('sort'))
+        try:
+            limit = int(args.get('limit', page_size))
+            page = int(args['page']) if args.get('page') else None
+        except ValueError:
+            raise ListingError("limit and page must be integers")
+        if limit < 1 or (page is not None and page < 1):
+            raise ListingError("limit and page must be positive")
+        limit = min(limit, page_max)
+        cursor = args.get('cursor')
+        if cursor and page is not None:
+            raise ListingError("Use either page or cursor, not both")
+
+        # id and the sort column are always loaded: they make up the cursor
+        selected = list(dict.fromkeys(['id', sort_name] + names))
+        sort_column = self.fields[sort_name]
+        id_column = self.model.id
+        query = db.session.query(*[self.fields[name].label(name) for name in selected])
+        if conditions:
+            query = query.filter(*conditions)
+
+        if cursor:
+            value, row_id = self._decode_cursor(cursor, sort_name)
+            keys = tuple_(sort_column, id_column) if sort_name != 'id' else id_column
+            after = tuple_(value, row_id) if sort_name != 'id' else row_id
+            query = query.filter(keys < after if descending else keys > after)
+
+        if sort_name == 'id':
+            order = [id_column.desc() if descending else id_column.asc()]
+        elif descending:
+            order = [sort_column.desc(), id_column.desc()]
+        else:
+            order = [sort_column.asc(), id_column.asc()]
+        query = query.order_by(*order)
+        if page is not None:
+            query = query.offset((page - 1) * limit)
+
+        # One extra row tells us whether there is a next page
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = [{name: _serialize(getattr(row, name)) for name in ['id'] + [n for n in names if n != 'id']} for row in rows]
+        pagination = {
+            'limit': limit,
+            'next_cursor': _encode_cursor(sort_name, getattr(rows[-1], sort_name), rows[-1].id) if has_more else None,
+        }
+        if page is not None:
+            pagination['page'] = page
+
+        if parse_bool(args.get('count')) is not False:
+            pagination['total'], pagination['total_is_estimate'] = self._total(list(conditions), count_key)
+
+        return items, pagination
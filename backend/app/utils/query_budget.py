@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a route runs more SQL statements than its budget allows.
+    """
+
+
+def count_queries(engine):
+    """
+    Count the statements an engine executes while a request is handled.
+
+    Installed by create_app() when QUERY_BUDGET_ENFORCED is set (e.g. in
+    tests); otherwise no listener is added and budgets cost nothing.
+
+    Args:
+        engine: The SQLAlchemy engine to watch
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+            g.setdefault('queries', []).append(statement)
+
+
+def query_budget(max_queries):
+    """
+    Declare the most SQL statements a route may run per request.
+
+    With QUERY_BUDGET_ENFORCED the request fails with QueryBudgetExceeded
+    when the view goes over budget, so an N+1 regression breaks the test
+    that exercises the route instead of slipping through.
+
+    Args:
+        max_queries (int): Statement budget for the view, including the
+            queries made by the authentication checks it runs
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('QUERY_BUDGET_ENFORCED'):
+                return view(*args, **kwargs)
+
+            before = g.get('query_count', 0)
+            response = view(*args, **kwargs)
+            used = g.get('query_count', 0) - before
+            if used > max_queries:
+                statements = '\n'.join(g.get('queries', [])[before:])
+                raise QueryBudgetExceeded(
+                    f"{view.__name__} ran {used} queries, budget is {max_queries}:\n{statements}"
+                )
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def assert_max_queries(engine, max_queries):
+    """
+    Fail if the block runs more than `max_queries` statements on `engine`.
+
+    Usage in a test:
+        with assert_max_queries(db.engine, 2):
+            client.get('/api/prescriptions/my-prescriptions', headers=headers)
+    """
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+    if len(statements) > max_queries:
+        raise QueryBudgetExceeded(
+            f"Ran {len(statements)} queries, budget is {max_queries}:\n" + '\n'.join(statements)
+        )
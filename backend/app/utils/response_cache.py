@@ -0,0 +1,192 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, make_response
+
+from metrics import metrics
+
+RESPONSE_CACHE_REQUESTS = metrics.counter(
+    'response_cache_requests',
+    'Cached GET endpoints by outcome: not_modified (304), hit (body from the cache) or miss (view ran)',
+    ('endpoint', 'outcome')
+)
+
+
+class ResponseCache:
+    """
+    Per-process LRU of rendered GET responses with their ETags.
+
+    Entries are grouped under tags (e.g. 'doctors' or 'user:42') that write
+    routes invalidate. An entry is trusted without any query for `ttl_seconds`
+    after it was last validated; after that its ETag is checked against the
+    rows' current version, which also picks up writes made by other worker
+    processes.
+    """
+
+    def __init__(self, ttl_seconds=5.0, max_entries=10000):
+        """
+        Args:
+            ttl_seconds (float): How long an entry is served without revalidation
+            max_entries (int): Maximum responses kept
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [etag, body, mimetype, validated_at]
+        self._tags = {}  # tag -> set of keys
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, tag, etag, body, mimetype):
+        with self._lock:
+            self._entries[key] = [etag, body, mimetype, time.monotonic()]
+            self._entries.move_to_end(key)
+            self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                keys = self._tags.get(old_key[1])
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys:
+                        del self._tags[old_key[1]]
+
+    def touch(self, entry):
+        entry[3] = time.monotonic()
+
+    def is_fresh(self, entry):
+        return time.monotonic() - entry[3] < self.ttl_seconds
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'tags': len(self._tags), 'ttl_seconds': self.ttl_seconds}
+
+
+def _get_cache():
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        cache = current_app.extensions['response_cache'] = ResponseCache(
+            ttl_seconds=current_app.config.get('RESPONSE_CACHE_TTL', 5.0),
+            max_entries=current_app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 10000)
+        )
+    return cache
+
+
+def _etag(key, version):
+    return hashlib.blake2b(repr((key, version)).encode(), digest_size=12).hexdigest()
+
+
+def _not_modified(etag):
+    # Weak comparison: the tag identifies the data, not the exact bytes
+    return request.if_none_match.contains_weak(etag)
+
+
+def _finish(response, etag):
+    response.set_etag(etag, weak=True)
+    # Per-user data: browsers may keep it but must revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def cached_response(tag, version):
+    """
+    Cache a JSON GET view and answer conditional requests with 304.
+
+    The ETag is derived from `version()`, a cheap query over the rows the
+    response is built from (e.g. their count and latest updated_at). A
+    request whose If-None-Match matches gets an empty 304; otherwise the
+    body is served from the cache when the version is unchanged, and the
+    view only runs when the rows changed.
+
+    Place it after @jwt_required() and @query_budget(), so the budget
+    also counts the version query.
+
+    Args:
+        tag (callable): Returns the invalidation tag for the request, e.g.
+            lambda: f'user:{get_jwt_identity()}'
+        version (callable): Returns a hashable version of the underlying
+            rows, or None to bypass the cache for this request
+    """
+    def decorator(view):
+        endpoint = view.__name__
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                return view(*args, **kwargs)
+
+            cache = _get_cache()
+            request_tag = tag()
+            key = (endpoint, request_tag, tuple(sorted(kwargs.items())), request.query_string)
+
+            # Fresh entry: no query at all
+            entry = cache.get(key)
+            if entry is not None and cache.is_fresh(entry):
+                if _not_modified(entry[0]):
+                    RESPONSE_CACHE_REQUESTS.labels(endpoint, 'not_modified').inc()
+                    return _finish(make_response('', 304), entry[0])
+                RESPONSE_CACHE_REQUESTS.labels(endpoint, 'hit').inc()
+                return _finish(current_app.response_class(entry[1], mimetype=entry[2]), entry[0])
+
+            current_version = version()
+            if current_version is None:
+                return view(*args, **kwargs)
+            etag = _etag(key, current_version)
+
+            if entry is not None and entry[0] == etag:
+                cache.touch(entry)
+                if _not_modified(etag):
+                    RESPONSE_CACHE_REQUESTS.labels(endpoint, 'not_modified').inc()
+                    return _finish(make_response('', 304), etag)
+                RESPONSE_CACHE_REQUESTS.labels(endpoint, 'hit').inc()
+                return _finish(current_app.response_class(entry[1], mimetype=entry[2]), etag)
+
+            if _not_modified(etag):
+                # The client already has this version, though this worker does not
+                RESPONSE_CACHE_REQUESTS.labels(endpoint, 'not_modified').inc()
+                return _finish(make_response('', 304), etag)
+
+            RESPONSE_CACHE_REQUESTS.labels(endpoint, 'miss').inc()
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            cache.set(key, request_tag, etag, response.get_data(), response.mimetype)
+            return _finish(response, etag)
+
+        return wrapper
+    return decorator
+
+
+def invalidate_responses(*tags):
+    """
+    Drop this process's cached responses under the given tags after a write.
+
+    Other processes notice the change when their entries are revalidated,
+    within RESPONSE_CACHE_TTL seconds.
+    """
+    _get_cache().invalidate(*tags)
+
+
+def get_response_cache_stats():
+    """
+    Get the size of the response cache.
+    """
+    return _get_cache().stats()
@@ -0,0 +1,299 @@
+"""
+Archive of cold monthly partitions as gzip-compressed NDJSON files.
+
+An archived month of a dataset is two files in <directory>/<dataset>/:
+- YYYY-MM.ndjson.gz: the month's rows grouped by user, each user's rows
+  newest first in a gzip member of their own. Any gzip reader sees one
+  ordinary NDJSON file.
+- YYYY-MM.index.json: the columns, value types, row counts and each user's
+  member offset and length, so reading one user's history decompresses
+  only that user's rows.
+
+Files are written and fsynced before the month's partitions are dropped,
+in the same transaction that drops them.
+"""
+import gzip
+import json
+import os
+import uuid
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+
+from psycopg2.extensions import cursor as TupleCursor
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # optional, parses archived rows faster
+    _loads = json.loads
+
+from .partitions import add_months, partition_name
+
+DATA_SUFFIX = '.ndjson.gz'
+INDEX_SUFFIX = '.index.json'
+
+# Rows fetched per round trip while a month is written
+ARCHIVE_ITERSIZE = 5000
+
+
+class ArchiveError(RuntimeError):
+    """
+    Raised when a month cannot be archived: it is archived already, or its
+    rows changed while it was being written. Nothing is dropped.
+    """
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _value_type(value):
+    if isinstance(value, datetime):
+        return 'datetime'
+    if isinstance(value, uuid.UUID):
+        return 'uuid'
+    return None
+
+
+_DECODERS = {'datetime': datetime.fromisoformat, 'uuid': uuid.UUID}
+
+
+def _fsync_replace(tmp_path, path):
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def month_paths(directory, dataset, month):
+    """
+    Get the data and index file paths of an archived month.
+    """
+    base = os.path.join(directory, dataset, f"{month:%Y-%m}")
+    return base + DATA_SUFFIX, base + INDEX_SUFFIX
+
+
+def archive_month(conn, directory, dataset, month, query, tables, user_key, row_key, cleanup=()):
+    """
+    Write a month's rows to the archive, then detach and drop its partitions.
+
+    The partitions are locked against writes first, so the files hold
+    exactly the rows that are dropped.
+
+    Args:
+        conn: psycopg2 connection
+        directory (str): Archive root directory
+        dataset (str): Archive name, the subdirectory the files go to
+        month (datetime): First day of the month
+        query (str): SELECT of the month's rows with %(start)s and %(end)s
+                     placeholders, ordered by user_key and then newest first
+        tables (list): (table, partition column) pairs whose partition for the
+                       month is dropped; rows of the first one are counted
+                       against the distinct row_key values written
+        user_key (str): Column rows are grouped by
+        row_key (str): Column identifying a row of the first table
+        cleanup (list): Statements with the same placeholders, run in the
+                        dropping transaction before the partitions are
+                        dropped, e.g. to delete related rows in other months
+
+    Returns:
+        dict: rows and users written, and the size of the data file in bytes
+
+    Raises:
+        ArchiveError: If the month is already archived or the row count does
+                      not match; nothing is dropped
+    """
+    data_path, index_path = month_paths(directory, dataset, month)
+    if os.path.exists(index_path):
+        # e.g. a partition recreated for rows written after the month was archived
+        raise ArchiveError(f"{dataset} {month:%Y-%m} is already archived")
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    params = {'start': month, 'end': add_months(month, 1)}
+    partitions = [partition_name(table, month) for table, _ in tables]
+
+    users = {}
+    rows = 0
+    keys = 0
+    columns = None
+    types = {}
+    published = False
+    try:
+        with conn.cursor(cursor_factory=TupleCursor) as cur:
+            cur.execute("SET LOCAL lock_timeout = '10s'")
+            for name in partitions:
+                cur.execute(f"LOCK TABLE {name} IN SHARE MODE")
+
+        with open(data_path + '.part', 'wb') as out:
+            with conn.cursor(name=f"archive_{uuid.uuid4().hex}", cursor_factory=TupleCursor) as cur:
+                cur.itersize = ARCHIVE_ITERSIZE
+                cur.execute(query, params)
+
+                current = None
+                member = None
+                member_rows = 0
+                member_keys = set()
+                offset = 0
+
+                def close_member():
+                    nonlocal offset
+                    data = member.flush()
+                    out.write(data)
+                    users[str(current)] = [offset, out.tell() - offset, member_rows]
+                    offset = out.tell()
+
+                for row in cur:
+                    if columns is None:
+                        # A named cursor describes its columns after the first fetch
+                        columns = [column[0] for column in cur.description]
+                        user_index = columns.index(user_key)
+                        key_index = columns.index(row_key)
+                    if row[user_index] != current or member is None:
+                        if member is not None:
+                            close_member()
+                            keys += len(member_keys)
+                        current = row[user_index]
+                        # wbits=31: a complete gzip member per user
+                        member = zlib.compressobj(6, zlib.DEFLATED, 31)
+                        member_rows = 0
+                        member_keys = set()
+                    for name, value in zip(columns, row):
+                        if value is not None and name not in types:
+                            types[name] = _value_type(value)
+                    record = dict(zip(columns, row))
+                    out.write(member.compress(
+                        (json.dumps(record, default=_json_default, separators=(',', ':')) + '\n').encode()
+                    ))
+                    member_rows += 1
+                    member_keys.add(row[key_index])
+                    rows += 1
+                if member is not None:
+                    close_member()
+                    keys += len(member_keys)
+                size = out.tell()
+
+        with conn.cursor(cursor_factory=TupleCursor) as cur:
+            cur.execute(f"SELECT count(*) FROM {partitions[0]}")
+            expected = cur.fetchone()[0]
+        if expected != keys:
+            raise ArchiveError(f"{partitions[0]} has {expected} rows but {keys} were archived")
+
+        index = {
+            'dataset': dataset,
+            'month': f"{month:%Y-%m}",
+            'columns': columns,
+            'types': {name: kind for name, kind in types.items() if kind},
+            'rows': rows,
+            'users': users,
+            'archived_at': datetime.utcnow().isoformat(),
+        }
+        with open(index_path + '.part', 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+        _fsync_replace(data_path + '.part', data_path)
+        _fsync_replace(index_path + '.part', index_path)
+        published = True
+        directory_fd = os.open(os.path.dirname(data_path), os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+        with conn.cursor(cursor_factory=TupleCursor) as cur:
+            for statement in cleanup:
+                cur.execute(statement, params)
+            for (table, _), name in zip(tables, partitions):
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for path in (data_path + '.part', index_path + '.part') + ((data_path, index_path) if published else ()):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    return {'rows': rows, 'users': len(users), 'bytes': size}
+
+
+def archived_months(directory, dataset):
+    """
+    Get the archived months of a dataset, newest first.
+    """
+    try:
+        names = os.listdir(os.path.join(directory, dataset))
+    except FileNotFoundError:
+        return []
+    months = []
+    for name in names:
+        if name.endswith(INDEX_SUFFIX):
+            try:
+                months.append(datetime.strptime(name[:-len(INDEX_SUFFIX)], '%Y-%m'))
+            except ValueError:
+                continue
+    return sorted(months, reverse=True)
+
+
+@lru_cache(maxsize=64)
+def _load_index(path, mtime_ns):
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_user_rows(directory, dataset, month, user_id, decode=True):
+    """
+    Read one user's rows of an archived month, newest first.
+
+    Only the user's gzip member is read and decompressed.
+
+    Args:
+        decode (bool): Turn datetime and UUID values back into Python
+                       objects, so rows look like rows read from the
+                       database; otherwise they stay ISO and UUID strings
+
+    Returns:
+        list: Row dicts (empty if the user has no rows that month)
+    """
+    data_path, index_path = month_paths(directory, dataset, month)
+    try:
+        index = _load_index(index_path, os.stat(index_path).st_mtime_ns)
+    except FileNotFoundError:
+        return []
+    entry = index['users'].get(str(user_id))
+    if entry is None:
+        return []
+
+    offset, length, _ = entry
+    with open(data_path, 'rb') as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length))
+
+    records = [_loads(line) for line in data.splitlines()]
+    decoders = [(name, _DECODERS[kind]) for name, kind in index['types'].items() if kind in _DECODERS]
+    if decode and decoders:
+        for record in records:
+            for name, convert in decoders:
+                if record.get(name) is not None:
+                    record[name] = convert(record[name])
+    return records
+
+
+def iter_user_archive(directory, dataset, user_id, before=None, decode=True):
+    """
+    Stream a user's archived rows month by month, newest month first.
+
+    Args:
+        before (datetime): Skip months starting at or after this time
+        decode (bool): See read_user_rows()
+
+    Yields:
+        tuple: (month, rows of that month, newest first); months without
+               rows for the user are skipped
+    """
+    for month in archived_months(directory, dataset):
+        if before is not None and month >= before:
+            continue
+        records = read_user_rows(directory, dataset, month, user_id, decode)
+        if records:
+            yield month, records
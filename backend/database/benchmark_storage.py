@@ -0,0 +1,93 @@
+"""
+Compare the JSONB symptom_data format with the compact REAL[] symptom_values
+format: on-disk table size and history read throughput through psycopg2.
+
+Creates two scratch tables in the configured database, fills them with the
+same generated rows and drops them again.
+
+Usage (from the backend directory):
+    python -m database.benchmark_storage --rows 200000
+"""
+import argparse
+import time
+
+from .db import get_db_connection
+
+FORMATS = {
+    'jsonb': {
+        'column': 'symptom_data JSONB NOT NULL',
+        'select': 'symptom_data',
+        'generate': "jsonb_build_object({})".format(', '.join(
+            f"'symptom_{i}', (random() * 10)::int" for i in range(1, 11)
+        )),
+    },
+    'real[]': {
+        'column': 'symptom_values REAL[] NOT NULL',
+        'select': 'symptom_values',
+        'generate': "ARRAY[{}]::real[]".format(', '.join(
+            '(random() * 10)::int' for _ in range(10)
+        )),
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Rows per table')
+    parser.add_argument('--users', type=int, default=100, help='Distinct users the rows are spread over')
+    parser.add_argument('--repeats', type=int, default=5, help='Times each read is repeated')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("Could not connect to the database")
+
+    print(f"{'format':>8} {'table MB':>10} {'bytes/row':>10} {'read rows/s':>12}")
+    try:
+        for name, fmt in FORMATS.items():
+            table = 'bench_symptom_' + name.replace('[]', '_array')
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                cur.execute(f"""
+                    CREATE TABLE {table} (
+                        input_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        user_id INT NOT NULL,
+                        {fmt['column']},
+                        submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute(f"""
+                    INSERT INTO {table} (user_id, {fmt['select']}, submitted_at)
+                    SELECT n %% %s, {fmt['generate']}, now() - n * interval '1 minute'
+                    FROM generate_series(1, %s) AS n
+                """, (args.users, args.rows))
+                cur.execute(f"CREATE INDEX ON {table} (user_id, submitted_at DESC)")
+                conn.commit()
+                cur.execute("SELECT pg_table_size(%s)", (table,))
+                size = cur.fetchone()['pg_table_size']
+
+            # Read every user's full history, decoding rows into Python objects
+            started = time.perf_counter()
+            rows_read = 0
+            for _ in range(args.repeats):
+                for user_id in range(args.users):
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            f"SELECT input_id, {fmt['select']}, submitted_at FROM {table} WHERE user_id = %s ORDER BY submitted_at DESC",
+                            (user_id,)
+                        )
+                        rows_read += len([dict(row) for row in cur.fetchall()])
+            elapsed = time.perf_counter() - started
+            conn.rollback()
+
+            print(f"{name:>8} {size / 1048576:>10.1f} {size / args.rows:>10.1f} {rows_read / elapsed:>12.0f}")
+
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE {table}")
+            conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
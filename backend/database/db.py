@@ -1,7 +1,28 @@
 import os
+import sys
+import atexit
+import base64
+import threading
+import time
+import uuid
+from datetime import datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor, register_uuid
-import json
+from psycopg2.extras import RealDictCursor, register_uuid, execute_values
+from sqlalchemy import exc as sa_exc
+
+from .pool import ConnectionPool, EnginePool, PoolTimeout
+from .write_behind import WriteBehindWriter, QueueFull
+from . import archive, partitions
+
+# Add the ai-module directory to the Python path to share its metrics registry
+AI_MODULE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'ai-module'
+)
+if AI_MODULE_DIR not in sys.path:
+    sys.path.append(AI_MODULE_DIR)
+
+from metrics import DB_QUERY_SECONDS
 
 # Register UUID type with psycopg2
 register_uuid()
@@ -13,6 +34,70 @@ DB_USER = os.environ.get('DB_USER', 'postgres')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'postgres')
 DB_PORT = os.environ.get('DB_PORT', '5432')
 
+# Connection pool parameters
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+
+# Rows sent per multi-row INSERT statement in batch writes
+DB_BATCH_PAGE_SIZE = int(os.environ.get('DB_BATCH_PAGE_SIZE', '1000'))
+
+# Rows fetched per round trip when streaming through a server-side cursor
+DB_STREAM_ITERSIZE = int(os.environ.get('DB_STREAM_ITERSIZE', '500'))
+
+# Write-behind persistence of symptom checks
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'false').lower() in ('true', '1', 't')
+WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get('WRITE_BEHIND_QUEUE_SIZE', '10000'))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '500'))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = int(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL_MS', '200'))
+WRITE_BEHIND_PUT_TIMEOUT_MS = int(os.environ.get('WRITE_BEHIND_PUT_TIMEOUT_MS', '100'))
+WRITE_BEHIND_JOURNAL_DIR = os.environ.get('WRITE_BEHIND_JOURNAL_DIR', 'journal')
+WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', 'false').lower() in ('true', '1', 't')
+
+# Monthly partitions and archival of cold months
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', '3'))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '12'))
+
+# Partitioned tables and their partition key. A prediction is created with
+# or after its input, so its month is never earlier than the input's.
+PARTITIONED_TABLES = {
+    'symptom_inputs': 'submitted_at',
+    'predictions': 'created_at',
+}
+
+# Archived months hold history records: each input joined with its predictions
+ARCHIVE_DATASET = 'symptom_inputs'
+
+HISTORY_COLUMNS = """
+    s.input_id, s.symptom_values, s.submitted_at,
+    p.prediction_id, p.predicted_condition, p.confidence_score, p.created_at
+"""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_query_timer = DB_QUERY_SECONDS.labels('psycopg2')
+
+class TimedCursor(RealDictCursor):
+    """
+    RealDictCursor that records how long each statement takes to execute.
+    """
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _query_timer.observe(time.perf_counter() - started)
+    
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _query_timer.observe(time.perf_counter() - started)
+
 def get_db_connection():
     """
     Create and return a database connection.
@@ -24,13 +109,60 @@ def get_db_connection():
             user=DB_USER,
             password=DB_PASSWORD,
             port=DB_PORT,
-            cursor_factory=RealDictCursor
+            cursor_factory=TimedCursor
         )
         return conn
     except Exception as e:
         print(f"Error connecting to the database: {e}")
         return None
 
+def _connect():
+    conn = get_db_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("Could not connect to the database")
+    return conn
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL
+                )
+    return _pool
+
+def use_engine(engine):
+    """
+    Check connections out of a SQLAlchemy engine instead of this module's
+    own pool, e.g. the engine of the application serving these routes.
+    
+    Args:
+        engine (sqlalchemy.engine.Engine): A psycopg2 engine connected to
+            the symptom checker database
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = EnginePool(engine, cursor_factory=TimedCursor)
+
+def get_pool_stats():
+    """
+    Get connection pool statistics.
+    
+    Returns:
+        dict: In-use and idle connection counts, waits, timeouts and checkout latency
+    """
+    return get_pool().stats()
+
 def create_user(name, email):
     """
     Create a new user in the database.
@@ -42,25 +174,19 @@ def create_user(name, email):
     Returns:
         dict: User data including user_id if successful, None otherwise
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO users (name, email) VALUES (%s, %s) RETURNING user_id, name, email, created_at",
-                (name, email)
-            )
-            user = cur.fetchone()
-            conn.commit()
-            return dict(user)
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO users (name, email) VALUES (%s, %s) RETURNING user_id, name, email, created_at",
+                    (name, email)
+                )
+                user = cur.fetchone()
+                conn.commit()
+                return dict(user)
     except Exception as e:
         print(f"Error creating user: {e}")
-        conn.rollback()
         return None
-    finally:
-        conn.close()
 
 def save_symptom_input(user_id, symptom_data):
     """
@@ -73,28 +199,19 @@ def save_symptom_input(user_id, symptom_data):
     Returns:
         dict: Symptom input data including input_id if successful, None otherwise
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        # Convert symptom_data list to a JSON object with named keys
-        symptom_json = {f"symptom_{i+1}": value for i, value in enumerate(symptom_data)}
-        
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO symptom_inputs (user_id, symptom_data) VALUES (%s, %s) RETURNING input_id, user_id, symptom_data, submitted_at",
-                (user_id, json.dumps(symptom_json))
-            )
-            input_data = cur.fetchone()
-            conn.commit()
-            return dict(input_data)
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO symptom_inputs (user_id, symptom_values) VALUES (%s, %s) RETURNING input_id, user_id, symptom_values, submitted_at",
+                    (user_id, list(symptom_data))
+                )
+                input_data = cur.fetchone()
+                conn.commit()
+                return dict(input_data)
     except Exception as e:
         print(f"Error saving symptom input: {e}")
-        conn.rollback()
         return None
-    finally:
-        conn.close()
 
 def save_prediction(input_id, predicted_condition, confidence_score):
     """
@@ -108,25 +225,176 @@ def save_prediction(input_id, predicted_condition, confidence_score):
     Returns:
         dict: Prediction data if successful, None otherwise
     """
-    conn = get_db_connection()
-    if not conn:
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                # The input's user_id is copied so deleting the user deletes the prediction
+                cur.execute(
+                    "INSERT INTO predictions (input_id, user_id, predicted_condition, confidence_score) SELECT input_id, user_id, %s, %s FROM symptom_inputs WHERE input_id = %s RETURNING prediction_id, input_id, predicted_condition, confidence_score, created_at",
+                    (predicted_condition, confidence_score, input_id)
+                )
+                prediction = cur.fetchone()
+                conn.commit()
+                return dict(prediction) if prediction else None
+    except Exception as e:
+        print(f"Error saving prediction: {e}")
         return None
+
+def save_symptom_batch(user_id, symptom_rows, predictions):
+    """
+    Save many symptom inputs and their predictions in a single transaction.
+    
+    Args:
+        user_id (str): UUID of the user
+        symptom_rows (list): Lists of 10 symptom severity values
+        predictions (list): (predicted_condition, confidence_score) pairs, one per row
+        
+    Returns:
+        list: (input_data, prediction) dict pairs in input order if successful, None otherwise
+    """
+    # Assign input IDs up front so predictions can reference them without
+    # relying on the order of RETURNING rows
+    input_ids = [uuid.uuid4() for _ in symptom_rows]
     
     try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                inputs = execute_values(
+                    cur,
+                    "INSERT INTO symptom_inputs (input_id, user_id, symptom_values) VALUES %s RETURNING input_id, user_id, symptom_values, submitted_at",
+                    [(input_id, user_id, list(row)) for input_id, row in zip(input_ids, symptom_rows)],
+                    page_size=DB_BATCH_PAGE_SIZE,
+                    fetch=True
+                )
+                saved_predictions = execute_values(
+                    cur,
+                    "INSERT INTO predictions (input_id, user_id, predicted_condition, confidence_score) VALUES %s RETURNING prediction_id, input_id, predicted_condition, confidence_score, created_at",
+                    [(input_id, user_id, condition, score) for input_id, (condition, score) in zip(input_ids, predictions)],
+                    page_size=DB_BATCH_PAGE_SIZE,
+                    fetch=True
+                )
+                conn.commit()
+        
+        inputs_by_id = {row['input_id']: dict(row) for row in inputs}
+        predictions_by_id = {row['input_id']: dict(row) for row in saved_predictions}
+        return [(inputs_by_id[input_id], predictions_by_id[input_id]) for input_id in input_ids]
+    except Exception as e:
+        print(f"Error saving symptom batch: {e}")
+        return None
+
+def write_symptom_records(records):
+    """
+    Insert symptom inputs with their predictions in one transaction.
+    
+    Used by the write-behind writer. IDs and timestamps are generated by the
+    caller and duplicates are ignored, so replaying the same records is
+    harmless.
+    
+    Args:
+        records (list): Dicts with input_id, prediction_id, user_id, features,
+                        submitted_at, predicted_condition and confidence_score
+        
+    Raises:
+        Exception: If the transaction fails; nothing is written in that case
+    """
+    with get_pool().connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO predictions (input_id, predicted_condition, confidence_score) VALUES (%s, %s, %s) RETURNING prediction_id, input_id, predicted_condition, confidence_score, created_at",
-                (input_id, predicted_condition, confidence_score)
+            execute_values(
+                cur,
+                "INSERT INTO symptom_inputs (input_id, user_id, symptom_values, submitted_at) VALUES %s ON CONFLICT DO NOTHING",
+                [
+                    (record['input_id'], record['user_id'], record['features'], record['submitted_at'])
+                    for record in records
+                ],
+                page_size=DB_BATCH_PAGE_SIZE
+            )
+            execute_values(
+                cur,
+                "INSERT INTO predictions (prediction_id, input_id, user_id, predicted_condition, confidence_score, created_at) VALUES %s ON CONFLICT DO NOTHING",
+                [
+                    (record['prediction_id'], record['input_id'], record['user_id'], record['predicted_condition'], record['confidence_score'], record['submitted_at'])
+                    for record in records
+                ],
+                page_size=DB_BATCH_PAGE_SIZE
             )
-            prediction = cur.fetchone()
             conn.commit()
-            return dict(prediction)
-    except Exception as e:
-        print(f"Error saving prediction: {e}")
-        conn.rollback()
-        return None
-    finally:
-        conn.close()
+
+_writer = None
+if WRITE_BEHIND_ENABLED:
+    _writer = WriteBehindWriter(
+        write_symptom_records,
+        max_queue_size=WRITE_BEHIND_QUEUE_SIZE,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000.0,
+        put_timeout=WRITE_BEHIND_PUT_TIMEOUT_MS / 1000.0,
+        journal_dir=WRITE_BEHIND_JOURNAL_DIR or None,
+        fsync=WRITE_BEHIND_FSYNC,
+        # Lost connections and pool timeouts are retried; constraint
+        # violations and bad data are dead-lettered
+        retry_on=(psycopg2.OperationalError, psycopg2.InterfaceError, PoolTimeout,
+                  sa_exc.OperationalError, sa_exc.InterfaceError)
+    )
+    # Flush queued records on interpreter (and gunicorn worker) shutdown
+    atexit.register(_writer.close)
+
+def queue_symptom_check(user_id, symptom_data, predicted_condition, confidence_score):
+    """
+    Queue a symptom input and its prediction for write-behind persistence.
+    
+    Falls back to writing synchronously when the queue is full.
+    
+    Args:
+        user_id (str): UUID of the user
+        symptom_data (list): List of 10 symptom severity values
+        predicted_condition (str): Condition predicted by the AI model
+        confidence_score (float): Confidence level of the prediction
+        
+    Returns:
+        tuple: (input_data, prediction) dicts as they will be stored, or None on failure
+    """
+    record = {
+        'input_id': str(uuid.uuid4()),
+        'prediction_id': str(uuid.uuid4()),
+        'user_id': str(user_id),
+        'features': symptom_data,
+        'submitted_at': datetime.utcnow().isoformat(),
+        'predicted_condition': predicted_condition,
+        'confidence_score': confidence_score
+    }
+    
+    try:
+        _writer.submit(record)
+    except QueueFull:
+        try:
+            write_symptom_records([record])
+        except Exception as e:
+            print(f"Error saving symptom check: {e}")
+            return None
+    
+    submitted_at = datetime.fromisoformat(record['submitted_at'])
+    input_data = {
+        'input_id': uuid.UUID(record['input_id']),
+        'user_id': uuid.UUID(record['user_id']),
+        'symptom_values': [float(value) for value in symptom_data],
+        'submitted_at': submitted_at
+    }
+    prediction = {
+        'prediction_id': uuid.UUID(record['prediction_id']),
+        'input_id': input_data['input_id'],
+        'predicted_condition': predicted_condition,
+        'confidence_score': confidence_score,
+        'created_at': submitted_at
+    }
+    return input_data, prediction
+
+def get_write_behind_stats():
+    """
+    Get write-behind queue depth and flush statistics.
+    
+    Returns:
+        dict: Writer statistics, or None when write-behind is disabled
+    """
+    return _writer.stats() if _writer else None
 
 def get_user_by_email(email):
     """
@@ -138,20 +406,15 @@ def get_user_by_email(email):
     Returns:
         dict: User data if found, None otherwise
     """
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM users WHERE email = %s", (email,))
-            user = cur.fetchone()
-            return dict(user) if user else None
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM users WHERE email = %s", (email,))
+                user = cur.fetchone()
+                return dict(user) if user else None
     except Exception as e:
         print(f"Error getting user by email: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_user_history(user_id):
     """
@@ -163,24 +426,310 @@ def get_user_history(user_id):
     Returns:
         list: List of dictionaries containing symptom inputs and predictions
     """
-    conn = get_db_connection()
-    if not conn:
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT s.input_id, s.symptom_values, s.submitted_at, 
+                           p.prediction_id, p.predicted_condition, p.confidence_score, p.created_at
+                    FROM symptom_inputs s
+                    LEFT JOIN predictions p ON s.input_id = p.input_id
+                    WHERE s.user_id = %s
+                    ORDER BY s.submitted_at DESC
+                """, (user_id,))
+                history = cur.fetchall()
+                return [dict(record) for record in history]
+    except Exception as e:
+        print(f"Error getting user history: {e}")
         return []
+
+def encode_history_cursor(record):
+    """
+    Build an opaque pagination cursor pointing just after a history record.
+    
+    Args:
+        record (dict): The last history record of a page
+        
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = f"{record['submitted_at'].isoformat()}|{record['input_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_history_cursor(cursor):
+    """
+    Decode a cursor produced by encode_history_cursor.
     
+    Returns:
+        tuple: (submitted_at, input_id)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT s.input_id, s.symptom_data, s.submitted_at, 
-                       p.prediction_id, p.predicted_condition, p.confidence_score, p.created_at
+        submitted_at, input_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(submitted_at), uuid.UUID(input_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _archived_history(user_id, count, after=None):
+    """
+    Read a user's archived history records, newest first, stopping after
+    `count` symptom inputs.
+    
+    Args:
+        user_id (str): UUID of the user
+        count (int): Maximum number of symptom inputs
+        after (tuple): Only records before this (submitted_at, input_id)
+        
+    Returns:
+        list: History records
+    """
+    records = []
+    inputs = 0
+    months = archive.iter_user_archive(ARCHIVE_DIR, ARCHIVE_DATASET, str(uuid.UUID(str(user_id))), after[0] if after else None)
+    for _, month_records in months:
+        for record in month_records:
+            del record['user_id']
+            if after and (record['submitted_at'], record['input_id']) >= after:
+                continue
+            if not records or records[-1]['input_id'] != record['input_id']:
+                if inputs == count:
+                    return records
+                inputs += 1
+            records.append(record)
+    return records
+
+def get_user_history_page(user_id, limit, cursor=None, include_archived=False):
+    """
+    Get one page of a user's history, newest first, using keyset pagination
+    on (submitted_at, input_id).
+    
+    Args:
+        user_id (str): UUID of the user
+        limit (int): Maximum number of symptom inputs to return
+        cursor (str): Cursor returned with the previous page, if any
+        include_archived (bool): Continue into archived months once the
+                                 database rows are exhausted
+        
+    Returns:
+        tuple: (list of history records, next cursor or None), or (None, None) on error
+    """
+    after = decode_history_cursor(cursor) if cursor else None
+    
+    # Page over symptom inputs first so an input is never split across pages
+    # by its joined predictions. A prediction is never older than its input,
+    # so prediction partitions older than the page are pruned at run time.
+    query = f"""
+        WITH s AS MATERIALIZED (
+            SELECT input_id, symptom_values, submitted_at
+            FROM symptom_inputs
+            WHERE user_id = %s {'AND (submitted_at, input_id) < (%s, %s)' if after else ''}
+            ORDER BY submitted_at DESC, input_id DESC
+            LIMIT %s
+        )
+        SELECT {HISTORY_COLUMNS}
+        FROM s
+        LEFT JOIN predictions p ON s.input_id = p.input_id AND p.created_at >= (SELECT min(submitted_at) FROM s)
+        ORDER BY s.submitted_at DESC, s.input_id DESC
+    """
+    params = (user_id, *after, limit + 1) if after else (user_id, limit + 1)
+    
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                records = [dict(record) for record in cur.fetchall()]
+        
+        if include_archived:
+            months = archive.archived_months(ARCHIVE_DIR, ARCHIVE_DATASET)
+            live_inputs = len({record['input_id'] for record in records})
+            # Archived months are older than the live ones, so they are only
+            # read once this page reaches past the newest of them
+            if months and (live_inputs <= limit or records[-1]['submitted_at'] < partitions.add_months(months[0], 1)):
+                records += _archived_history(user_id, limit + 1, after)
+                records.sort(key=lambda record: (record['submitted_at'], record['input_id']), reverse=True)
+    except Exception as e:
+        print(f"Error getting user history page: {e}")
+        return None, None
+    
+    # One extra input was fetched to know whether another page exists
+    input_ids = []
+    for record in records:
+        if not input_ids or input_ids[-1] != record['input_id']:
+            input_ids.append(record['input_id'])
+    if len(input_ids) <= limit:
+        return records, None
+    
+    keep = set(input_ids[:limit])
+    page = [record for record in records if record['input_id'] in keep]
+    return page, encode_history_cursor(page[-1])
+
+def iter_user_history(user_id, include_archived=False):
+    """
+    Stream a user's full history, newest first, through a server-side cursor.
+    
+    Only DB_STREAM_ITERSIZE rows are held in memory at a time. The pooled
+    connection is returned when the generator is exhausted or closed.
+    
+    Args:
+        user_id (str): UUID of the user
+        include_archived (bool): Follow the database rows with the user's
+                                 archived months, one batch per month
+        
+    Yields:
+        list: Batches of history records
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor(name=f"history_{uuid.uuid4().hex}") as cur:
+            cur.itersize = DB_STREAM_ITERSIZE
+            cur.execute(f"""
+                SELECT {HISTORY_COLUMNS}
                 FROM symptom_inputs s
                 LEFT JOIN predictions p ON s.input_id = p.input_id
                 WHERE s.user_id = %s
-                ORDER BY s.submitted_at DESC
+                ORDER BY s.submitted_at DESC, s.input_id DESC
             """, (user_id,))
-            history = cur.fetchall()
-            return [dict(record) for record in history]
+            while True:
+                records = cur.fetchmany(DB_STREAM_ITERSIZE)
+                if not records:
+                    break
+                yield [dict(record) for record in records]
+    
+    if include_archived:
+        for _, records in archive.iter_user_archive(ARCHIVE_DIR, ARCHIVE_DATASET, str(uuid.UUID(str(user_id)))):
+            for record in records:
+                del record['user_id']
+            yield records
+
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD, since=None):
+    """
+    Create the monthly partitions of the symptom tables that are missing,
+    from `since` (default: this month) to `months_ahead` months ahead.
+    
+    Args:
+        months_ahead (int): Future months to create partitions for
+        since (datetime): First month to create a partition for
+        
+    Returns:
+        list: Names of the partitions created, None on error
+    """
+    try:
+        with get_pool().connection() as conn:
+            created = []
+            for table, column in PARTITIONED_TABLES.items():
+                created += partitions.ensure_partitions(conn, table, column, months_ahead, since)
+            return created
     except Exception as e:
-        print(f"Error getting user history: {e}")
-        return []
-    finally:
-        conn.close()
\ No newline at end of file
+        print(f"Error creating partitions: {e}")
+        return None
+
+# A month of history records for the archive, grouped by user. Predictions
+# are never older than their input, so older prediction partitions are
+# pruned; ones made in a later month are included.
+ARCHIVE_QUERY = f"""
+    SELECT s.user_id, {HISTORY_COLUMNS}
+    FROM symptom_inputs s
+    LEFT JOIN predictions p ON p.input_id = s.input_id AND p.created_at >= %(start)s
+    WHERE s.submitted_at >= %(start)s AND s.submitted_at < %(end)s
+    ORDER BY s.user_id, s.submitted_at DESC, s.input_id DESC
+"""
+
+# Predictions of the month's inputs made in a later month, which dropping
+# the month's partitions leaves behind. Run before they are dropped.
+ARCHIVE_CLEANUP = [
+    """
+    DELETE FROM predictions p
+    USING symptom_inputs s
+    WHERE p.input_id = s.input_id
+      AND s.submitted_at >= %(start)s AND s.submitted_at < %(end)s
+      AND p.created_at >= %(end)s
+    """,
+]
+
+def _cold_months(conn, archive_after_months):
+    cutoff = partitions.add_months(partitions.month_start(datetime.utcnow()), -archive_after_months)
+    return [month for month in partitions.list_partitions(conn, 'symptom_inputs') if month < cutoff]
+
+def get_cold_months(archive_after_months=ARCHIVE_AFTER_MONTHS):
+    """
+    Get the months whose symptom_inputs partition is due for archival.
+    
+    Returns:
+        list: First day of each month, oldest first
+    """
+    with get_pool().connection() as conn:
+        return _cold_months(conn, archive_after_months)
+
+def archive_cold_partitions(archive_after_months=ARCHIVE_AFTER_MONTHS):
+    """
+    Move months older than `archive_after_months` to ARCHIVE_DIR, oldest first.
+    
+    Each month's inputs are written with their predictions as history
+    records, then its symptom_inputs and predictions partitions are
+    dropped. A prediction made in a later month than its input is archived
+    and deleted with the input.
+    
+    Args:
+        archive_after_months (int): Months kept in the database, besides the current one
+        
+    Returns:
+        list: (month, dict of rows, users and bytes written) per archived month
+        
+    Raises:
+        Exception: If a month fails; months archived before it stay archived
+    """
+    archived = []
+    with get_pool().connection() as conn:
+        prediction_months = set(partitions.list_partitions(conn, 'predictions'))
+        for month in _cold_months(conn, archive_after_months):
+            tables = [('symptom_inputs', 'submitted_at')]
+            if month in prediction_months:
+                tables.append(('predictions', 'created_at'))
+            stats = archive.archive_month(
+                conn, ARCHIVE_DIR, ARCHIVE_DATASET, month, ARCHIVE_QUERY, tables,
+                user_key='user_id', row_key='input_id', cleanup=ARCHIVE_CLEANUP
+            )
+            archived.append((month, stats))
+    return archived
+
+# Tables that can be exported in bulk: columns and the timestamp used for date ranges
+EXPORT_TABLES = {
+    'symptom_inputs': (['input_id', 'user_id', 'symptom_values', 'submitted_at'], 'submitted_at'),
+    'predictions': (['prediction_id', 'input_id', 'user_id', 'predicted_condition', 'confidence_score', 'created_at'], 'created_at'),
+}
+
+def iter_export_rows(table, start=None, end=None):
+    """
+    Stream every row of an exportable table through a server-side cursor.
+    
+    Memory use is bounded by DB_STREAM_ITERSIZE rows whatever the table size.
+    
+    Args:
+        table (str): A key of EXPORT_TABLES
+        start (datetime): Only rows at or after this time
+        end (datetime): Only rows before this time
+        
+    Yields:
+        list: Batches of row dicts
+    """
+    columns, time_column = EXPORT_TABLES[table]
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append(f"{time_column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{time_column} < %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    with get_pool().connection() as conn:
+        with conn.cursor(name=f"export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = DB_STREAM_ITERSIZE
+            cur.execute(f"SELECT {', '.join(columns)} FROM {table} {where}", params)
+            while True:
+                records = cur.fetchmany(DB_STREAM_ITERSIZE)
+                if not records:
+                    break
+                yield [dict(record) for record in records]
@@ -0,0 +1,61 @@
+"""
+Partition maintenance for the symptom checker database: create the coming
+months' partitions of symptom_inputs and predictions, then archive months
+older than ARCHIVE_AFTER_MONTHS to ARCHIVE_DIR and drop their partitions.
+
+Run it daily, e.g. from cron. It is safe to run again after a failure.
+
+Usage (from the backend directory):
+    python -m database.maintenance
+    python -m database.maintenance --dry-run
+    python -m database.maintenance --since 2023-01 --no-archive
+"""
+import argparse
+from datetime import datetime
+
+from . import db
+from .partitions import add_months, count_default_rows, is_partitioned, month_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months-ahead', type=int, default=db.PARTITION_MONTHS_AHEAD,
+                        help='Future months to create partitions for')
+    parser.add_argument('--since', type=lambda value: datetime.strptime(value, '%Y-%m'),
+                        help='Also create partitions from this month (YYYY-MM), e.g. after loading old rows')
+    parser.add_argument('--archive-after', type=int, default=db.ARCHIVE_AFTER_MONTHS,
+                        help='Months kept in the database besides the current one')
+    parser.add_argument('--no-archive', action='store_true', help='Only create partitions')
+    parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+    args = parser.parse_args()
+
+    if args.dry_run:
+        for month in db.get_cold_months(args.archive_after):
+            print(f"would archive {month:%Y-%m}")
+        return
+
+    created = db.ensure_partitions(args.months_ahead, args.since)
+    if created is None:
+        raise SystemExit("Could not create partitions")
+    for name in created:
+        print(f"created {name}")
+
+    if args.no_archive:
+        return
+    for month, stats in db.archive_cold_partitions(args.archive_after):
+        print(f"archived {month:%Y-%m}: {stats['rows']} rows, {stats['users']} users, "
+              f"{stats['bytes'] / 1048576:.1f} MB")
+
+    # Rows written after their month was archived end up in the default partition
+    cutoff = add_months(month_start(datetime.utcnow()), -args.archive_after)
+    with db.get_pool().connection() as conn:
+        for table, column in db.PARTITIONED_TABLES.items():
+            if not is_partitioned(conn, table):
+                continue
+            stragglers = count_default_rows(conn, table, column, cutoff)
+            if stragglers:
+                print(f"warning: {table}_default holds {stragglers} rows older than {cutoff:%Y-%m}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+-- Support keyset pagination of user history on (submitted_at, input_id).
+-- The new index also serves plain user_id lookups, so the old one is dropped.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_symptom_inputs_user_submitted
+    ON symptom_inputs (user_id, submitted_at DESC, input_id DESC);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_symptom_inputs_user_id;
@@ -0,0 +1,49 @@
+-- Store symptom features as a fixed-length REAL[] instead of a JSONB object
+-- that repeats the keys symptom_1..symptom_10 in every row.
+BEGIN;
+
+ALTER TABLE symptom_inputs ADD COLUMN symptom_values REAL[];
+
+UPDATE symptom_inputs
+SET symptom_values = ARRAY(
+    SELECT (symptom_data ->> ('symptom_' || i))::real
+    FROM generate_series(1, 10) AS i
+)
+WHERE symptom_values IS NULL;
+
+ALTER TABLE symptom_inputs
+    ALTER COLUMN symptom_values SET NOT NULL,
+    ADD CONSTRAINT symptom_values_length CHECK (array_length(symptom_values, 1) = 10),
+    DROP COLUMN symptom_data;
+
+-- Compatibility view with the old column layout for readers and writers of symptom_data
+CREATE VIEW symptom_inputs_legacy AS
+SELECT input_id,
+       user_id,
+       (SELECT jsonb_object_agg('symptom_' || i, value)
+        FROM unnest(symptom_values) WITH ORDINALITY AS v(value, i)) AS symptom_data,
+       submitted_at
+FROM symptom_inputs;
+
+CREATE FUNCTION symptom_inputs_legacy_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO symptom_inputs (input_id, user_id, symptom_values, submitted_at)
+    VALUES (
+        COALESCE(NEW.input_id, gen_random_uuid()),
+        NEW.user_id,
+        ARRAY(SELECT (NEW.symptom_data ->> ('symptom_' || i))::real FROM generate_series(1, 10) AS i),
+        COALESCE(NEW.submitted_at, CURRENT_TIMESTAMP)
+    )
+    RETURNING input_id, submitted_at INTO NEW.input_id, NEW.submitted_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER symptom_inputs_legacy_insert
+    INSTEAD OF INSERT ON symptom_inputs_legacy
+    FOR EACH ROW EXECUTE FUNCTION symptom_inputs_legacy_insert();
+
+COMMIT;
+
+-- Reclaim the space freed by dropping symptom_data (takes an exclusive lock):
+-- VACUUM FULL symptom_inputs;
@@ -0,0 +1,100 @@
+-- Partition symptom_inputs by submitted_at and predictions by created_at,
+-- one partition per month, so cold months can be archived and dropped
+-- (python -m database.maintenance) instead of growing the tables and their
+-- indexes forever.
+--
+-- Both tables are copied inside one transaction, which blocks writes until
+-- it commits; run it in a maintenance window. Primary keys now include the
+-- partition key, and the predictions -> symptom_inputs foreign key is
+-- dropped, since a foreign key to a partitioned table must include it.
+BEGIN;
+
+DROP VIEW symptom_inputs_legacy;
+
+ALTER TABLE symptom_inputs RENAME TO symptom_inputs_unpartitioned;
+ALTER TABLE symptom_inputs_unpartitioned RENAME CONSTRAINT symptom_inputs_pkey TO symptom_inputs_unpartitioned_pkey;
+ALTER TABLE symptom_inputs_unpartitioned RENAME CONSTRAINT symptom_inputs_user_id_fkey TO symptom_inputs_unpartitioned_user_id_fkey;
+ALTER INDEX idx_symptom_inputs_user_submitted RENAME TO idx_symptom_inputs_unpartitioned_user_submitted;
+ALTER TABLE predictions RENAME TO predictions_unpartitioned;
+ALTER TABLE predictions_unpartitioned RENAME CONSTRAINT predictions_pkey TO predictions_unpartitioned_pkey;
+ALTER INDEX idx_predictions_input_id RENAME TO idx_predictions_unpartitioned_input_id;
+
+CREATE TABLE symptom_inputs (
+    input_id UUID NOT NULL DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL,
+    symptom_values REAL[] NOT NULL CHECK (array_length(symptom_values, 1) = 10),
+    submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (input_id, submitted_at),
+    FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+) PARTITION BY RANGE (submitted_at);
+
+CREATE TABLE predictions (
+    prediction_id UUID NOT NULL DEFAULT gen_random_uuid(),
+    input_id UUID NOT NULL,
+    predicted_condition VARCHAR(255) NOT NULL,
+    confidence_score FLOAT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (prediction_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE symptom_inputs_default PARTITION OF symptom_inputs DEFAULT;
+CREATE TABLE predictions_default PARTITION OF predictions DEFAULT;
+
+-- One partition per month from the oldest row to three months ahead
+DO $$
+DECLARE
+    target record;
+    month timestamp;
+BEGIN
+    FOR target IN
+        SELECT 'symptom_inputs' AS tbl, min(submitted_at) AS oldest FROM symptom_inputs_unpartitioned
+        UNION ALL
+        SELECT 'predictions', min(created_at) FROM predictions_unpartitioned
+    LOOP
+        FOR month IN
+            SELECT generate_series(
+                date_trunc('month', COALESCE(target.oldest, now())),
+                date_trunc('month', now()) + interval '3 months',
+                interval '1 month'
+            )
+        LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                target.tbl || '_p' || to_char(month, 'YYYY_MM'), target.tbl, month, month + interval '1 month'
+            );
+        END LOOP;
+    END LOOP;
+END;
+$$;
+
+INSERT INTO symptom_inputs (input_id, user_id, symptom_values, submitted_at)
+SELECT input_id, user_id, symptom_values, COALESCE(submitted_at, CURRENT_TIMESTAMP)
+FROM symptom_inputs_unpartitioned;
+
+INSERT INTO predictions (prediction_id, input_id, predicted_condition, confidence_score, created_at)
+SELECT prediction_id, input_id, predicted_condition, confidence_score, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM predictions_unpartitioned;
+
+-- Indexes are built per partition after the copy
+CREATE INDEX idx_symptom_inputs_user_submitted ON symptom_inputs (user_id, submitted_at DESC, input_id DESC);
+CREATE INDEX idx_predictions_input_id ON predictions (input_id);
+
+DROP TABLE predictions_unpartitioned;
+DROP TABLE symptom_inputs_unpartitioned;
+
+CREATE VIEW symptom_inputs_legacy AS
+SELECT input_id,
+       user_id,
+       (SELECT jsonb_object_agg('symptom_' || i, value)
+        FROM unnest(symptom_values) WITH ORDINALITY AS v(value, i)) AS symptom_data,
+       submitted_at
+FROM symptom_inputs;
+
+CREATE TRIGGER symptom_inputs_legacy_insert
+    INSTEAD OF INSERT ON symptom_inputs_legacy
+    FOR EACH ROW EXECUTE FUNCTION symptom_inputs_legacy_insert();
+
+COMMIT;
+
+ANALYZE symptom_inputs;
+ANALYZE predictions;
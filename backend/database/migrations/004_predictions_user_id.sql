@@ -0,0 +1,31 @@
+-- Give predictions the user_id of their input, with a cascading foreign key
+-- to users. 003_partition_by_month.sql dropped the predictions -> inputs
+-- foreign key, so deleting a user removed their inputs but left their
+-- predictions behind.
+--
+-- Predictions whose input no longer exists (deleted with its user, or
+-- archived while the prediction sat in a later month) are deleted; archived
+-- ones are already in the archive files. The UPDATE rewrites every
+-- prediction and blocks writes until the transaction commits; run it in a
+-- maintenance window.
+BEGIN;
+
+ALTER TABLE predictions ADD COLUMN user_id UUID;
+
+-- A prediction is never older than its input, which prunes older input partitions
+UPDATE predictions p
+SET user_id = s.user_id
+FROM symptom_inputs s
+WHERE s.input_id = p.input_id AND s.submitted_at <= p.created_at;
+
+DELETE FROM predictions WHERE user_id IS NULL;
+
+ALTER TABLE predictions ALTER COLUMN user_id SET NOT NULL;
+ALTER TABLE predictions ADD FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE;
+
+-- Used by the cascade; created on every partition
+CREATE INDEX idx_predictions_user_id ON predictions (user_id);
+
+COMMIT;
+
+ANALYZE predictions;
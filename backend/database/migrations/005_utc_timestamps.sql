@@ -0,0 +1,27 @@
+-- Default timestamps to UTC. CURRENT_TIMESTAMP gives the session's time
+-- zone, while partitions, archiving and the write-behind queue all use
+-- UTC, so on a server not running in UTC a row could land in the wrong
+-- month's partition. Partitions take the new defaults from their parent.
+--
+-- Existing rows are left as they are.
+BEGIN;
+
+ALTER TABLE users ALTER COLUMN created_at SET DEFAULT timezone('utc', now());
+ALTER TABLE symptom_inputs ALTER COLUMN submitted_at SET DEFAULT timezone('utc', now());
+ALTER TABLE predictions ALTER COLUMN created_at SET DEFAULT timezone('utc', now());
+
+CREATE OR REPLACE FUNCTION symptom_inputs_legacy_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO symptom_inputs (input_id, user_id, symptom_values, submitted_at)
+    VALUES (
+        COALESCE(NEW.input_id, gen_random_uuid()),
+        NEW.user_id,
+        ARRAY(SELECT (NEW.symptom_data ->> ('symptom_' || i))::real FROM generate_series(1, 10) AS i),
+        COALESCE(NEW.submitted_at, timezone('utc', now()))
+    )
+    RETURNING input_id, submitted_at INTO NEW.input_id, NEW.submitted_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,17 @@
+-- Telemedicine database (DATABASE_URL): make users.created_at and
+-- doctors.created_at NOT NULL. The admin listings page through
+-- (created_at, id) keysets, which skip rows whose created_at is NULL.
+-- Rows without one get their updated_at, or the time of the migration.
+BEGIN;
+
+UPDATE users
+SET created_at = coalesce(updated_at, timezone('utc', now()))
+WHERE created_at IS NULL;
+ALTER TABLE users ALTER COLUMN created_at SET NOT NULL;
+
+UPDATE doctors
+SET created_at = coalesce(updated_at, timezone('utc', now()))
+WHERE created_at IS NULL;
+ALTER TABLE doctors ALTER COLUMN created_at SET NOT NULL;
+
+COMMIT;
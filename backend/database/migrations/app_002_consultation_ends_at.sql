@@ -0,0 +1,23 @@
+-- Telemedicine database (DATABASE_URL): store each consultation's end time
+-- and let PostgreSQL reject overlapping bookings of one doctor.
+-- Existing consultations are given the default length, CONSULTATION_MINUTES
+-- (30); change the interval below if your deployment uses another value.
+-- The constraint fails to add while overlapping consultations that are not
+-- cancelled exist; cancel or move them first.
+BEGIN;
+
+ALTER TABLE consultations ADD COLUMN IF NOT EXISTS ends_at timestamp;
+
+UPDATE consultations
+SET ends_at = datetime + interval '30 minutes'
+WHERE ends_at IS NULL;
+
+ALTER TABLE consultations ALTER COLUMN ends_at SET NOT NULL;
+
+-- doctor_id is compared as a one-value range so btree_gist is not needed
+ALTER TABLE consultations ADD CONSTRAINT ex_consultations_doctor_time EXCLUDE USING gist (
+    int4range(doctor_id, doctor_id, '[]') WITH &&,
+    tsrange(datetime, ends_at) WITH &&
+) WHERE (status <> 'cancelled');
+
+COMMIT;
@@ -0,0 +1,156 @@
+"""
+Monthly range partitions for the append-only symptom tables.
+
+A partitioned table has one partition per month, named <table>_pYYYY_MM
+and holding [first of the month, first of the next month), plus a
+<table>_default partition that accepts rows for months without one.
+Creating a month's partition moves its rows out of the default partition,
+so partitions can be created late without losing or rejecting writes.
+
+The functions take a psycopg2 connection and commit their own transactions.
+They work on any connection, including a raw SQLAlchemy connection.
+"""
+import re
+from datetime import datetime
+
+from psycopg2.extensions import cursor as TupleCursor
+
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(value):
+    """
+    Get the first instant of the month a datetime or date falls in.
+    """
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """
+    Get the first day of the month `count` months after (or before) `month`.
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _cursor(conn):
+    # Plain tuple rows whatever cursor factory the connection was opened with
+    return conn.cursor(cursor_factory=TupleCursor)
+
+
+def is_partitioned(conn, table):
+    """
+    Check whether a table exists and is partitioned. Tables of databases not
+    yet migrated are left alone by the functions below.
+    """
+    with _cursor(conn) as cur:
+        cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+        found = cur.fetchone() is not None
+    conn.rollback()
+    return found
+
+
+def list_partitions(conn, table):
+    """
+    Get the months that have a partition.
+
+    Returns:
+        list: First day of each partitioned month (datetime), oldest first
+    """
+    with _cursor(conn) as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+            (table,)
+        )
+        names = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match and name == partition_name(table, datetime(int(match.group(1)), int(match.group(2)), 1)):
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(conn, table, column, months_ahead=3, since=None):
+    """
+    Create the default partition and any missing monthly partitions from
+    `since` (default: the current month, in UTC) to `months_ahead` months ahead.
+
+    Rows already in the default partition for a new month are moved into
+    it. Concurrent callers (e.g. workers starting together) are serialized
+    with an advisory lock.
+
+    Args:
+        conn: psycopg2 connection
+        table (str): Partitioned table
+        column (str): Its partition key
+        months_ahead (int): Future months to create partitions for
+        since (datetime): First month to create a partition for
+
+    Returns:
+        list: Names of the partitions created; empty if the table is not partitioned
+    """
+    if not is_partitioned(conn, table):
+        return []
+
+    first = month_start(since or datetime.utcnow())
+    last = add_months(month_start(datetime.utcnow()), months_ahead)
+    existing = set(list_partitions(conn, table))
+    wanted = []
+    month = first
+    while month <= last:
+        if month not in existing:
+            wanted.append(month)
+        month = add_months(month, 1)
+
+    default = f"{table}_default"
+    created = []
+    try:
+        with _cursor(conn) as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"partitions:{table}",))
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT")
+            for month in wanted:
+                name = partition_name(table, month)
+                cur.execute("SELECT to_regclass(%s)", (name,))
+                if cur.fetchone()[0] is not None:
+                    continue  # created by another process while this one waited for the lock
+                bounds = (month, add_months(month, 1))
+                # The new month is built outside the table, filled from the
+                # default partition and attached; the CHECK constraint spares
+                # ATTACH a validation scan
+                cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                cur.execute(
+                    f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+                    f"CHECK ({column} IS NOT NULL AND {column} >= %s AND {column} < %s)",
+                    bounds
+                )
+                cur.execute(
+                    f"WITH moved AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved",
+                    bounds
+                )
+                cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+                cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds")
+                created.append(name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return created
+
+
+def count_default_rows(conn, table, column, before):
+    """
+    Count rows in the default partition older than a month, i.e. rows that
+    landed in a month whose partition was already archived.
+    """
+    with _cursor(conn) as cur:
+        cur.execute(f"SELECT count(*) FROM {table}_default WHERE {column} < %s", (before,))
+        count = cur.fetchone()[0]
+    conn.rollback()
+    return count
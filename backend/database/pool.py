@@ -0,0 +1,411 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+from sqlalchemy.exc import TimeoutError as EngineTimeout
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection becomes available within the checkout timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to `maxconn`, health checked when they
+    are handed out, and callers wait up to `timeout` seconds for one to be
+    returned when the pool is exhausted.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=5.0, healthcheck_interval=30.0):
+        """
+        Args:
+            connect (callable): Zero-argument function returning a new connection
+            minconn (int): Number of connections opened when the pool is first used
+            maxconn (int): Maximum number of open connections
+            timeout (float): Seconds to wait for a free connection before giving up
+            healthcheck_interval (float): Connections idle for longer than this
+                are pinged with `SELECT 1` before being handed out
+        """
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: minconn=%s maxconn=%s" % (minconn, maxconn))
+
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # list of (connection, returned_at)
+        self._in_use = set()
+        self._retired = set()  # in use when closeall() ran; closed when returned
+        self._opening = 0
+        self._pid = os.getpid()
+        self._filled = False
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _check_pid(self):
+        # Connections must not be shared across a fork; a child process
+        # starts with an empty pool of its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._in_use = set()
+            self._retired = set()
+            self._opening = 0
+            self._filled = False
+
+    def _fill(self):
+        while len(self._idle) + len(self._in_use) + self._opening < self.minconn:
+            self._opening += 1
+            self._cond.release()
+            try:
+                conn = self._connect()
+            finally:
+                self._cond.acquire()
+                self._opening -= 1
+            self._idle.append((conn, time.monotonic()))
+        self._filled = True
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """
+        Check a connection out of the pool.
+
+        Returns:
+            connection: A healthy psycopg2 connection
+
+        Raises:
+            PoolTimeout: If no connection is free within the timeout
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            self._check_pid()
+            if not self._filled:
+                self._fill()
+
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use.add(conn)
+                    break
+
+                if len(self._in_use) + self._opening < self.maxconn:
+                    self._opening += 1
+                    self._cond.release()
+                    try:
+                        conn = self._connect()
+                    finally:
+                        self._cond.acquire()
+                        self._opening -= 1
+                    self._in_use.add(conn)
+                    returned_at = time.monotonic()
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        "No database connection available after %.1fs" % self.timeout
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+        # Health check outside the lock so a slow ping does not block the pool
+        if not self._is_healthy(conn, returned_at):
+            with self._cond:
+                self._in_use.discard(conn)
+                self._discard(conn)
+                self._opening += 1
+            try:
+                conn = self._connect()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+            with self._cond:
+                self._in_use.add(conn)
+
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the pool.
+
+        Any open transaction is rolled back so the next user starts clean.
+
+        Args:
+            conn (connection): A connection obtained from getconn()
+            close (bool): Close the connection instead of keeping it idle
+        """
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._cond:
+            self._check_pid()
+            if conn in self._retired:
+                # Checked out before closeall(); the pool no longer keeps it
+                self._retired.discard(conn)
+                self._discard(conn)
+                return
+            if conn not in self._in_use:
+                # Checked out before a fork (closing it would end the parent's
+                # session) or already returned
+                return
+            self._in_use.discard(conn)
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out and always returns it.
+
+        Usage:
+            with pool.connection() as conn:
+                ...
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """
+        Close all idle connections. Connections currently in use are closed
+        when they are returned.
+        """
+        with self._cond:
+            self._check_pid()
+            for conn, _ in self._idle:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._idle = []
+            self._retired |= self._in_use
+            self._in_use = set()
+            self._filled = False
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Get a snapshot of pool usage.
+
+        Returns:
+            dict: Pool size limits, in-use/idle counts, waits, timeouts
+                  and checkout latency in milliseconds
+        """
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'checkout_ms_avg': (self._checkout_time_total / checkouts * 1000.0) if checkouts else 0.0,
+                'checkout_ms_max': self._checkout_time_max * 1000.0,
+            }
+
+
+class EnginePool:
+    """
+    The ConnectionPool interface over a SQLAlchemy engine's pool.
+
+    Code written against ConnectionPool gets plain psycopg2 connections
+    checked out of an engine the application already manages, so one
+    process keeps one pool per database instead of one per database layer.
+    """
+
+    def __init__(self, engine, cursor_factory=None):
+        """
+        Args:
+            engine (sqlalchemy.engine.Engine): A psycopg2 engine
+            cursor_factory: Cursor class set on connections while they are
+                checked out (the engine's own cursors are left alone)
+        """
+        self.engine = engine
+        self.cursor_factory = cursor_factory
+
+        self._lock = threading.Lock()
+        self._checked_out = {}  # psycopg2 connection -> SQLAlchemy pool proxy
+        self._pid = os.getpid()
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _max_size(self):
+        pool = self.engine.pool
+        if not hasattr(pool, 'size'):
+            return None
+        return pool.size() + max(getattr(pool, '_max_overflow', 0), 0)
+
+    def getconn(self):
+        """
+        Check a connection out of the engine's pool.
+
+        Returns:
+            connection: A psycopg2 connection
+
+        Raises:
+            PoolTimeout: If no connection is free within the engine's pool timeout
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked child must not reuse the parent's connections
+                self._pid = os.getpid()
+                self._checked_out = {}
+                self.engine.dispose(close=False)
+
+        pool = self.engine.pool
+        max_size = self._max_size()
+        waited = max_size is not None and pool.checkedin() == 0 and pool.checkedout() >= max_size
+        started = time.monotonic()
+        try:
+            proxy = self.engine.raw_connection()
+        except EngineTimeout as e:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(str(e)) from e
+        elapsed = time.monotonic() - started
+
+        conn = proxy.driver_connection
+        if self.cursor_factory is not None:
+            conn.cursor_factory = self.cursor_factory
+        with self._lock:
+            self._checked_out[conn] = proxy
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the engine's pool.
+
+        Any open transaction is rolled back so the next user starts clean.
+
+        Args:
+            conn (connection): A connection obtained from getconn()
+            close (bool): Close the connection instead of keeping it idle
+        """
+        with self._lock:
+            proxy = self._checked_out.pop(conn, None)
+        if proxy is None:
+            # Checked out before a fork or already returned
+            return
+
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        if close or conn.closed:
+            with self._lock:
+                self._discarded += 1
+            proxy.invalidate()
+        else:
+            conn.cursor_factory = None
+        proxy.close()
+
+    connection = ConnectionPool.connection
+
+    def closeall(self):
+        """
+        Close the engine's idle connections and forget the ones in use.
+        """
+        with self._lock:
+            self._checked_out = {}
+        self.engine.dispose()
+
+    def stats(self):
+        """
+        Get a snapshot of pool usage, in the same shape as ConnectionPool.stats().
+
+        In-use and idle counts are the engine's, whoever checked them out.
+        """
+        pool = self.engine.pool
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'min_size': 0,
+                'max_size': self._max_size(),
+                'in_use': pool.checkedout() if hasattr(pool, 'checkedout') else len(self._checked_out),
+                'idle': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'checkout_ms_avg': (self._checkout_time_total / checkouts * 1000.0) if checkouts else 0.0,
+                'checkout_ms_max': self._checkout_time_max * 1000.0,
+            }
@@ -8,29 +8,68 @@ CREATE TABLE users (
     user_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     name VARCHAR(100) NOT NULL,
     email VARCHAR(255) UNIQUE NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT timezone('utc', now())
 );
 
--- Symptom inputs table to store user symptom data
+-- Symptom inputs table to store user symptom data, partitioned by month
+-- (see partitions.py); rows for months without a partition go to the
+-- default partition
 CREATE TABLE symptom_inputs (
-    input_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    input_id UUID NOT NULL DEFAULT gen_random_uuid(),
     user_id UUID NOT NULL,
-    symptom_data JSONB NOT NULL,
-    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    symptom_values REAL[] NOT NULL CHECK (array_length(symptom_values, 1) = 10),
+    submitted_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now()),
+    PRIMARY KEY (input_id, submitted_at),
     FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (submitted_at);
 
--- Predictions table to store AI model predictions
+-- Predictions table to store AI model predictions, partitioned by month.
+-- input_id has no foreign key: one to a partitioned table would have to
+-- include submitted_at. user_id is the input's user, so deleting a user
+-- deletes their predictions along with their inputs.
 CREATE TABLE predictions (
-    prediction_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    prediction_id UUID NOT NULL DEFAULT gen_random_uuid(),
     input_id UUID NOT NULL,
+    user_id UUID NOT NULL,
     predicted_condition VARCHAR(255) NOT NULL,
     confidence_score FLOAT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (input_id) REFERENCES symptom_inputs (input_id) ON DELETE CASCADE
-);
+    created_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now()),
+    PRIMARY KEY (prediction_id, created_at),
+    FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+) PARTITION BY RANGE (created_at);
 
--- Indexes for optimization
+CREATE TABLE symptom_inputs_default PARTITION OF symptom_inputs DEFAULT;
+CREATE TABLE predictions_default PARTITION OF predictions DEFAULT;
+
+-- Indexes for optimization (created on every partition)
 CREATE INDEX idx_users_email ON users (email);
-CREATE INDEX idx_symptom_inputs_user_id ON symptom_inputs (user_id);
-CREATE INDEX idx_predictions_input_id ON predictions (input_id);
\ No newline at end of file
+CREATE INDEX idx_symptom_inputs_user_submitted ON symptom_inputs (user_id, submitted_at DESC, input_id DESC);
+CREATE INDEX idx_predictions_input_id ON predictions (input_id);
+CREATE INDEX idx_predictions_user_id ON predictions (user_id);
+
+-- Compatibility view exposing symptom inputs with the old JSONB symptom_data column
+CREATE VIEW symptom_inputs_legacy AS
+SELECT input_id,
+       user_id,
+       (SELECT jsonb_object_agg('symptom_' || i, value)
+        FROM unnest(symptom_values) WITH ORDINALITY AS v(value, i)) AS symptom_data,
+       submitted_at
+FROM symptom_inputs;
+
+CREATE FUNCTION symptom_inputs_legacy_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO symptom_inputs (input_id, user_id, symptom_values, submitted_at)
+    VALUES (
+        COALESCE(NEW.input_id, gen_random_uuid()),
+        NEW.user_id,
+        ARRAY(SELECT (NEW.symptom_data ->> ('symptom_' || i))::real FROM generate_series(1, 10) AS i),
+        COALESCE(NEW.submitted_at, timezone('utc', now()))
+    )
+    RETURNING input_id, submitted_at INTO NEW.input_id, NEW.submitted_at;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER symptom_inputs_legacy_insert
+    INSTEAD OF INSERT ON symptom_inputs_legacy
+    FOR EACH ROW EXECUTE FUNCTION symptom_inputs_legacy_insert();
\ No newline at end of file
@@ -0,0 +1,358 @@
+import fcntl
+import glob
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+
+class QueueFull(Exception):
+    """
+    Raised when the write-behind queue stays full for longer than the put timeout.
+    """
+
+
+class _Segment:
+    """
+    One journal file and the number of its records not yet written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        # Held until the segment is removed; an unlocked journal belongs to a dead process
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.records = 0
+        self.pending = 0
+
+
+class WriteBehindWriter:
+    """
+    Persists records on a background thread in batched transactions.
+
+    submit() appends the record to an on-disk journal and queues it; the
+    writer thread groups queued records and hands each group to `write_fn`
+    in one call. The journal is split into segments of `segment_size`
+    records, and a segment is deleted once all of its records have been
+    written, so the journal stays small under steady traffic. Journals left
+    behind by a crashed process are replayed on startup, so `write_fn` must
+    be idempotent.
+
+    Errors of the `retry_on` types (e.g. a lost connection) are retried
+    with backoff. Any other error fails the batch for good: its records are
+    retried one at a time, and records that still fail are appended to
+    `dead-letter.ndjson` in the journal directory instead of blocking the
+    writer.
+    """
+
+    def __init__(self, write_fn, max_queue_size=10000, batch_size=500, flush_interval=0.2,
+                 put_timeout=0.1, journal_dir=None, fsync=False, retry_on=(), segment_size=None):
+        """
+        Args:
+            write_fn (callable): Writes a list of records, raising on failure
+            max_queue_size (int): Records allowed to wait before submit() blocks
+            batch_size (int): Maximum records per write_fn call
+            flush_interval (float): Seconds to wait for a batch to fill up
+            put_timeout (float): Seconds submit() waits for queue space before raising QueueFull
+            journal_dir (str): Directory for crash-safety journals (None disables the journal)
+            fsync (bool): fsync the journal after every record
+            retry_on (tuple): Exception types write_fn raises for transient failures
+            segment_size (int): Records per journal segment (default: batch_size)
+        """
+        self.write_fn = write_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.journal_dir = journal_dir
+        self.fsync = fsync
+        self.retry_on = tuple(retry_on)
+        self.segment_size = segment_size or batch_size
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._segment = None
+        self._segments = 0
+        self._journal_pending = 0
+        self._worker = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        self._submitted = 0
+        self._written = 0
+        self._rejected = 0
+        self._batches = 0
+        self._failures = 0
+        self._dead_lettered = 0
+        self._replayed = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+
+    def _ensure_started(self):
+        # The writer thread and journal file belong to one process; a forked
+        # worker starts its own.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._stopping.clear()
+            if self.journal_dir:
+                os.makedirs(self.journal_dir, exist_ok=True)
+                with self._journal_lock:
+                    self._segment = None
+                    self._segments = 0
+                    self._journal_pending = 0
+            self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._worker.start()
+
+    def _current_segment(self):
+        # Called with _journal_lock held
+        segment = self._segment
+        if segment is None or segment.records >= self.segment_size:
+            # The random suffix keeps a reused PID from adopting a dead process's journal
+            path = os.path.join(self.journal_dir, f"journal-{os.getpid()}-{uuid.uuid4().hex[:8]}.ndjson")
+            self._segment = _Segment(path)
+            self._segments += 1
+        return self._segment
+
+    def _remove_segment(self, segment):
+        # Called with _journal_lock held
+        os.unlink(segment.path)
+        segment.file.close()
+        self._segments -= 1
+
+    def _replay_orphaned_journals(self):
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, 'journal-*.ndjson'))):
+            with open(path, 'r+', encoding='utf-8') as journal:
+                try:
+                    fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # Owned by a live process
+                records = [json.loads(line) for line in journal if line.strip()]
+                for start in range(0, len(records), self.batch_size):
+                    if self._write_batch(records[start:start + self.batch_size]) is None:
+                        # Stopped while the database was unavailable; keep the journal
+                        return
+                with self._lock:
+                    self._replayed += len(records)
+                os.unlink(path)
+                if records:
+                    print(f"Replayed {len(records)} journaled records from {path}")
+
+    def submit(self, record):
+        """
+        Queue a record to be written in the background.
+
+        Args:
+            record (dict): A JSON-serializable record for write_fn
+
+        Raises:
+            QueueFull: If the queue stays full for put_timeout seconds
+        """
+        self._ensure_started()
+        segment = None
+        if self.journal_dir:
+            # Journal before queueing so an acknowledged record survives a crash
+            with self._journal_lock:
+                segment = self._current_segment()
+                segment.file.write(json.dumps(record) + '\n')
+                segment.file.flush()
+                if self.fsync:
+                    os.fsync(segment.file.fileno())
+                segment.records += 1
+                segment.pending += 1
+                self._journal_pending += 1
+        try:
+            self._queue.put((segment, record), timeout=self.put_timeout)
+        except queue.Full:
+            # The caller writes the record itself; if it is still in the
+            # journal after a crash, replaying it is harmless.
+            self._mark_journaled_done([segment])
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull("Write-behind queue is full")
+        with self._lock:
+            self._submitted += 1
+
+    def _mark_journaled_done(self, segments):
+        """
+        Release the journal entries of written (or dead-lettered) records.
+
+        Args:
+            segments (list): The segment of each record, None when not journaled
+        """
+        with self._journal_lock:
+            for segment in segments:
+                if segment is None:
+                    continue
+                segment.pending -= 1
+                self._journal_pending -= 1
+                if segment.pending:
+                    continue
+                if segment is self._segment:
+                    # Reuse the open segment rather than creating a new file
+                    segment.file.truncate(0)
+                    segment.records = 0
+                else:
+                    self._remove_segment(segment)
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records):
+        """
+        Call write_fn, retrying transient errors with backoff.
+
+        Returns:
+            bool: True once written, False if the writer stopped while retrying
+
+        Raises:
+            Exception: Any error that is not one of the retry_on types
+        """
+        delay = 0.1
+        while True:
+            try:
+                self.write_fn(records)
+                return True
+            except self.retry_on as e:
+                print(f"Error writing {len(records)} queued records, retrying: {e}")
+                with self._lock:
+                    self._failures += 1
+                if self._stopping.is_set():
+                    # Leave the records in the journal for the next start
+                    return False
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def _write_batch(self, records):
+        """
+        Write records, isolating the ones that fail permanently.
+
+        A batch that fails with a permanent error is retried one record at
+        a time, so one bad record does not hold back the rest; records that
+        fail on their own are dead-lettered.
+
+        Returns:
+            int: Records written, or None if the writer stopped while retrying
+        """
+        try:
+            return len(records) if self._write(records) else None
+        except Exception as e:
+            print(f"Error writing {len(records)} queued records: {e}")
+            with self._lock:
+                self._failures += 1
+            if len(records) == 1:
+                self._dead_letter(records[0], e)
+                return 0
+
+        written = 0
+        for record in records:
+            try:
+                if not self._write([record]):
+                    return None
+                written += 1
+            except Exception as e:
+                self._dead_letter(record, e)
+        return written
+
+    def _dead_letter(self, record, error):
+        with self._lock:
+            self._dead_lettered += 1
+        if not self.journal_dir:
+            print(f"Dropping record that cannot be written ({error}): {json.dumps(record)}")
+            return
+        # One line per write on an O_APPEND file, so processes do not interleave
+        with open(os.path.join(self.journal_dir, 'dead-letter.ndjson'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'error': str(error), 'record': record}) + '\n')
+
+    def _flush(self, batch):
+        segments = [segment for segment, _ in batch]
+        started = time.monotonic()
+        written = self._write_batch([record for _, record in batch])
+        if written is None:
+            return
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._written += written
+            self._batches += 1
+            self._flush_time_total += elapsed
+            self._flush_time_max = max(self._flush_time_max, elapsed)
+        self._mark_journaled_done(segments)
+
+    def _run(self):
+        if self.journal_dir:
+            # Our own journal is locked, so only dead processes' journals are replayed
+            self._replay_orphaned_journals()
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        # Flush whatever is still queued on shutdown
+        while True:
+            batch = self._drain()
+            if not batch:
+                break
+            self._flush(batch)
+
+    def close(self, timeout=10.0):
+        """
+        Stop the writer thread after flushing the queue.
+        """
+        if self._worker is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._worker.join(timeout)
+        self._worker = None
+
+    def stats(self):
+        """
+        Get queue and flush statistics.
+
+        Returns:
+            dict: Queue depth, record counts, batches, failures, journal size and flush latency
+        """
+        with self._lock:
+            batches = self._batches
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'submitted': self._submitted,
+                'written': self._written,
+                'rejected': self._rejected,
+                'replayed': self._replayed,
+                'batches': batches,
+                'failures': self._failures,
+                'dead_lettered': self._dead_lettered,
+                'journal_pending': self._journal_pending,
+                'journal_segments': self._segments,
+                'flush_ms_avg': (self._flush_time_total / batches * 1000.0) if batches else 0.0,
+                'flush_ms_max': self._flush_time_max * 1000.0,
+            }
@@ -0,0 +1,34 @@
+# backend/gunicorn.conf.py
+# Usage: gunicorn -c gunicorn.conf.py run:app
+import gc
+import os
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# With MODEL_PRELOAD the application and its models are loaded once in the
+# master and the forked workers share those pages copy-on-write instead of
+# each loading their own copy. Use it with MODEL_ENGINE=numpy: TensorFlow
+# starts thread pools that do not survive a fork.
+MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'false').lower() in ('true', '1', 't')
+preload_app = MODEL_PRELOAD
+
+# Make ai-module importable so the registry here is the one the app uses
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai-module'))
+
+
+def when_ready(server):
+    if not MODEL_PRELOAD:
+        return
+
+    from model_registry import registry
+
+    load_times = registry.warm_up()
+    for name, seconds in load_times.items():
+        server.log.info("Preloaded model %s in %.2fs", name, seconds)
+
+    # Keep the preloaded objects out of the collector's reach so the garbage
+    # collector does not touch (and un-share) their pages in the workers.
+    gc.freeze()
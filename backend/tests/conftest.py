@@ -0,0 +1,78 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.config import Config
+from app.models.consultation import Consultation, Doctor
+from app.models.user import User
+
+# The models use PostgreSQL-only features (partitioning, exclusion
+# constraints), so the tests need a scratch PostgreSQL database. Its
+# tables are dropped and recreated.
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = TEST_DATABASE_URL
+    LEGACY_API_ENABLED = False
+    SQLALCHEMY_BINDS = {}
+    METRICS_ENABLED = False
+    QUERY_BUDGET_ENFORCED = True
+
+
+@pytest.fixture(scope='session')
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        yield app.test_client()
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def auth_headers(app):
+    def headers(identity):
+        return {'Authorization': f'Bearer {create_access_token(identity=identity)}'}
+    return headers
+
+
+@pytest.fixture
+def consultation(client):
+    patient = User(email='patient@example.com')
+    doctor_user = User(email='doctor@example.com')
+    db.session.add_all([patient, doctor_user])
+    db.session.flush()
+    # Prescription routes compare the JWT identity with consultation.doctor_id
+    doctor = Doctor(id=doctor_user.id, user_id=doctor_user.id, specialization='General Practice')
+    db.session.add(doctor)
+    db.session.flush()
+    starts = datetime(2026, 1, 5, 9, 0)
+    consultation = Consultation(
+        user_id=patient.id, doctor_id=doctor.id, datetime=starts,
+        ends_at=starts + timedelta(minutes=30), status='completed'
+    )
+    db.session.add(consultation)
+    db.session.commit()
+    ids = {'id': consultation.id, 'user_id': patient.id, 'doctor_id': doctor.id}
+    # Requests must load what they need themselves
+    db.session.expunge_all()
+    return ids
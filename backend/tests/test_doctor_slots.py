@@ -0,0 +1,43 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from app import db
+from app.models.consultation import Doctor, DoctorAvailability
+from app.models.user import User
+
+
+@pytest.fixture
+def doctors(client):
+    busy_user = User(email='busy@example.com')
+    late_user = User(email='late@example.com')
+    db.session.add_all([busy_user, late_user])
+    db.session.flush()
+    busy = Doctor(user_id=busy_user.id, specialization='General Practice')
+    late = Doctor(user_id=late_user.id, specialization='General Practice')
+    db.session.add_all([busy, late])
+    db.session.flush()
+    # The busy doctor has a slot every 15 minutes of every day; the late
+    # doctor only works the day after tomorrow
+    late_day = date.today() + timedelta(days=2)
+    db.session.add_all([
+        DoctorAvailability(doctor_id=busy.id, weekday=weekday, start_time=time(0, 0),
+                           end_time=time(23, 45), slot_minutes=15)
+        for weekday in range(7)
+    ])
+    db.session.add(DoctorAvailability(doctor_id=late.id, weekday=late_day.weekday(),
+                                      start_time=time(9, 0), end_time=time(12, 0), slot_minutes=30))
+    db.session.commit()
+    ids = {'busy': busy.id, 'late': late.id, 'user_id': busy_user.id, 'late_day': late_day}
+    db.session.expunge_all()
+    return ids
+
+
+def test_next_slot_for_every_doctor(app, client, auth_headers, doctors, monkeypatch):
+    # Far fewer than the busy doctor's slots before the late doctor's first one
+    monkeypatch.setitem(app.config, 'SLOT_SEARCH_MAX', 3)
+    response = client.get('/api/consultations/doctors?next_slot=true', headers=auth_headers(doctors['user_id']))
+    assert response.status_code == 200
+    next_slots = {doctor['id']: doctor['next_slot'] for doctor in response.get_json()['doctors']}
+    assert next_slots[doctors['busy']] is not None
+    assert next_slots[doctors['late']]['start'] == f"{doctors['late_day'].isoformat()}T09:00:00"
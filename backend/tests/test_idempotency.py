@@ -0,0 +1,52 @@
+import pytest
+
+from app import db
+from app.models.idempotency import IdempotencyKey
+from app.models.prescription import Prescription
+from app.routes import prescriptions
+
+
+def _create(client, headers, consultation, key, diagnosis='Flu'):
+    return client.post('/api/prescriptions/create', headers={**headers, 'Idempotency-Key': key}, json={
+        'consultation_id': consultation['id'],
+        'diagnosis': diagnosis,
+        'medications': [{'name': 'Paracetamol', 'dosage': '500mg'}],
+    })
+
+
+def test_retry_is_replayed(client, auth_headers, consultation):
+    headers = auth_headers(consultation['doctor_id'])
+    first = _create(client, headers, consultation, 'replay-key')
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = _create(client, headers, consultation, 'replay-key')
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Prescription.query.count() == 1
+
+
+def test_key_reused_for_another_body(client, auth_headers, consultation):
+    headers = auth_headers(consultation['doctor_id'])
+    assert _create(client, headers, consultation, 'mismatch-key').status_code == 201
+
+    response = _create(client, headers, consultation, 'mismatch-key', diagnosis='Cold')
+    assert response.status_code == 422
+    assert Prescription.query.count() == 1
+
+
+def test_failed_request_leaves_nothing_behind(client, auth_headers, consultation, monkeypatch):
+    def fail(*tags):
+        raise RuntimeError('worker died')
+    # After the view saved the prescription, before the response is stored
+    monkeypatch.setattr(prescriptions, 'invalidate_responses', fail)
+    headers = auth_headers(consultation['doctor_id'])
+    with pytest.raises(RuntimeError):
+        _create(client, headers, consultation, 'failed-key')
+    assert Prescription.query.count() == 0
+    assert IdempotencyKey.query.count() == 0
+
+    monkeypatch.undo()
+    assert _create(client, headers, consultation, 'failed-key').status_code == 201
+    assert Prescription.query.count() == 1
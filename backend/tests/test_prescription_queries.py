@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models.consultation import Consultation
+from app.models.prescription import Prescription
+from app.utils.query_budget import assert_max_queries
+
+
+@pytest.fixture
+def prescription(consultation):
+    prescription = Prescription(
+        consultation_id=consultation['id'], diagnosis='Flu',
+        medications=[{'name': 'Paracetamol', 'dosage': '500mg'}]
+    )
+    db.session.add(prescription)
+    db.session.commit()
+    prescription_id = prescription.id
+    db.session.expunge_all()
+    return prescription_id
+
+
+def test_create_prescription(client, auth_headers, consultation):
+    with assert_max_queries(db.engine, 3):
+        response = client.post('/api/prescriptions/create', headers=auth_headers(consultation['doctor_id']), json={
+            'consultation_id': consultation['id'],
+            'diagnosis': 'Flu',
+            'medications': [{'name': 'Paracetamol', 'dosage': '500mg'}],
+        })
+    assert response.status_code == 201
+
+
+def test_get_prescription(client, auth_headers, consultation, prescription):
+    with assert_max_queries(db.engine, 1):
+        response = client.get(f'/api/prescriptions/{prescription}', headers=auth_headers(consultation['user_id']))
+    assert response.status_code == 200
+    assert response.get_json()['diagnosis'] == 'Flu'
+
+
+def test_update_prescription(client, auth_headers, consultation, prescription):
+    with assert_max_queries(db.engine, 3):
+        response = client.put(f'/api/prescriptions/{prescription}', headers=auth_headers(consultation['doctor_id']),
+                              json={'notes': 'Rest for three days'})
+    assert response.status_code == 200
+    assert response.get_json()['prescription']['notes'] == 'Rest for three days'
+
+
+def test_my_prescriptions(client, auth_headers, consultation, prescription):
+    headers = auth_headers(consultation['user_id'])
+    # Cache miss: the version query and the list
+    with assert_max_queries(db.engine, 2):
+        response = client.get('/api/prescriptions/my-prescriptions', headers=headers)
+    assert response.status_code == 200
+    assert [row['id'] for row in response.get_json()['prescriptions']] == [prescription]
+
+    # Unchanged rows: the version query only
+    with assert_max_queries(db.engine, 1):
+        response = client.get('/api/prescriptions/my-prescriptions', headers=headers)
+    assert response.status_code == 200
+
+
+def test_my_prescriptions_query_count_does_not_grow(client, auth_headers, consultation):
+    starts = datetime(2026, 1, 6, 9, 0)
+    for day in range(5):
+        other = Consultation(
+            user_id=consultation['user_id'], doctor_id=consultation['doctor_id'],
+            datetime=starts + timedelta(days=day), ends_at=starts + timedelta(days=day, minutes=30),
+            status='completed'
+        )
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(Prescription(consultation_id=other.id, diagnosis='Flu', medications=[]))
+    db.session.commit()
+    db.session.expunge_all()
+
+    with assert_max_queries(db.engine, 2):
+        response = client.get('/api/prescriptions/my-prescriptions', headers=auth_headers(consultation['user_id']))
+    assert len(response.get_json()['prescriptions']) == 5
@@ -38,17 +38,24 @@ export const authService = {
   updateProfile: (data) => api.put('/auth/me', data),
 };
 
+// Send the same key with every retry of one write so the server applies it once
+const withIdempotencyKey = (key) => (key ? { headers: { 'Idempotency-Key': key } } : undefined);
+
 // Symptom checker services
 export const symptomService = {
-  checkSymptoms: (data) => api.post('/symptoms/check', data),
+  checkSymptoms: (data, idempotencyKey) => api.post('/symptoms/check', data, withIdempotencyKey(idempotencyKey)),
   getHistory: () => api.get('/symptoms/history'),
   getSymptomCheck: (id) => api.get(`/symptoms/${id}`),
 };
 
 // Consultation services
 export const consultationService = {
-  getDoctors: () => api.get('/consultations/doctors'),
-  bookConsultation: (data) => api.post('/consultations/book', data),
+  // params: { specialization, next_slot }
+  getDoctors: (params) => api.get('/consultations/doctors', { params }),
+  // params: { specialization, doctor_id, from, limit, days }
+  getFreeSlots: (params) => api.get('/consultations/slots', { params }),
+  bookConsultation: (data, idempotencyKey) =>
+    api.post('/consultations/book', data, withIdempotencyKey(idempotencyKey)),
   getMyConsultations: () => api.get('/consultations/my-consultations'),
   getConsultation: (id) => api.get(`/consultations/${id}`),
   joinConsultation: (id) => api.post(`/consultations/${id}/join`),
@@ -57,21 +64,31 @@ export const consultationService = {
 
 // Prescription services
 export const prescriptionService = {
-  createPrescription: (data) => api.post('/prescriptions/create', data),
+  createPrescription: (data, idempotencyKey) =>
+    api.post('/prescriptions/create', data, withIdempotencyKey(idempotencyKey)),
   getMyPrescriptions: () => api.get('/prescriptions/my-prescriptions'),
   getPrescription: (id) => api.get(`/prescriptions/${id}`),
   updatePrescription: (id, data) => api.put(`/prescriptions/${id}`, data),
 };
 
+// Offline sync: body { cursors, writes: [{ key, type, data }], entities, limit }
+export const syncService = {
+  sync: (body) => api.post('/sync', body),
+};
+
 // Admin services
 export const adminService = {
-  getUsers: () => api.get('/admin/users'),
+  // params: { limit, page | cursor, sort, fields, is_active, is_admin, email_prefix }
+  getUsers: (params) => api.get('/admin/users', { params }),
   getUser: (id) => api.get(`/admin/users/${id}`),
   updateUser: (id, data) => api.put(`/admin/users/${id}`, data),
-  getDoctors: () => api.get('/admin/doctors'),
+  // params: { limit, page | cursor, sort, fields, is_active, specialization }
+  getDoctors: (params) => api.get('/admin/doctors', { params }),
   createDoctor: (data) => api.post('/admin/doctors', data),
   getDoctor: (id) => api.get(`/admin/doctors/${id}`),
   updateDoctor: (id, data) => api.put(`/admin/doctors/${id}`, data),
+  getDoctorAvailability: (id) => api.get(`/admin/doctors/${id}/availability`),
+  setDoctorAvailability: (id, windows) => api.put(`/admin/doctors/${id}/availability`, { windows }),
   deleteDoctor: (id) => api.delete(`/admin/doctors/${id}`),
 };
 